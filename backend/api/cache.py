@@ -0,0 +1,20 @@
+# backend/api/cache.py
+# Shared read-through cache of Game and User rows for the routers
+
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models import Game, User
+from backend.services.entity_cache import create_entity_cache
+
+entity_cache = create_entity_cache()
+
+
+async def cached_game(db: AsyncSession, game_id: str) -> Optional[Game]:
+    """Game by its public game_id, for reads; invalidate with entity_cache.invalidate(Game, game_id)"""
+    return await entity_cache.get(Game, game_id, lambda: db.scalar(select(Game).where(Game.game_id == game_id)))
+
+
+async def cached_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    """User by id, for reads; invalidate with entity_cache.invalidate(User, user_id)"""
+    return await entity_cache.get(User, user_id, lambda: db.get(User, user_id))
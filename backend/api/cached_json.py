@@ -0,0 +1,36 @@
+# backend/api/cached_json.py
+# Pre-serialized JSON responses with strong ETags, for static catalogs
+
+import os
+import json
+import hashlib
+from typing import Any, Optional
+from fastapi import Request, Response
+
+# Seconds clients and CDNs may reuse a catalog before revalidating with If-None-Match
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "300"))
+
+
+class CachedJSON:
+    """A JSON body serialized once and served as bytes.
+
+    The ETag is a hash of the body, so it changes exactly when the content
+    does; a request whose If-None-Match carries it gets an empty 304.
+    """
+
+    def __init__(self, content: Any, max_age: int = CATALOG_CACHE_MAX_AGE):
+        self.body = json.dumps(content, separators=(",", ":")).encode()
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.headers = {"ETag": self.etag, "Cache-Control": f"public, max-age={max_age}"}
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        # If-None-Match uses weak comparison: W/"x" matches "x"
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+    def response(self, request: Request) -> Response:
+        if self.not_modified(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=self.headers)
+        return Response(self.body, media_type="application/json", headers=self.headers)
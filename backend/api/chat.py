@@ -1,79 +1,233 @@
 # backend/api/chat.py
 # Chat endpoints with encryption (Wootzapp)
 
+import json
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from contextlib import aclosing
+from typing import AsyncIterator, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from cryptography.fernet import Fernet
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import get_db
+from backend.api.pagination import decode_cursor, encode_cursor
 from backend.models import ChatMessage
-from backend.schemas import ChatRequest, ChatResponse
+from backend.schemas import ChatBatchRequest, ChatBatchResponse, ChatHistoryPage, ChatRequest, ChatResponse
+from backend.services.ai_agent import AIAgent
 from backend.services.encryption import EncryptionService
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 encryption_service = EncryptionService()
+ai_agent = AIAgent()
 
 
-def get_db():
-    """Database dependency - will be imported from main.py"""
-    pass
+async def chat_cipher(user_id: int, encrypted: bool) -> Optional[Fernet]:
+    """The user's own cipher if the exchange is encrypted (cached after the first KDF)"""
+    return await encryption_service.user_cipher(user_id) if encrypted else None
 
 
-@router.post("/send", response_model=ChatResponse)
-async def send_chat_message(
-    chat_request: ChatRequest,
+def encrypt_text(cipher: Fernet, text: str) -> str:
+    return cipher.encrypt(text.encode()).decode()
+
+
+def build_chat_message(
     user_id: int,
-    db: Session = Depends(get_db)
-):
-    """Send encrypted message to AI agent"""
-    logger.info(f"Processing chat message from user: {user_id}")
-    
-    # Encrypt message if requested
+    chat_request: ChatRequest,
+    cipher: Optional[Fernet],
+    ai_response: Optional[str] = None
+) -> ChatMessage:
+    """Build the row for an exchange, encrypting both sides with the user's key if requested"""
     message = chat_request.message
-    if chat_request.encrypted:
-        encrypted_msg = encryption_service.encrypt_message(message)
-        message = encrypted_msg
     
     # Get AI response
-    ai_response = f"AI Agent: I'll help you with '{chat_request.message[:50]}...'"
+    if ai_response is None:
+        ai_response = f"AI Agent: I'll help you with '{chat_request.message[:50]}...'"
     
     if chat_request.encrypted:
-        encrypted_response = encryption_service.encrypt_message(ai_response)
-        ai_response = encrypted_response
+        message = encrypt_text(cipher, message)
+        ai_response = encrypt_text(cipher, ai_response)
     
-    # Save to database
-    chat_msg = ChatMessage(
+    return ChatMessage(
         user_id=user_id,
         message=message,
         response=ai_response,
-        encrypted=chat_request.encrypted
+        encrypted=chat_request.encrypted,
+        key_id=encryption_service.key_id if chat_request.encrypted else None
     )
+
+
+@router.post("/send", response_model=ChatResponse)
+async def send_chat_message(
+    chat_request: ChatRequest,
+    user_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Send encrypted message to AI agent"""
+    logger.info(f"Processing chat message from user: {user_id}")
+    
+    cipher = await chat_cipher(user_id, chat_request.encrypted)
+    chat_msg = build_chat_message(user_id, chat_request, cipher)
     db.add(chat_msg)
-    db.commit()
+    await db.commit()
     
     return ChatResponse(
         message="Message sent successfully",
-        response=ai_response if not chat_request.encrypted else "Encrypted response",
+        response=chat_msg.response if not chat_request.encrypted else "Encrypted response",
         encrypted=chat_request.encrypted,
         encryption_provider="Wootzapp"
     )
 
 
-@router.get("/history")
-async def get_chat_history(user_id: int, db: Session = Depends(get_db)):
-    """Get user chat history"""
-    messages = db.query(ChatMessage).filter(ChatMessage.user_id == user_id).all()
-    return {"messages": messages}
+@router.post("/send/batch", response_model=ChatBatchResponse)
+async def send_chat_messages(
+    batch: ChatBatchRequest,
+    user_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Send up to 100 messages in one request, stored in a single transaction"""
+    logger.info(f"Processing {len(batch.messages)} chat messages from user: {user_id}")
+    
+    cipher = await chat_cipher(user_id, any(chat_request.encrypted for chat_request in batch.messages))
+    # Encryption is CPU-bound; keep it off the event loop
+    chat_msgs = await asyncio.to_thread(
+        lambda: [build_chat_message(user_id, chat_request, cipher) for chat_request in batch.messages]
+    )
+    db.add_all(chat_msgs)
+    await db.commit()
+    
+    return ChatBatchResponse(
+        message=f"{len(chat_msgs)} messages sent successfully",
+        messages=chat_msgs,
+        encryption_provider="Wootzapp"
+    )
+
+
+@router.get("/history", response_model=ChatHistoryPage)
+async def get_chat_history(
+    user_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get user chat history, newest first.
+    
+    Keyset-paginated on (created_at, id): pass next_cursor from the
+    previous page to continue. Each page is one index range scan.
+    """
+    query = select(ChatMessage).where(ChatMessage.user_id == user_id)
+    if cursor:
+        created_at, message_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(created_at, message_id)
+        )
+    query = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1)
+    
+    messages = (await db.scalars(query)).all()
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    
+    return ChatHistoryPage(
+        messages=messages,
+        next_cursor=encode_cursor(messages[-1]) if has_more else None,
+        has_more=has_more
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_chat_reply(
+    db: AsyncSession,
+    user_id: int,
+    chat_request: ChatRequest
+) -> AsyncIterator[Tuple[str, dict]]:
+    """Stream the AI Agent's reply as ("chunk", ...) events, then ("done", ...).
+    
+    Each chunk is encrypted on its own with the user's key when the
+    request is encrypted, so clients can decrypt and render as chunks
+    arrive. The exchange is stored once the reply is complete; an
+    abandoned stream stores nothing.
+    """
+    cipher = await chat_cipher(user_id, chat_request.encrypted)
+    chunks = []
+    async for chunk in ai_agent.stream_chain(chat_request.message):
+        chunks.append(chunk)
+        yield "chunk", {"data": encrypt_text(cipher, chunk) if cipher else chunk}
+    
+    chat_msg = build_chat_message(user_id, chat_request, cipher, "".join(chunks))
+    db.add(chat_msg)
+    await db.commit()
+    yield "done", {"id": chat_msg.id, "encrypted": chat_msg.encrypted, "chunks": len(chunks)}
+
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, user_id: int, db: AsyncSession = Depends(get_db)):
+    """Stream AI replies over a WebSocket conversation.
+    
+    Send {"message": ..., "encrypted": ...} per turn; each reply arrives as
+    {"event": "chunk", "data": ...} messages followed by {"event": "done"}.
+    Disconnecting mid-reply cancels the LLM request.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                chat_request = ChatRequest.model_validate(await websocket.receive_json())
+            except ValueError as e:
+                await websocket.send_json({"event": "error", "detail": f"Invalid message: {e}"})
+                continue
+            
+            try:
+                async with aclosing(stream_chat_reply(db, user_id, chat_request)) as events:
+                    async for event, data in events:
+                        await websocket.send_json({"event": event, **data})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"Streaming chat reply for user {user_id} failed: {e}")
+                await db.rollback()
+                await websocket.send_json({"event": "error", "detail": str(e) or type(e).__name__})
+    except WebSocketDisconnect:
+        logger.info(f"Chat WebSocket closed for user: {user_id}")
+
+
+@router.post("/stream")
+async def stream_chat_message(
+    chat_request: ChatRequest,
+    user_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream an AI reply as server-sent events (fallback for clients without WebSockets)"""
+    async def events():
+        async with aclosing(stream_chat_reply(db, user_id, chat_request)) as reply:
+            try:
+                async for event, data in reply:
+                    yield sse_event(event, data)
+            except Exception as e:
+                logger.error(f"Streaming chat reply for user {user_id} failed: {e}")
+                yield sse_event("error", {"detail": str(e) or type(e).__name__})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.delete("/{message_id}")
-async def delete_message(message_id: int, db: Session = Depends(get_db)):
+async def delete_message(message_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a chat message"""
-    message = db.query(ChatMessage).filter(ChatMessage.id == message_id).first()
+    message = await db.get(ChatMessage, message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
-    db.delete(message)
-    db.commit()
+    await db.delete(message)
+    await db.commit()
     
     return {"message": "Message deleted successfully"}
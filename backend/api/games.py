@@ -3,32 +3,55 @@
 
 import logging
 import uuid
-from pathlib import Path
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
-from sqlalchemy.orm import Session
-from backend.models import Game, GameAsset
-from backend.schemas import GameCreate, GameResponse
-from backend.services.dojo_engine import DojoEngine
+from functools import lru_cache
+from typing import FrozenSet, List, Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from backend.database import get_db
+from backend.models import Game, GameAsset, GameRevenue, GameStats
+from backend.schemas import GameCreate, GameResponse, UploadSessionCreate, AssetReference
+from backend.services.dojo_engine import DojoEngine, load_template_catalog
+from backend.services.storage import AssetStorage
+from backend.services.asset_store import AssetStore
+from backend.services.rollups import add_assets, delete_game_rollups, format_amount
+from backend.api.cache import cached_game, entity_cache
+from backend.api.cached_json import CachedJSON
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/games", tags=["games"])
+asset_storage = AssetStorage()
+asset_store = AssetStore(asset_storage)
 
 
-def get_db():
-    """Database dependency - will be imported from main.py"""
-    pass
+@lru_cache(maxsize=None)
+def templates_response(features: FrozenSet[str] = frozenset()) -> CachedJSON:
+    """Serialized template catalog, limited to templates having every feature (lowercase)"""
+    catalog = load_template_catalog()
+    templates = [
+        template for template in catalog["templates"]
+        if features <= {feature.lower() for feature in template["features"]}
+    ]
+    return CachedJSON({"version": catalog["version"], "templates": templates})
 
 
 @router.get("/templates")
-async def get_templates():
-    """Get all available open-source game templates"""
-    templates = await DojoEngine.get_game_templates()
-    return {"templates": templates}
+async def get_templates(request: Request, feature: Optional[List[str]] = Query(None)):
+    """Get available open-source game templates, optionally only those with every given feature.
+    
+    Each filter's response is serialized once and carries a strong ETag;
+    send it back in If-None-Match to get 304 Not Modified.
+    """
+    features = frozenset(f.strip().lower() for f in feature or ())
+    known = {f.lower() for template in load_template_catalog()["templates"] for f in template["features"]}
+    # Unknown features match nothing; share one response so arbitrary filters are not cached
+    return templates_response(features if features <= known else frozenset({""})).response(request)
 
 
 @router.post("/create", response_model=dict)
-async def create_game(game: GameCreate, user_id: int, db: Session = Depends(get_db)):
+async def create_game(game: GameCreate, user_id: int, db: AsyncSession = Depends(get_db)):
     """Create a new game project"""
     logger.info(f"Creating game: {game.title}")
     
@@ -47,8 +70,9 @@ async def create_game(game: GameCreate, user_id: int, db: Session = Depends(get_
         dojo_contract_address=world_address
     )
     db.add(new_game)
-    db.commit()
-    db.refresh(new_game)
+    await db.commit()
+    await db.refresh(new_game)
+    await entity_cache.invalidate(Game, game_id)
     
     return {
         "game_id": game_id,
@@ -60,9 +84,9 @@ async def create_game(game: GameCreate, user_id: int, db: Session = Depends(get_
 
 
 @router.get("/{game_id}", response_model=GameResponse)
-async def get_game(game_id: str, db: Session = Depends(get_db)):
+async def get_game(game_id: str, db: AsyncSession = Depends(get_db)):
     """Get game details"""
-    game = db.query(Game).filter(Game.game_id == game_id).first()
+    game = await cached_game(db, game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
@@ -73,71 +97,206 @@ async def get_game(game_id: str, db: Session = Depends(get_db)):
 async def upload_game_assets(
     game_id: str,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload game assets"""
     logger.info(f"Uploading assets for game: {game_id}")
     
-    # Save file
-    upload_dir = Path("uploads") / game_id
-    upload_dir.mkdir(parents=True, exist_ok=True)
+    game = await db.scalar(select(Game).where(Game.game_id == game_id))
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
     
-    file_path = upload_dir / file.filename
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    # Stream file to disk in chunks, then store it by content hash
+    filename = asset_storage.safe_filename(file.filename)
+    stored = await asset_storage.save_upload(file)
+    blob = await asset_store.put(db, stored)
     
     # Save to database
-    game = db.query(Game).filter(Game.game_id == game_id).first()
+    asset = GameAsset(
+        game_id=game.id,
+        asset_type=file.content_type,
+        filename=filename,
+        file_path=blob.file_path,
+        file_size=blob.size,
+        content_hash=blob.sha256
+    )
+    db.add(asset)
+    await add_assets(db, game.id, size=blob.size)
+    await db.commit()
+    await asset_store.promote(stored)
+    
+    return {
+        "message": "File uploaded successfully",
+        "filename": filename,
+        "size": blob.size,
+        "sha256": blob.sha256,
+        "deduplicated": blob.ref_count > 1
+    }
+
+
+@router.head("/blobs/{sha256}")
+@router.get("/blobs/{sha256}")
+async def check_blob(sha256: str, db: AsyncSession = Depends(get_db)):
+    """Check whether asset bytes are already stored"""
+    blob = await asset_store.exists(db, sha256.lower())
+    if not blob:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    
+    return {"sha256": blob.sha256, "size": blob.size}
+
+
+@router.post("/upload/by-hash")
+async def upload_asset_by_hash(reference: AssetReference, db: AsyncSession = Depends(get_db)):
+    """Attach already-stored bytes to a game without re-uploading them"""
+    game = await db.scalar(select(Game).where(Game.game_id == reference.game_id))
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
+    filename = asset_storage.safe_filename(reference.filename)
+    blob = await asset_store.reference(db, reference.sha256.lower())
+    if not blob:
+        raise HTTPException(status_code=404, detail="Blob not found, upload the file instead")
+    
     asset = GameAsset(
         game_id=game.id,
-        asset_type=file.content_type,
-        file_path=str(file_path),
-        file_size=len(content)
+        asset_type=reference.content_type,
+        filename=filename,
+        file_path=blob.file_path,
+        file_size=blob.size,
+        content_hash=blob.sha256
+    )
+    db.add(asset)
+    await add_assets(db, game.id, size=blob.size)
+    await db.commit()
+    
+    return {
+        "message": "File linked successfully",
+        "filename": filename,
+        "size": blob.size,
+        "sha256": blob.sha256,
+        "deduplicated": True
+    }
+
+
+@router.post("/uploads", response_model=dict)
+async def create_upload_session(session: UploadSessionCreate, db: AsyncSession = Depends(get_db)):
+    """Start a resumable multipart upload"""
+    game = await db.scalar(select(Game).where(Game.game_id == session.game_id))
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    
+    manifest = await asset_storage.create_session(
+        session.game_id,
+        session.filename,
+        session.content_type,
+        session.total_size
+    )
+    manifest["chunk_size"] = asset_storage.chunk_size
+    return manifest
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """Get received parts so a client can resume an upload"""
+    return await asset_storage.get_session(upload_id)
+
+
+@router.put("/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(upload_id: str, part_number: int, request: Request):
+    """Upload one part of a multipart upload as the raw request body"""
+    return await asset_storage.write_part(upload_id, part_number, request.stream())
+
+
+@router.post("/uploads/{upload_id}/commit")
+async def commit_upload_session(upload_id: str, db: AsyncSession = Depends(get_db)):
+    """Assemble uploaded parts into a game asset"""
+    session = await asset_storage.get_session(upload_id)
+    
+    game = await db.scalar(select(Game).where(Game.game_id == session["game_id"]))
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    
+    stored = await asset_storage.commit_session(upload_id, asset_storage.incoming_path())
+    blob = await asset_store.put(db, stored)
+    
+    asset = GameAsset(
+        game_id=game.id,
+        asset_type=session["content_type"],
+        filename=session["filename"],
+        file_path=blob.file_path,
+        file_size=blob.size,
+        content_hash=blob.sha256
     )
     db.add(asset)
-    db.commit()
+    await add_assets(db, game.id, size=blob.size)
+    await db.commit()
+    await asset_store.promote(stored)
     
     return {
         "message": "File uploaded successfully",
-        "filename": file.filename,
-        "size": len(content)
+        "filename": session["filename"],
+        "size": blob.size,
+        "sha256": blob.sha256,
+        "deduplicated": blob.ref_count > 1
     }
 
 
+@router.delete("/uploads/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    """Abort a multipart upload and discard its parts"""
+    await asset_storage.abort_session(upload_id)
+    return {"message": "Upload aborted"}
+
+
 @router.get("/{game_id}/stats")
-async def get_game_stats(game_id: str, db: Session = Depends(get_db)):
-    """Get game statistics and analytics"""
-    game = db.query(Game).filter(Game.game_id == game_id).first()
+async def get_game_stats(game_id: str, db: AsyncSession = Depends(get_db)):
+    """Get game statistics and analytics, read from the per-game rollups"""
+    game = await cached_game(db, game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
+    rollup = await db.get(GameStats, game.id)
+    revenue = {
+        row.currency: row.total
+        for row in await db.scalars(select(GameRevenue).where(GameRevenue.game_id == game.id))
+    }
+    
     stats = {
         "game_id": game_id,
         "title": game.title,
         "status": game.status,
         "created_at": game.created_at.isoformat(),
         "published_at": game.published_at.isoformat() if game.published_at else None,
-        "total_assets": len(game.assets),
+        "total_assets": rollup.asset_count if rollup else 0,
+        "total_asset_bytes": rollup.asset_bytes if rollup else 0,
         "contract_address": game.dojo_contract_address,
         "players": 0,
-        "revenue": "0 STRK"
+        "revenue": f"{format_amount(revenue.get('STRK', 0))} STRK",
+        "revenue_by_currency": {currency: format_amount(total) for currency, total in sorted(revenue.items())}
     }
     
     return stats
 
 
 @router.delete("/{game_id}")
-async def delete_game(game_id: str, db: Session = Depends(get_db)):
+async def delete_game(game_id: str, db: AsyncSession = Depends(get_db)):
     """Delete a game"""
-    game = db.query(Game).filter(Game.game_id == game_id).first()
+    game = await db.scalar(
+        select(Game).where(Game.game_id == game_id).options(selectinload(Game.assets))
+    )
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     
-    db.delete(game)
-    db.commit()
+    # Release blob references and collect blobs no other game uses
+    hashes = [asset.content_hash for asset in game.assets if asset.content_hash]
+    await asset_store.release(db, hashes)
+    for asset in game.assets:
+        await db.delete(asset)
+    await delete_game_rollups(db, game.id)
+    await db.delete(game)
+    orphaned = await asset_store.collect_garbage(db, hashes)
+    await db.commit()
+    await entity_cache.invalidate(Game, game_id)
+    await asset_store.remove_files(db, orphaned)
     
     return {"message": "Game deleted successfully"}
@@ -5,5 +5,6 @@ from .users import router as users_router
 from .games import router as games_router
 from .payments import router as payments_router
 from .chat import router as chat_router
+from .jobs import router as jobs_router
 
-__all__ = ['users_router', 'games_router', 'payments_router', 'chat_router']
+__all__ = ['users_router', 'games_router', 'payments_router', 'chat_router', 'jobs_router']
@@ -0,0 +1,43 @@
+# backend/api/jobs.py
+# Background job status endpoints
+
+import logging
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import AsyncSessionLocal, get_db
+from backend.services.jobs import JobQueue, job_status
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+job_queue = JobQueue(AsyncSessionLocal)
+
+
+def job_accepted(job) -> dict:
+    """Response body for an enqueued job"""
+    return {
+        "job_id": job.job_id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "status_url": f"/jobs/{job.job_id}"
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Get background job status and result"""
+    job = await job_queue.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job_status(job)
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Cancel a queued or running job"""
+    job = await job_queue.cancel(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job_status(job)
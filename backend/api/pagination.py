@@ -0,0 +1,21 @@
+# backend/api/pagination.py
+# Opaque keyset cursors shared by paginated endpoints
+
+import base64
+from datetime import datetime
+from typing import Tuple
+from fastapi import HTTPException
+
+
+def encode_cursor(row) -> str:
+    """Opaque keyset cursor for the position after `row` (anything with created_at and id)"""
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
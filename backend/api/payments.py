@@ -1,102 +1,476 @@
 # backend/api/payments.py
 # Payment processing endpoints
 
-import logging
+import io
+import os
+import csv
+import json
 import uuid
+import asyncio
+import hashlib
+import logging
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from backend.models import Game, Transaction
-from backend.schemas import GamePublish, TransactionResponse, PaymentMethod
-from backend.services.payment import PaymentProcessor
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from backend.database import AsyncSessionLocal, get_db
+from backend.models import Game, Job, Publication, Transaction
+from backend.schemas import GamePublish, TransactionPage, TransactionResponse, PaymentMethod
+from backend.services.payment import PAYMENT_METHODS, PaymentProcessor
+from backend.services.bitcoin import BitcoinSettlement, create_bitcoin_rpc
+from backend.services.starknet import TransactionReverted
 from backend.services.dojo_engine import DojoEngine
+from backend.services.rollups import add_revenue, format_amount
+from backend.services.jobs import PermanentJobError
+from backend.api.jobs import job_queue, job_accepted
+from backend.api.pagination import decode_cursor, encode_cursor
+from backend.api.cache import entity_cache
+from backend.api.cached_json import CachedJSON
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per server-side cursor round trip when exporting
+EXPORT_BATCH_SIZE = int(os.getenv("PAYMENTS_EXPORT_BATCH_SIZE", "1000"))
+EXPORT_FIELDS = (
+    "transaction_id", "user_id", "game_id", "payment_method", "amount", "currency",
+    "status", "blockchain_tx_hash", "created_at", "confirmed_at"
+)
+
 router = APIRouter(prefix="/payments", tags=["payments"])
-payment_processor = PaymentProcessor()
+bitcoin_rpc = create_bitcoin_rpc()
+payment_processor = PaymentProcessor(bitcoin_rpc=bitcoin_rpc)
+bitcoin_settlement = BitcoinSettlement(AsyncSessionLocal, bitcoin_rpc, entity_cache=entity_cache)
+payment_methods = CachedJSON({"methods": list(PAYMENT_METHODS)})
 
 
-def get_db():
-    """Database dependency - will be imported from main.py"""
-    pass
+@router.get("/methods")
+async def get_payment_methods(request: Request):
+    """Get available payment methods (pre-serialized, ETag/If-None-Match aware)"""
+    return payment_methods.response(request)
 
 
-@router.get("/methods")
-async def get_payment_methods():
-    """Get available payment methods"""
-    return await payment_processor.get_payment_methods()
+def publication_accepted(job: Job, publication: Publication) -> dict:
+    return {
+        **job_accepted(job),
+        "publication_id": publication.id,
+        "publication_status": publication.status,
+        "idempotency_key": publication.idempotency_key
+    }
 
 
-@router.post("/publish", response_model=dict)
-async def publish_game(publish_request: GamePublish, db: Session = Depends(get_db)):
-    """Publish game to mobile platforms with payment"""
-    logger.info(f"Publishing game: {publish_request.game_id}")
+@router.post("/publish", response_model=dict, status_code=202)
+async def publish_game(
+    publish_request: GamePublish,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue game publishing; poll /jobs/{job_id} for the result.
     
-    game = db.query(Game).filter(Game.game_id == publish_request.game_id).first()
-    if not game:
-        raise HTTPException(status_code=404, detail="Game not found")
+    Idempotent: a retry with the same Idempotency-Key header (or, without
+    one, the same body) returns the original publication instead of
+    deploying and charging again, and resumes it if its job failed. A
+    request with a new key for a game whose publication failed takes that
+    publication over and resumes it; one that is still running or already
+    published is a conflict, as is losing a race with another key (a game
+    has at most one publication).
+    """
+    payload = publish_request.model_dump(mode="json")
+    request_hash = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    key = idempotency_key or f"auto:{request_hash}"
     
-    # Deploy contracts
-    contracts = await DojoEngine.deploy_game_contracts(
-        publish_request.game_id,
-        game.dojo_contract_address
-    )
+    publication = await db.scalar(select(Publication).where(Publication.idempotency_key == key))
+    if publication is None:
+        # Row lock serializes concurrent publishes of one game (Postgres; SQLite serializes writers)
+        game = await db.scalar(
+            select(Game).where(Game.game_id == publish_request.game_id).with_for_update()
+        )
+        if not game:
+            raise HTTPException(status_code=404, detail="Game not found")
+        
+        existing = await db.scalar(select(Publication).where(Publication.game_id == game.id))
+        if existing is not None and existing.idempotency_key != key:
+            return await take_over_publication(db, existing, publish_request, key, request_hash)
+        publication = existing
+    
+    if publication is None:
+        try:
+            publication = Publication(
+                idempotency_key=key,
+                request_hash=request_hash,
+                game_id=game.id,
+                payment_method=publish_request.payment_method.value,
+                amount=publish_request.payment_amount,
+                status="pending"
+            )
+            db.add(publication)
+            await db.flush()
+            job = await job_queue.enqueue(db, "publish_game", {"publication_id": publication.id}, commit=False)
+            publication.job_id = job.job_id
+            await db.commit()
+        except IntegrityError:
+            # A concurrent request won the insert: with the same key, replay it;
+            # with another key, it holds the game's one publication
+            await db.rollback()
+            publication = await db.scalar(select(Publication).where(Publication.idempotency_key == key))
+            if publication is None:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Game already has a publication; retry with its Idempotency-Key"
+                )
+        else:
+            job_queue.notify("publish_game")
+            return publication_accepted(job, publication)
+    
+    if publication.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    
+    response.headers["Idempotent-Replayed"] = "true"
+    job = await job_queue.get(db, publication.job_id)
+    if job.status in ("failed", "cancelled") and publication.status != "published":
+        job = await resume_publication(db, publication, job.job_id)
+    return publication_accepted(job, publication)
+
+
+async def take_over_publication(
+    db: AsyncSession,
+    publication: Publication,
+    publish_request: GamePublish,
+    key: str,
+    request_hash: str
+) -> dict:
+    """Resume a game's failed publication under a new idempotency key.
     
-    # Process payment
-    if publish_request.payment_method == PaymentMethod.CHIPI_PAY:
-        tx_hash = await payment_processor.process_starknet_payment(
-            from_address=game.developer.wallet_address,
-            to_address="0x_platform_address",
-            amount=publish_request.payment_amount
+    Completed steps are kept, so contracts are not redeployed and a
+    payment already sent is not sent again; the new request's payment
+    method and amount apply only if no payment was made yet.
+    """
+    job = await job_queue.get(db, publication.job_id)
+    if publication.status == "published" or job.status not in ("failed", "cancelled"):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Game already has a publication ({publication.status}); retry with its Idempotency-Key"
         )
-    else:
-        tx_hash = await payment_processor.process_bitcoin_payment(
-            method=publish_request.payment_method.value,
-            from_address=game.developer.wallet_address,
-            to_address="platform_btc_address",
-            amount=float(publish_request.payment_amount)
+    
+    changes = {"idempotency_key": key, "request_hash": request_hash}
+    payment = (publish_request.payment_method.value, publish_request.payment_amount)
+    if publication.payment_tx_hash is None and publication.payment_pending_tx_hash is None:
+        changes.update(payment_method=payment[0], amount=payment[1])
+    elif (publication.payment_method, publication.amount) != payment:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Game's failed publication was already paid with {publication.payment_method}; "
+                   f"retry with the same payment"
         )
+    job = await resume_publication(db, publication, job.job_id, **changes)
+    return publication_accepted(job, publication)
+
+
+async def resume_publication(db: AsyncSession, publication: Publication, failed_job_id: str, **changes) -> Job:
+    """Queue a new job continuing a publication from its last committed state"""
+    job = await job_queue.enqueue(db, "publish_game", {"publication_id": publication.id}, commit=False)
+    # Conditional update: concurrent retries queue one job between them
+    result = await db.execute(
+        update(Publication)
+        .where(Publication.id == publication.id, Publication.job_id == failed_job_id)
+        .values(job_id=job.job_id, error=None, updated_at=datetime.utcnow(), **changes)
+    )
+    if result.rowcount != 1:
+        await db.rollback()
+        await db.refresh(publication)
+        return await job_queue.get(db, publication.job_id)
+    
+    await db.commit()
+    job_queue.notify("publish_game")
+    await db.refresh(publication)
+    return job
+
+
+async def charge_publication(db: AsyncSession, publication: Publication, game: Game) -> str:
+    """Charge the developer once per publication; returns the payment reference.
     
-    # Update game status
-    game.status = "published"
-    game.published_at = datetime.utcnow()
-    db.commit()
-    
-    # Record transaction
-    transaction = Transaction(
-        transaction_id=f"tx_{uuid.uuid4().hex[:16]}",
-        user_id=game.developer_id,
-        payment_method=publish_request.payment_method.value,
-        amount=publish_request.payment_amount,
-        currency="STRK" if publish_request.payment_method == PaymentMethod.CHIPI_PAY else "BTC",
-        status="completed",
-        blockchain_tx_hash=tx_hash
+    Bitcoin payments are invoiced: the reference is a fresh wallet address
+    for the developer to pay, which BitcoinSettlement watches. A Starknet
+    transfer's hash is committed before waiting for its receipt,
+    so a retry (after a receipt timeout, a crash, or on another worker)
+    resumes polling that transfer instead of sending a second one. Only a
+    transfer that reverted, and so charged nothing, is sent again.
+    """
+    if publication.payment_method != PaymentMethod.CHIPI_PAY.value:
+        return await payment_processor.process_bitcoin_payment(
+            method=publication.payment_method,
+            amount=publication.amount,
+            label=f"publication {publication.id}"
+        )
+    
+    merge = True
+    while True:
+        if publication.payment_pending_tx_hash is None:
+            publication.payment_pending_tx_hash = await payment_processor.submit_starknet_payment(
+                from_address=game.developer.wallet_address,
+                to_address=payment_processor.starknet_platform_address,
+                amount=str(publication.amount),
+                merge=merge
+            )
+            publication.updated_at = datetime.utcnow()
+            await db.commit()
+            # Committing released the row lock; hold it again until the results are written
+            await db.execute(select(Publication.id).where(Publication.id == publication.id).with_for_update())
+        try:
+            return await payment_processor.confirm_starknet_payment(publication.payment_pending_tx_hash)
+        except TransactionReverted:
+            publication.payment_pending_tx_hash = None
+            if not merge:
+                raise
+            # Possibly a multicall failed by another payment: resend this one on its own
+            merge = False
+
+
+async def payment_settled(db: AsyncSession, publication: Publication) -> bool:
+    """Whether a charged publication's payment has arrived (Bitcoin: its invoice confirmed)"""
+    if publication.payment_method == PaymentMethod.CHIPI_PAY.value:
+        return True
+    status = await db.scalar(
+        select(Transaction.status).where(Transaction.transaction_id == publication.transaction_id)
     )
-    db.add(transaction)
-    db.commit()
+    return status == "confirmed"
+
+
+def step_error(step: str, error: Exception) -> str:
+    return f"{step}: {error}" if str(error) else f"{step}: {type(error).__name__}"
+
+
+# Every step records its result before the next attempt, so retries resume instead of repeating
+@job_queue.handler("publish_game", concurrency=4, max_attempts=3)
+async def run_publish_game(db: AsyncSession, payload: dict):
+    """Publish game to mobile platforms with payment.
+    
+    State machine over the publication row (locked for the duration):
+    pending -> deployed -> paid -> published. Contract deployment and
+    payment are independent, so missing steps run concurrently; their
+    results, the Transaction and the game status are then committed
+    together. If a step fails, the other's result is still committed and
+    the job is retried from that state. A Bitcoin publication whose
+    invoice is not confirmed yet ends in awaiting_payment instead, and
+    BitcoinSettlement publishes it once the payment confirms.
+    """
+    publication = await db.scalar(
+        select(Publication)
+        .where(Publication.id == payload["publication_id"])
+        .options(selectinload(Publication.game).selectinload(Game.developer))
+        .with_for_update()
+    )
+    if not publication:
+        raise PermanentJobError("Publication not found")
+    game = publication.game
+    logger.info(f"Publishing game: {game.game_id} ({publication.status})")
     
+    if publication.status != "published":
+        steps = {}
+        if publication.contracts is None:
+            steps["deploy"] = DojoEngine.deploy_game_contracts(game.game_id, game.dojo_contract_address)
+        if publication.payment_tx_hash is None:
+            steps["payment"] = charge_publication(db, publication, game)
+        results = dict(zip(steps, await asyncio.gather(*steps.values(), return_exceptions=True)))
+        
+        errors = [step_error(step, result) for step, result in results.items() if isinstance(result, Exception)]
+        if "deploy" in results and not isinstance(results["deploy"], Exception):
+            publication.contracts = json.dumps(results["deploy"])
+        if "payment" in results and not isinstance(results["payment"], Exception):
+            publication.payment_tx_hash = results["payment"]
+            publication.payment_pending_tx_hash = None
+            starknet = publication.payment_method == PaymentMethod.CHIPI_PAY.value
+            # Bitcoin payments stay pending until the developer's payment to the invoice confirms
+            transaction = Transaction(
+                transaction_id=f"tx_{uuid.uuid4().hex[:16]}",
+                user_id=game.developer_id,
+                game_id=game.id,
+                payment_method=publication.payment_method,
+                amount=publication.amount,
+                currency="STRK" if starknet else "BTC",
+                status="completed" if starknet else "pending",
+                blockchain_tx_hash=publication.payment_tx_hash if starknet else None,
+                to_address=None if starknet else publication.payment_tx_hash
+            )
+            db.add(transaction)
+            await db.flush()
+            publication.transaction_id = transaction.transaction_id
+            if starknet:
+                await add_revenue(db, [(game.id, transaction.currency, transaction.amount)])
+        
+        if publication.contracts is not None:
+            publication.status = "paid" if publication.payment_tx_hash is not None else "deployed"
+        if not errors and await payment_settled(db, publication):
+            game.status = "published"
+            game.published_at = datetime.utcnow()
+            publication.status = "published"
+        elif not errors:
+            publication.status = "awaiting_payment"
+        publication.error = "; ".join(errors) or None
+        publication.updated_at = datetime.utcnow()
+        await db.commit()
+        if publication.status == "published":
+            await entity_cache.invalidate(Game, game.game_id)
+        if "payment" in results and publication.payment_method != PaymentMethod.CHIPI_PAY.value:
+            bitcoin_settlement.notify()
+        
+        if errors:
+            raise RuntimeError(publication.error)
+    
+    starknet = publication.payment_method == PaymentMethod.CHIPI_PAY.value
+    live = publication.status == "published"
     return {
-        "message": "Game published successfully",
-        "game_id": publish_request.game_id,
-        "contracts": contracts,
-        "transaction_hash": tx_hash,
-        "status": "live",
+        "message": "Game published successfully" if live else "Game deployed; it goes live once the payment confirms",
+        "game_id": game.game_id,
+        "contracts": json.loads(publication.contracts),
+        "transaction_hash": publication.payment_tx_hash if starknet else None,
+        # Bitcoin: the invoice address the developer pays the fee to
+        "payment_address": None if starknet else publication.payment_tx_hash,
+        "status": "live" if live else "awaiting_payment",
         "platforms": ["iOS", "Android", "Web"]
     }
 
 
-@router.get("/history")
-async def get_payment_history(user_id: int, db: Session = Depends(get_db)):
-    """Get user payment history"""
-    transactions = db.query(Transaction).filter(Transaction.user_id == user_id).all()
-    return {"transactions": transactions}
+def transaction_filters(
+    status: Optional[List[str]],
+    currency: Optional[List[str]],
+    payment_method: Optional[List[str]],
+    since: Optional[datetime],
+    until: Optional[datetime]
+) -> list:
+    """WHERE conditions for history/export filters (since inclusive, until exclusive)"""
+    conditions = []
+    if status:
+        conditions.append(Transaction.status.in_(status))
+    if currency:
+        conditions.append(Transaction.currency.in_(currency))
+    if payment_method:
+        conditions.append(Transaction.payment_method.in_(payment_method))
+    if since:
+        conditions.append(Transaction.created_at >= since)
+    if until:
+        conditions.append(Transaction.created_at < until)
+    return conditions
+
+
+@router.get("/history", response_model=TransactionPage)
+async def get_payment_history(
+    user_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    currency: Optional[List[str]] = Query(None),
+    payment_method: Optional[List[str]] = Query(None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get user payment history, newest first.
+    
+    Keyset-paginated on (created_at, id) over ix_transactions_user_created:
+    pass next_cursor from the previous page to continue. Filters may be
+    repeated to match any of several values.
+    """
+    query = select(Transaction).where(
+        Transaction.user_id == user_id,
+        *transaction_filters(status, currency, payment_method, since, until)
+    )
+    if cursor:
+        created_at, transaction_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(Transaction.created_at, Transaction.id) < tuple_(created_at, transaction_id)
+        )
+    query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1)
+    
+    transactions = (await db.scalars(query)).all()
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+    
+    return TransactionPage(
+        transactions=transactions,
+        next_cursor=encode_cursor(transactions[-1]) if has_more else None,
+        has_more=has_more
+    )
+
+
+def export_record(row) -> dict:
+    return {
+        "transaction_id": row.transaction_id,
+        "user_id": row.user_id,
+        "game_id": row.game_id,
+        "payment_method": row.payment_method,
+        "amount": format_amount(row.amount) if row.amount is not None else None,
+        "currency": row.currency,
+        "status": row.status,
+        "blockchain_tx_hash": row.blockchain_tx_hash,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "confirmed_at": row.confirmed_at.isoformat() if row.confirmed_at else None,
+    }
+
+
+def format_csv(records: List[dict], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue()
+
+
+@router.get("/export")
+async def export_transactions(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    user_id: Optional[int] = None,
+    status: Optional[List[str]] = Query(None),
+    currency: Optional[List[str]] = Query(None),
+    payment_method: Optional[List[str]] = Query(None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream transactions oldest first as CSV or NDJSON, for accounting.
+    
+    Rows are read through a server-side cursor in batches of
+    PAYMENTS_EXPORT_BATCH_SIZE and written as they arrive, so memory stays
+    flat however many rows match. Omit user_id to export every user.
+    """
+    conditions = transaction_filters(status, currency, payment_method, since, until)
+    if user_id is not None:
+        conditions.append(Transaction.user_id == user_id)
+    query = (
+        select(*(getattr(Transaction, field) for field in EXPORT_FIELDS))
+        .where(*conditions)
+        .order_by(Transaction.created_at, Transaction.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    
+    async def rows():
+        result = await db.stream(query)
+        if export_format == "csv":
+            yield format_csv([], header=True)
+        async for partition in result.partitions():
+            records = [export_record(row) for row in partition]
+            if export_format == "csv":
+                yield format_csv(records)
+            else:
+                yield "".join(json.dumps(record) + "\n" for record in records)
+    
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{export_format}"'}
+    )
 
 
-@router.get("/{transaction_id}")
-async def get_transaction(transaction_id: str, db: Session = Depends(get_db)):
+@router.get("/{transaction_id}", response_model=TransactionResponse)
+async def get_transaction(transaction_id: str, db: AsyncSession = Depends(get_db)):
     """Get transaction details"""
-    transaction = db.query(Transaction).filter(Transaction.transaction_id == transaction_id).first()
+    transaction = await db.scalar(select(Transaction).where(Transaction.transaction_id == transaction_id))
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
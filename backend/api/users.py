@@ -3,27 +3,25 @@
 
 import logging
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import get_db
 from backend.models import User
 from backend.schemas import UserCreate, UserResponse
+from backend.api.cache import cached_user, entity_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-def get_db():
-    """Database dependency - will be imported from main.py"""
-    pass
-
-
 @router.post("/register", response_model=dict)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new developer"""
     logger.info(f"Registering user: {user.username}")
     
     # Check if user exists
-    existing = db.query(User).filter(User.email == user.email).first()
+    existing = await db.scalar(select(User).where(User.email == user.email))
     if existing:
         raise HTTPException(status_code=400, detail="User already exists")
     
@@ -33,8 +31,9 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         wallet_address=user.wallet_address
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    await entity_cache.invalidate(User, new_user.id)
     
     return {
         "user_id": new_user.id,
@@ -44,9 +43,9 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(user_id: int, db: Session = Depends(get_db)):
+async def get_current_user(user_id: int, db: AsyncSession = Depends(get_db)):
     """Get current user details"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await cached_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -58,10 +57,10 @@ async def update_user(
     user_id: int,
     username: str = None,
     wallet_address: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update user profile"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -70,6 +69,7 @@ async def update_user(
     if wallet_address:
         user.wallet_address = wallet_address
     
-    db.commit()
+    await db.commit()
+    await entity_cache.invalidate(User, user_id)
     
     return {"message": "User updated successfully"}
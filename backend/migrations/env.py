@@ -0,0 +1,38 @@
+# backend/migrations/env.py
+# Alembic environment: migrates DATABASE_URL (or sqlalchemy.url, if set) with the sync driver
+
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine, pool
+from backend.database import DATABASE_URL, to_sync_url
+from backend.models import Base
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def database_url() -> str:
+    return to_sync_url(config.get_main_option("sqlalchemy.url") or DATABASE_URL)
+
+
+def run_migrations_offline():
+    context.configure(url=database_url(), target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = create_engine(database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
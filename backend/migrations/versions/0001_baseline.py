@@ -0,0 +1,98 @@
+"""Baseline: the schema init_models created before migrations were introduced
+
+On an empty database this creates the original tables, so `alembic
+upgrade head` builds the full schema. Databases that already have them
+(created before migrations existed) are left as they are.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TABLES = ("chat_messages", "transactions", "game_assets", "games", "users")
+
+
+def upgrade():
+    if set(TABLES) & set(sa.inspect(op.get_bind()).get_table_names()):
+        return
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("username", sa.String),
+        sa.Column("email", sa.String),
+        sa.Column("wallet_address", sa.String, nullable=True),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "games",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("game_id", sa.String),
+        sa.Column("title", sa.String),
+        sa.Column("description", sa.Text),
+        sa.Column("template_type", sa.String),
+        sa.Column("developer_id", sa.Integer, sa.ForeignKey("users.id")),
+        sa.Column("status", sa.String),
+        sa.Column("dojo_contract_address", sa.String, nullable=True),
+        sa.Column("game_file_path", sa.String, nullable=True),
+        sa.Column("documentation_path", sa.String, nullable=True),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("published_at", sa.DateTime, nullable=True),
+    )
+    op.create_index("ix_games_id", "games", ["id"])
+    op.create_index("ix_games_game_id", "games", ["game_id"], unique=True)
+    op.create_index("ix_games_title", "games", ["title"])
+
+    op.create_table(
+        "game_assets",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("game_id", sa.Integer, sa.ForeignKey("games.id")),
+        sa.Column("asset_type", sa.String),
+        sa.Column("file_path", sa.String),
+        sa.Column("file_size", sa.Integer),
+        sa.Column("optimized", sa.Boolean),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_game_assets_id", "game_assets", ["id"])
+
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("transaction_id", sa.String),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+        sa.Column("payment_method", sa.String),
+        sa.Column("amount", sa.String),
+        sa.Column("currency", sa.String),
+        sa.Column("status", sa.String),
+        sa.Column("blockchain_tx_hash", sa.String, nullable=True),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_transactions_id", "transactions", ["id"])
+    op.create_index("ix_transactions_transaction_id", "transactions", ["transaction_id"], unique=True)
+
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+        sa.Column("message", sa.Text),
+        sa.Column("response", sa.Text),
+        sa.Column("encrypted", sa.Boolean),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_chat_messages_id", "chat_messages", ["id"])
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_table(table)
@@ -0,0 +1,132 @@
+"""Ledger: exact amounts, transactions linked to games, rollups, history indexes
+
+- transactions.amount and publications.amount become NUMERIC(36, 18)
+  on Postgres (SQLite keeps them as text, see models.ExactDecimal);
+  legacy amounts that are not numbers are set to NULL first, and logged
+- transactions.game_id plus the game_stats and game_revenue rollups;
+  run `python backend/deploy.py rebuild-rollups` afterwards to fill them
+- (user_id, created_at, id) and (created_at, id) indexes for paginated
+  history and exports, built CONCURRENTLY on Postgres so writers are not
+  blocked on large tables
+
+Every step is skipped if already applied, so databases whose tables were
+created by a newer init_models upgrade cleanly.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger("alembic.ledger")
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# Plain decimals that fit NUMERIC(36, 18); other legacy amounts are checked in Python before the cast
+PLAIN_AMOUNT = r"^\s*[+-]?([0-9]{1,18}(\.[0-9]*)?|\.[0-9]+)\s*$"
+
+HISTORY_INDEXES = {
+    "ix_transactions_user_created": ["user_id", "created_at", "id"],
+    "ix_transactions_created": ["created_at", "id"],
+}
+
+
+def parse_amount(value: str) -> Optional[Decimal]:
+    """The amount the NUMERIC(36, 18) cast would store, or None if it would reject it"""
+    try:
+        amount = Decimal(value.strip())
+    except InvalidOperation:
+        return None
+    if not amount.is_finite() or abs(amount) >= Decimal(10) ** 18:
+        return None
+    return amount
+
+
+def clear_invalid_amounts(bind, table: str):
+    """Set amounts that are not numbers to NULL, so one bad legacy row cannot abort the upgrade"""
+    rows = bind.execute(
+        sa.text(f"SELECT id, amount FROM {table} WHERE amount <> '' AND amount !~ :pattern"),
+        {"pattern": PLAIN_AMOUNT}
+    ).all()
+    invalid = [row.id for row in rows if parse_amount(row.amount) is None]
+    if invalid:
+        bind.execute(sa.text(f"UPDATE {table} SET amount = NULL WHERE id = ANY(:ids)"), {"ids": invalid})
+        logger.warning(f"{table}: set {len(invalid)} non-numeric amounts to NULL (ids {invalid[:20]})")
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    postgres = bind.dialect.name == "postgresql"
+
+    if postgres:
+        for table in ("transactions", "publications"):
+            if table not in tables:
+                continue
+            amount = next(c for c in inspector.get_columns(table) if c["name"] == "amount")
+            if not isinstance(amount["type"], sa.Numeric):
+                clear_invalid_amounts(bind, table)
+                op.alter_column(table, "amount", type_=sa.Numeric(36, 18),
+                                postgresql_using="NULLIF(amount, '')::numeric(36, 18)")
+
+    if "game_id" not in {c["name"] for c in inspector.get_columns("transactions")}:
+        # Batch mode: SQLite cannot ALTER in a foreign key, so it copies the table instead
+        with op.batch_alter_table("transactions") as batch:
+            batch.add_column(sa.Column("game_id", sa.Integer, nullable=True))
+            batch.create_foreign_key("fk_transactions_game_id", "games", ["game_id"], ["id"], ondelete="SET NULL")
+            batch.create_index("ix_transactions_game_id", ["game_id"])
+
+    if "game_stats" not in tables:
+        op.create_table(
+            "game_stats",
+            sa.Column("game_id", sa.Integer, sa.ForeignKey("games.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("asset_count", sa.Integer, nullable=False),
+            sa.Column("asset_bytes", sa.BigInteger, nullable=False),
+            sa.Column("updated_at", sa.DateTime),
+        )
+    if "game_revenue" not in tables:
+        op.create_table(
+            "game_revenue",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("game_id", sa.Integer, sa.ForeignKey("games.id", ondelete="CASCADE")),
+            sa.Column("currency", sa.String),
+            sa.Column("total", sa.Numeric(36, 18) if postgres else sa.String, nullable=False),
+            sa.Column("payments", sa.Integer, nullable=False),
+            sa.Column("updated_at", sa.DateTime),
+            sa.UniqueConstraint("game_id", "currency", name="uq_game_revenue_game_currency"),
+        )
+        op.create_index("ix_game_revenue_id", "game_revenue", ["id"])
+
+    existing = {index["name"] for index in inspector.get_indexes("transactions")}
+    missing = {name: columns for name, columns in HISTORY_INDEXES.items() if name not in existing}
+    if postgres and missing:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, columns in missing.items():
+                op.create_index(name, "transactions", columns, postgresql_concurrently=True)
+    else:
+        for name, columns in missing.items():
+            op.create_index(name, "transactions", columns)
+
+
+def downgrade():
+    bind = op.get_bind()
+    for name in HISTORY_INDEXES:
+        op.drop_index(name, table_name="transactions")
+    op.drop_table("game_revenue")
+    op.drop_table("game_stats")
+    with op.batch_alter_table("transactions") as batch:
+        batch.drop_index("ix_transactions_game_id")
+        batch.drop_column("game_id")
+
+    if bind.dialect.name == "postgresql":
+        for table in ("transactions", "publications"):
+            op.alter_column(table, "amount", type_=sa.String, postgresql_using="amount::text")
@@ -0,0 +1,134 @@
+"""Schema that init_models used to add at startup: asset blobs, jobs, publications, BTC settlement
+
+- asset_blobs, and game_assets.filename/content_hash for deduplicated uploads
+- the jobs queue table
+- publications, for idempotent publishing
+- Bitcoin settlement (invoice address, confirmations) columns on transactions
+
+Indexes on existing tables are built CONCURRENTLY on Postgres so writers
+are not blocked. Every step is skipped if already applied, so databases
+whose schema init_models extended at startup upgrade cleanly.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+SETTLEMENT_COLUMNS = {
+    "to_address": sa.String,
+    "confirmations": sa.Integer,
+    "confirmed_at": sa.DateTime,
+}
+
+# Indexes on tables that already hold data: name -> (table, columns)
+LIVE_INDEXES = {
+    "ix_game_assets_content_hash": ("game_assets", ["content_hash"]),
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    postgres = bind.dialect.name == "postgresql"
+
+    if "asset_blobs" not in tables:
+        op.create_table(
+            "asset_blobs",
+            sa.Column("sha256", sa.String(64), primary_key=True),
+            sa.Column("size", sa.Integer),
+            sa.Column("file_path", sa.String),
+            sa.Column("ref_count", sa.Integer, nullable=False),
+            sa.Column("created_at", sa.DateTime),
+        )
+    asset_columns = {c["name"] for c in inspector.get_columns("game_assets")}
+    if "content_hash" not in asset_columns:
+        # Batch mode: SQLite cannot ALTER in a foreign key, so it copies the table instead
+        with op.batch_alter_table("game_assets") as batch:
+            if "filename" not in asset_columns:
+                batch.add_column(sa.Column("filename", sa.String, nullable=True))
+            batch.add_column(sa.Column("content_hash", sa.String(64), nullable=True))
+            batch.create_foreign_key("fk_game_assets_content_hash", "asset_blobs", ["content_hash"], ["sha256"])
+
+    if "jobs" not in tables:
+        op.create_table(
+            "jobs",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("job_id", sa.String),
+            sa.Column("job_type", sa.String),
+            sa.Column("payload", sa.Text),
+            sa.Column("status", sa.String),
+            sa.Column("attempts", sa.Integer),
+            sa.Column("max_attempts", sa.Integer),
+            sa.Column("run_after", sa.DateTime),
+            sa.Column("locked_until", sa.DateTime, nullable=True),
+            sa.Column("result", sa.Text, nullable=True),
+            sa.Column("error", sa.Text, nullable=True),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("started_at", sa.DateTime, nullable=True),
+            sa.Column("finished_at", sa.DateTime, nullable=True),
+        )
+        op.create_index("ix_jobs_id", "jobs", ["id"])
+        op.create_index("ix_jobs_job_id", "jobs", ["job_id"], unique=True)
+        op.create_index("ix_jobs_type_status_run_after", "jobs", ["job_type", "status", "run_after"])
+
+    if "publications" not in tables:
+        op.create_table(
+            "publications",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("idempotency_key", sa.String),
+            sa.Column("request_hash", sa.String(64)),
+            sa.Column("game_id", sa.Integer, sa.ForeignKey("games.id", ondelete="SET NULL")),
+            sa.Column("payment_method", sa.String),
+            sa.Column("amount", sa.Numeric(36, 18) if postgres else sa.String),
+            sa.Column("status", sa.String),
+            sa.Column("contracts", sa.Text, nullable=True),
+            sa.Column("payment_tx_hash", sa.String, nullable=True),
+            sa.Column("transaction_id", sa.String, sa.ForeignKey("transactions.transaction_id"), nullable=True),
+            sa.Column("job_id", sa.String, nullable=True),
+            sa.Column("error", sa.Text, nullable=True),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+        op.create_index("ix_publications_id", "publications", ["id"])
+        op.create_index("ix_publications_idempotency_key", "publications", ["idempotency_key"], unique=True)
+        op.create_index("ix_publications_game_id", "publications", ["game_id"])
+
+    transaction_columns = {c["name"] for c in inspector.get_columns("transactions")}
+    for name, column_type in SETTLEMENT_COLUMNS.items():
+        if name not in transaction_columns:
+            op.add_column("transactions", sa.Column(name, column_type, nullable=True))
+
+    missing = {
+        name: spec for name, spec in LIVE_INDEXES.items()
+        if name not in {index["name"] for index in inspector.get_indexes(spec[0])}
+    }
+    if postgres and missing:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, (table, columns) in missing.items():
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        for name, (table, columns) in missing.items():
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, (table, _) in LIVE_INDEXES.items():
+        op.drop_index(name, table_name=table)
+    with op.batch_alter_table("transactions") as batch:
+        for name in SETTLEMENT_COLUMNS:
+            batch.drop_column(name)
+    op.drop_table("publications")
+    op.drop_table("jobs")
+    with op.batch_alter_table("game_assets") as batch:
+        batch.drop_column("content_hash")
+        batch.drop_column("filename")
+    op.drop_table("asset_blobs")
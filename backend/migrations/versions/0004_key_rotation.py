@@ -0,0 +1,49 @@
+"""Key rotation: chat_messages.key_id and re-encryption checkpoints
+
+- chat_messages.key_id records the encryption key version of each row;
+  existing rows stay NULL, which means the legacy key
+- reencryption_checkpoints lets a background re-encryption run resume
+
+Every step is skipped if already applied, so databases whose schema
+init_models extended at startup upgrade cleanly.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # Nullable with no default: a catalog-only change on Postgres, no table rewrite
+    if "key_id" not in {c["name"] for c in inspector.get_columns("chat_messages")}:
+        op.add_column("chat_messages", sa.Column("key_id", sa.String, nullable=True))
+
+    if "reencryption_checkpoints" not in inspector.get_table_names():
+        op.create_table(
+            "reencryption_checkpoints",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("target_key_id", sa.String),
+            sa.Column("last_message_id", sa.Integer),
+            sa.Column("rotated", sa.Integer),
+            sa.Column("failed", sa.Integer),
+            sa.Column("completed_at", sa.DateTime, nullable=True),
+            sa.Column("updated_at", sa.DateTime),
+        )
+        op.create_index("ix_reencryption_checkpoints_id", "reencryption_checkpoints", ["id"])
+        op.create_index("ix_reencryption_checkpoints_target_key_id", "reencryption_checkpoints",
+                        ["target_key_id"], unique=True)
+
+
+def downgrade():
+    op.drop_table("reencryption_checkpoints")
+    with op.batch_alter_table("chat_messages") as batch:
+        batch.drop_column("key_id")
@@ -0,0 +1,35 @@
+"""Chat history: (user_id, created_at, id) index for keyset-paginated /chat/history
+
+Built CONCURRENTLY on Postgres so writers to chat_messages are not
+blocked while it builds. Skipped if startup DDL already created it.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_chat_messages_user_created"
+COLUMNS = ["user_id", "created_at", "id"]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if INDEX in {index["name"] for index in sa.inspect(bind).get_indexes("chat_messages")}:
+        return
+    if bind.dialect.name == "postgresql":
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            op.create_index(INDEX, "chat_messages", COLUMNS, postgresql_concurrently=True)
+    else:
+        op.create_index(INDEX, "chat_messages", COLUMNS)
+
+
+def downgrade():
+    op.drop_index(INDEX, table_name="chat_messages")
@@ -0,0 +1,28 @@
+"""Publications: record a submitted Starknet payment before waiting for its receipt
+
+publications.payment_pending_tx_hash lets a retried publish job resume
+polling the transfer it already sent instead of sending (and charging)
+again. Skipped if already applied.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("publications")}
+    if "payment_pending_tx_hash" not in columns:
+        op.add_column("publications", sa.Column("payment_pending_tx_hash", sa.String, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("publications") as batch:
+        batch.drop_column("payment_pending_tx_hash")
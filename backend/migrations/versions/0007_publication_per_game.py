@@ -0,0 +1,69 @@
+"""Publications: at most one per game
+
+Makes ix_publications_game_id unique, so concurrent publishes of one game
+under different idempotency keys cannot each insert a publication (the
+game row lock in /payments/publish is a no-op on SQLite). Where a game
+already has several, the published one (else the newest) keeps the link
+and the others are detached from the game. Built CONCURRENTLY on
+Postgres. Skipped if already applied.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+import logging
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic.publications")
+
+INDEX = "ix_publications_game_id"
+BUILDING = "ix_publications_game_id_unique"
+
+
+def detach_duplicates(bind):
+    """Unlink all but one publication per game; returns how many were unlinked"""
+    rows = bind.execute(sa.text(
+        "SELECT id, game_id FROM publications WHERE game_id IS NOT NULL "
+        "ORDER BY game_id, CASE WHEN status = 'published' THEN 0 ELSE 1 END, id DESC"
+    )).all()
+    kept, duplicates = set(), []
+    for row in rows:
+        if row.game_id in kept:
+            duplicates.append(row.id)
+        kept.add(row.game_id)
+    for publication_id in duplicates:
+        bind.execute(sa.text("UPDATE publications SET game_id = NULL WHERE id = :id"), {"id": publication_id})
+    if duplicates:
+        logger.warning(f"Detached {len(duplicates)} duplicate publications from their games: {duplicates}")
+    return len(duplicates)
+
+
+def upgrade():
+    bind = op.get_bind()
+    indexes = {index["name"]: index for index in sa.inspect(bind).get_indexes("publications")}
+    if indexes.get(INDEX, {}).get("unique"):
+        return
+    detach_duplicates(bind)
+    if bind.dialect.name == "postgresql":
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {BUILDING}")  # left invalid by an interrupted run
+            op.create_index(BUILDING, "publications", ["game_id"], unique=True, postgresql_concurrently=True)
+            if INDEX in indexes:
+                op.drop_index(INDEX, table_name="publications", postgresql_concurrently=True)
+            op.execute(f"ALTER INDEX {BUILDING} RENAME TO {INDEX}")
+    else:
+        if INDEX in indexes:
+            op.drop_index(INDEX, table_name="publications")
+        op.create_index(INDEX, "publications", ["game_id"], unique=True)
+
+
+def downgrade():
+    op.drop_index(INDEX, table_name="publications")
+    op.create_index(INDEX, "publications", ["game_id"])
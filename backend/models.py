@@ -1,14 +1,39 @@
 # backend/models.py
 # Database models for Dojo Game Launchpad
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, DateTime, Boolean, Text, ForeignKey, Index, Numeric, UniqueConstraint
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+from decimal import Decimal
 
 Base = declarative_base()
 
 
+class ExactDecimal(TypeDecorator):
+    """Exact decimal amounts: NUMERIC(36, 18) on Postgres, text on SQLite (whose NUMERIC rounds through float)"""
+    
+    impl = Numeric(36, 18)
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(Numeric(36, 18))
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = Decimal(value)
+        return format(value, "f") if dialect.name == "sqlite" else value
+    
+    def process_result_value(self, value, dialect):
+        return None if value is None else Decimal(value)
+
+
 class User(Base):
     __tablename__ = "users"
     
@@ -48,12 +73,25 @@ class GameAsset(Base):
     id = Column(Integer, primary_key=True, index=True)
     game_id = Column(Integer, ForeignKey("games.id"))
     asset_type = Column(String)  # image, audio, code, etc.
+    filename = Column(String, nullable=True)
     file_path = Column(String)
     file_size = Column(Integer)
+    content_hash = Column(String(64), ForeignKey("asset_blobs.sha256"), nullable=True, index=True)
     optimized = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     game = relationship("Game", back_populates="assets")
+    blob = relationship("AssetBlob")
+
+
+class AssetBlob(Base):
+    __tablename__ = "asset_blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer)
+    file_path = Column(String)
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class Transaction(Base):
@@ -62,14 +100,73 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     transaction_id = Column(String, unique=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="SET NULL"), nullable=True, index=True)
     payment_method = Column(String)  # chipi_pay, xverse, vesu
-    amount = Column(String)
+    amount = Column(ExactDecimal)
     currency = Column(String)  # STRK, BTC
-    status = Column(String)  # pending, completed, failed
+    status = Column(String)  # pending, completed, confirmed, failed
     blockchain_tx_hash = Column(String, nullable=True)
+    # Bitcoin settlement: invoice address the payer sends to, confirmation tracking
+    to_address = Column(String, nullable=True)
+    confirmations = Column(Integer, default=0)
+    confirmed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="transactions")
+    
+    # Keyset pagination of a user's history, and date-ranged exports across all users
+    __table_args__ = (
+        Index("ix_transactions_user_created", "user_id", "created_at", "id"),
+        Index("ix_transactions_created", "created_at", "id"),
+    )
+
+
+class Publication(Base):
+    __tablename__ = "publications"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String, unique=True, index=True)
+    request_hash = Column(String(64))  # SHA-256 of the publish request, to reject reused keys
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="SET NULL"), unique=True, index=True)  # one per game
+    payment_method = Column(String)
+    amount = Column(ExactDecimal)
+    status = Column(String, default="pending")  # pending, deployed, paid, awaiting_payment (Bitcoin), published
+    contracts = Column(Text, nullable=True)  # JSON, set once deployed
+    payment_pending_tx_hash = Column(String, nullable=True)  # submitted, awaiting acceptance (Starknet)
+    payment_tx_hash = Column(String, nullable=True)  # set once paid (Bitcoin: once invoiced, the address to pay)
+    transaction_id = Column(String, ForeignKey("transactions.transaction_id"), nullable=True)
+    job_id = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    game = relationship("Game")
+
+
+class GameStats(Base):
+    """Per-game asset rollup, maintained in the same transaction as GameAsset changes"""
+    __tablename__ = "game_stats"
+    
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
+    asset_count = Column(Integer, default=0, nullable=False)
+    asset_bytes = Column(BigInteger, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GameRevenue(Base):
+    """Per-game settled revenue by currency, maintained as Transactions settle"""
+    __tablename__ = "game_revenue"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"))
+    currency = Column(String)
+    total = Column(ExactDecimal, nullable=False)
+    payments = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("game_id", "currency", name="uq_game_revenue_game_currency"),
+    )
 
 
 class ChatMessage(Base):
@@ -80,4 +177,45 @@ class ChatMessage(Base):
     message = Column(Text)
     response = Column(Text)
     encrypted = Column(Boolean, default=True)
+    key_id = Column(String, nullable=True)  # encryption key version; NULL = legacy key
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Keyset pagination of a user's history: (user_id, created_at, id)
+    __table_args__ = (
+        Index("ix_chat_messages_user_created", "user_id", "created_at", "id"),
+    )
+
+
+class ReencryptionCheckpoint(Base):
+    __tablename__ = "reencryption_checkpoints"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    target_key_id = Column(String, unique=True, index=True)
+    last_message_id = Column(Integer, default=0)
+    rotated = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    completed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, unique=True, index=True)
+    job_type = Column(String)  # generate_docs, optimize_assets, publish_game
+    payload = Column(Text)  # JSON
+    status = Column(String, default="queued")  # queued, running, succeeded, failed, cancelled
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_jobs_type_status_run_after", "job_type", "status", "run_after"),
+    )
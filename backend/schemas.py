@@ -1,8 +1,10 @@
 # backend/schemas.py
 # Pydantic schemas for request/response validation
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
 from enum import Enum
 
 
@@ -56,10 +58,24 @@ class GameResponse(BaseModel):
         from_attributes = True
 
 
+class UploadSessionCreate(BaseModel):
+    game_id: str
+    filename: str
+    content_type: Optional[str] = None
+    total_size: Optional[int] = None
+
+
+class AssetReference(BaseModel):
+    game_id: str
+    sha256: str
+    filename: str
+    content_type: Optional[str] = None
+
+
 class GamePublish(BaseModel):
     game_id: str
     payment_method: PaymentMethod
-    payment_amount: str
+    payment_amount: Decimal = Field(..., gt=0, max_digits=36, decimal_places=18)
 
 
 class ChatRequest(BaseModel):
@@ -74,6 +90,34 @@ class ChatResponse(BaseModel):
     encryption_provider: str
 
 
+class ChatBatchRequest(BaseModel):
+    messages: List[ChatRequest] = Field(..., min_length=1, max_length=100)
+
+
+class ChatMessageResponse(BaseModel):
+    id: int
+    message: str
+    response: str
+    encrypted: bool
+    key_id: Optional[str] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class ChatBatchResponse(BaseModel):
+    message: str
+    messages: List[ChatMessageResponse]
+    encryption_provider: str
+
+
+class ChatHistoryPage(BaseModel):
+    messages: List[ChatMessageResponse]
+    next_cursor: Optional[str] = None
+    has_more: bool
+
+
 class AIRequest(BaseModel):
     action: str  # publish, docs, optimize
     game_id: str
@@ -81,11 +125,20 @@ class AIRequest(BaseModel):
 
 class TransactionResponse(BaseModel):
     transaction_id: str
+    game_id: Optional[int] = None
     payment_method: str
-    amount: str
+    amount: Decimal
     currency: str
     status: str
     blockchain_tx_hash: Optional[str]
+    created_at: Optional[datetime] = None
+    confirmed_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
+
+
+class TransactionPage(BaseModel):
+    transactions: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+    has_more: bool
@@ -2,81 +2,289 @@
 # AI Agent with RAG for documentation generation and game assistance
 
 import os
+import json
+import itertools
+import shutil
+import asyncio
+import fcntl
+import hashlib
 import logging
-from typing import Dict
-from langchain.embeddings import OpenAIEmbeddings
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from langchain.vectorstores import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import RetrievalQA
-from langchain.llms import OpenAI
+from backend.services.ai_providers import AI_PROVIDER, create_embeddings, create_llm
+from backend.services.response_cache import ResponseCache
+from backend.services.vector_index import NumpyVectorStore
+from backend.services.knowledge_base import (
+    CHUNK_OVERLAP, CHUNK_SIZE, KNOWLEDGE_BASE_PATHS, MANIFEST_VERSION,
+    IngestReport, KnowledgeBaseIngestor, Source, file_sources, path_scope, text_sources
+)
 
 logger = logging.getLogger(__name__)
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+AI_INDEX_DIR = Path(os.getenv("AI_INDEX_DIR", ".cache/ai_index"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "120"))
+AI_VECTOR_STORE = os.getenv("AI_VECTOR_STORE", "numpy")
+
+KNOWLEDGE_BASE_DOCS = [
+    "Dojo is a provable game engine and toolchain for building onchain games.",
+    "Dojo uses Cairo for smart contracts and provides ECS (Entity Component System).",
+    "To deploy a Dojo game: 1) Define your world, 2) Create systems, 3) Deploy contracts.",
+    "Dojo worlds are autonomous environments that contain entities and systems.",
+    "Best practices: Keep state minimal, use events, optimize gas usage.",
+]
+
+
+# Documentation sections, generated concurrently: name -> (heading, instructions)
+DOC_SECTIONS = {
+    "overview": ("Game Overview",
+                 "Summarize the game concept, core loop and what makes it onchain."),
+    "api_reference": ("API Reference",
+                      "List the game's systems and entry points with their parameters."),
+    "smart_contracts": ("Smart Contracts",
+                        "Describe the Dojo world, models and systems and how state is stored."),
+    "player_guide": ("Player Guide",
+                     "Explain how to play, connect a wallet and interact with the game."),
+    "setup_guide": ("Developer Setup",
+                    "Give step-by-step instructions to build, deploy and configure the game."),
+}
+
+
+def knowledge_base_hash(embedding_model: str, vector_store: str = AI_VECTOR_STORE) -> str:
+    """Key for a persisted index: changes with chunking, embedding model or store type.
+
+    Content changes are applied incrementally by the ingestor instead.
+    """
+    source = json.dumps({
+        "manifest_version": MANIFEST_VERSION,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "embedding_model": embedding_model,
+        "vector_store": vector_store,
+    }, sort_keys=True)
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
 
 
 class AIAgent:
-    """AI Agent with RAG for documentation generation and game assistance"""
+    """AI Agent with RAG for documentation generation and game assistance.
+
+    Embeddings and the LLM come from the AI_PROVIDER backend ("openai", or
+    "local" for offline CPU inference). Construction is cheap: they and
+    the vector index are created on first use. The index is persisted under AI_INDEX_DIR and
+    kept in sync with the built-in docs and KNOWLEDGE_BASE_PATHS by
+    incremental ingestion, so restarts only embed what changed.
+    """
     
-    def __init__(self):
-        self.embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
-        self.llm = OpenAI(temperature=0.7, openai_api_key=OPENAI_API_KEY)
+    def __init__(self,
+                 provider: str = AI_PROVIDER,
+                 index_dir: Path = AI_INDEX_DIR,
+                 vector_store: str = AI_VECTOR_STORE,
+                 docs: List[str] = KNOWLEDGE_BASE_DOCS,
+                 knowledge_paths: List[str] = KNOWLEDGE_BASE_PATHS,
+                 max_concurrency: int = AI_MAX_CONCURRENCY,
+                 request_timeout: float = AI_REQUEST_TIMEOUT,
+                 response_cache: Optional[ResponseCache] = None):
+        self.provider = provider
+        self.index_dir = Path(index_dir)
+        self.vector_store = vector_store
+        self.docs = docs
+        self.knowledge_paths = list(knowledge_paths)
+        self.request_timeout = request_timeout
+        self._llm_slots = asyncio.Semaphore(max_concurrency)
+        self.embeddings = None
+        self.llm = None
         self.vectorstore = None
         self.qa_chain = None
-        self._initialize_knowledge_base()
+        self.ingestor = None
+        self.response_cache = response_cache or ResponseCache()
+        self._init_lock = asyncio.Lock()
+    
+    @property
+    def ready(self) -> bool:
+        return self.qa_chain is not None
+    
+    async def ensure_ready(self):
+        """Initialize the knowledge base once, off the event loop"""
+        if self.ready:
+            return
+        async with self._init_lock:
+            if not self.ready:
+                await asyncio.to_thread(self._initialize_knowledge_base)
     
     def _initialize_knowledge_base(self):
-        """Initialize RAG with Dojo documentation"""
+        """Initialize RAG over the persisted index, ingesting any changed docs"""
         logger.info("Initializing AI Agent knowledge base...")
         
-        docs = [
-            "Dojo is a provable game engine and toolchain for building onchain games.",
-            "Dojo uses Cairo for smart contracts and provides ECS (Entity Component System).",
-            "To deploy a Dojo game: 1) Define your world, 2) Create systems, 3) Deploy contracts.",
-            "Dojo worlds are autonomous environments that contain entities and systems.",
-            "Best practices: Keep state minimal, use events, optimize gas usage.",
-        ]
+        self.embeddings = create_embeddings(self.provider)
+        self.llm = create_llm(self.provider)
         
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        texts = text_splitter.create_documents(docs)
+        embedding_model = getattr(self.embeddings, "model", type(self.embeddings).__name__)
+        index_hash = knowledge_base_hash(embedding_model, self.vector_store)
+        persist_dir = self.index_dir / index_hash
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.vectorstore = self._create_vectorstore(persist_dir)
+        self.ingestor = KnowledgeBaseIngestor(self.vectorstore, persist_dir / "manifest.json")
+        self._ingest(
+            itertools.chain(text_sources("builtin", self.docs), file_sources(self.knowledge_paths)),
+            ["builtin:", *path_scope(self.knowledge_paths)]
+        )
+        self._prune_indexes(keep=index_hash)
         
-        self.vectorstore = Chroma.from_documents(texts, self.embeddings)
         self.qa_chain = RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
             retriever=self.vectorstore.as_retriever()
         )
+        if self.response_cache.embedder is None:
+            self.response_cache.embedder = self.embeddings.embed_query
     
-    async def generate_documentation(self, game_title: str, description: str) -> Dict[str, str]:
-        """Generate comprehensive game documentation using RAG"""
-        logger.info(f"Generating documentation for: {game_title}")
+    def _create_vectorstore(self, persist_dir: Path):
+        if self.vector_store == "numpy":
+            return NumpyVectorStore(self.embeddings, persist_directory=str(persist_dir))
+        if self.vector_store == "chroma":
+            return Chroma(persist_directory=str(persist_dir), embedding_function=self.embeddings)
+        raise ValueError(f"Unknown vector store: {self.vector_store}")
+    
+    def _ingest(self, sources: Iterable[Source], scope: List[str]) -> IngestReport:
+        # Serialize ingestion across worker processes sharing the index dir
+        with open(self.index_dir / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return self.ingestor.ingest(sources, scope=scope)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    
+    def _prune_indexes(self, keep: str):
+        """Remove indexes built with other chunking settings or embedding models"""
+        for path in self.index_dir.iterdir():
+            if path.is_dir() and path.name != keep:
+                shutil.rmtree(path, ignore_errors=True)
+    
+    async def refresh_knowledge_base(self, paths: List[str]) -> Optional[IngestReport]:
+        """Ingest new or changed files under paths (e.g. a game's generated docs).
         
-        prompt = f"""Generate comprehensive documentation for a Dojo game titled '{game_title}'. 
+        Does nothing before the agent is initialized, since initialization
+        ingests everything anyway. Clears the response cache if the index
+        changed.
+        """
+        if self.ingestor is None:
+            return None
+        report = await asyncio.to_thread(self._ingest, file_sources(paths), path_scope(paths))
+        if report.changed:
+            self.response_cache.clear()
+        return report
+    
+    async def run_chain(self, prompt: str, timeout: Optional[float] = None, cache_scope: str = "") -> str:
+        """Run the RAG chain without blocking the event loop.
+
+        Uses the chain's async API (native async OpenAI calls, retrieval in
+        the default executor). At most max_concurrency calls are in flight;
+        the rest wait for a slot. A call that exceeds the timeout raises
+        asyncio.TimeoutError. Cancelling the caller cancels the in-flight
+        LLM request.
+        
+        Answers are served from the response cache when the same or a
+        semantically equivalent prompt was answered recently; templated
+        prompts pass their inputs as cache_scope so answers about one game
+        are never served for another.
+        """
+        await self.ensure_ready()
+        cached, vector = await self.response_cache.lookup(prompt, cache_scope)
+        if cached is not None:
+            return cached
+        
+        async with self._llm_slots:
+            result = await asyncio.wait_for(
+                self.qa_chain.arun(prompt),
+                timeout or self.request_timeout
+            )
+        await self.response_cache.put(prompt, result, vector, cache_scope)
+        return result
+    
+    async def stream_chain(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Run the RAG chain, yielding the answer as the LLM generates it.
+        
+        Same retrieval, prompt, concurrency limit and response cache as
+        run_chain; a cached answer is yielded as a single chunk. The timeout
+        applies to retrieval and to the wait for each chunk, so a long
+        answer is not cut off but a stalled provider is. Closing the
+        iterator early cancels the LLM request, and the partial answer is
+        not cached.
+        """
+        await self.ensure_ready()
+        cached, vector = await self.response_cache.lookup(prompt)
+        if cached is not None:
+            yield cached
+            return
+        
+        timeout = timeout or self.request_timeout
+        chunks = []
+        async with self._llm_slots:
+            docs = await asyncio.wait_for(self.qa_chain.retriever.aget_relevant_documents(prompt), timeout)
+            stuff = self.qa_chain.combine_documents_chain
+            llm_prompt = stuff.llm_chain.prompt.format(
+                context=stuff.document_separator.join(doc.page_content for doc in docs),
+                question=prompt
+            )
+            stream = self.llm.astream(llm_prompt)
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(anext(stream), timeout)
+                    except StopAsyncIteration:
+                        break
+                    chunks.append(chunk)
+                    yield chunk
+            finally:
+                await stream.aclose()
+        await self.response_cache.put(prompt, "".join(chunks), vector)
+    
+    async def generate_section(self, section: str, game_title: str, description: str) -> Tuple[str, str]:
+        """Generate one documentation section with its own retrieval and LLM call"""
+        heading, instructions = DOC_SECTIONS[section]
+        prompt = f"""Write the {heading} section of the documentation for a Dojo game titled '{game_title}'.
         Description: {description}
         
-        Include:
-        1. Game Overview
-        2. Smart Contract Architecture
-        3. API Reference
-        4. Player Guide
-        5. Developer Setup Instructions
+        {instructions}
+        """
+        result = await self.run_chain(prompt, cache_scope=json.dumps(["docs", section, game_title, description]))
+        if section == "overview":
+            return section, f"# {game_title}\n\n{description}\n\n{result}"
+        return section, f"## {heading}\n\n{result}"
+    
+    async def iter_documentation(self, game_title: str, description: str) -> AsyncIterator[Tuple[str, str]]:
+        """Generate all sections concurrently, yielding (section, content) as each finishes.
+        
+        Total latency is roughly that of the slowest section rather than the
+        sum. Closing the iterator early (e.g. the client disconnected)
+        cancels the sections still in flight.
         """
+        logger.info(f"Generating documentation for: {game_title}")
         
+        tasks = [
+            asyncio.create_task(self.generate_section(section, game_title, description))
+            for section in DOC_SECTIONS
+        ]
         try:
-            result = self.qa_chain.run(prompt)
-            
-            docs = {
-                "overview": f"# {game_title}\n\n{description}\n\n{result}",
-                "api_reference": "## API Reference\n\nGenerated endpoints and functions...",
-                "smart_contracts": "## Smart Contracts\n\nDojo world configuration...",
-                "player_guide": "## Player Guide\n\nHow to play and interact...",
-                "setup_guide": "## Developer Setup\n\nSteps to deploy and configure..."
-            }
-            
-            return docs
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
         except Exception as e:
             logger.error(f"Documentation generation failed: {e}")
             raise
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def generate_documentation(self, game_title: str, description: str) -> Dict[str, str]:
+        """Generate comprehensive game documentation using RAG"""
+        docs = {}
+        async for section, content in self.iter_documentation(game_title, description):
+            docs[section] = content
+        return {section: docs[section] for section in DOC_SECTIONS}
     
     async def analyze_game_for_publishing(self, game_id: str) -> Dict[str, any]:
         """Analyze game and provide publishing recommendations"""
@@ -100,21 +308,3 @@ class AIAgent:
         }
         
         return analysis
-    
-    async def optimize_assets(self, game_id: str) -> Dict[str, any]:
-        """Optimize game assets using AI"""
-        logger.info(f"Optimizing assets for game: {game_id}")
-        
-        optimization = {
-            "original_size": "150 MB",
-            "optimized_size": "102 MB",
-            "reduction": "32%",
-            "actions": [
-                "Compressed textures",
-                "Minified code bundles",
-                "Optimized smart contracts",
-                "Cached static assets"
-            ]
-        }
-        
-        return optimization
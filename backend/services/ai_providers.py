@@ -0,0 +1,205 @@
+# backend/services/ai_providers.py
+# Embedding and LLM providers for the AI Agent (OpenAI or local CPU)
+
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from langchain.embeddings import OpenAIEmbeddings
+from langchain.llms import OpenAI
+from langchain.llms.base import LLM, BaseLLM
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.output import GenerationChunk
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+AI_PROVIDER = os.getenv("AI_PROVIDER", "openai")
+AI_LOCAL_EMBEDDING_DIM = int(os.getenv("AI_LOCAL_EMBEDDING_DIM", "384"))
+
+TOKEN_RE = re.compile(r"\w+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD_CHUNK_RE = re.compile(r"\S+\s*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it my of on or the this to what "
+    "when where which who why with you your".split()
+)
+# Boilerplate from our own prompts that should not count as question terms
+PROMPT_WORDS = frozenset("write section documentation game titled description".split())
+
+UNIGRAM_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+TRIGRAM_WEIGHT = 0.2
+# Texts per matmul; bounds the dense term-count matrix
+EMBED_BATCH = 512
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LocalHashEmbeddings(Embeddings):
+    """Deterministic CPU embeddings using signed feature hashing.
+
+    Each text becomes a bag of word unigrams, bigrams and character
+    trigrams hashed into `dim` buckets, with sublinear term weighting and
+    L2 normalization. A whole batch is built as one NumPy scatter-add, so
+    embedding thousands of chunks takes milliseconds and needs no model
+    download or network.
+    """
+
+    def __init__(self, dim: int = AI_LOCAL_EMBEDDING_DIM):
+        self.dim = dim
+        self.model = f"local-hash-{dim}"
+        self._term_features = lru_cache(maxsize=1 << 18)(self._features_for_term)
+
+    def _hash(self, feature: str) -> Tuple[int, float]:
+        h = zlib.crc32(feature.encode())
+        return h % self.dim, 1.0 if h >> 31 else -1.0
+
+    def _features_for_term(self, term: str) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+        """Bucket indices and signed weights of a word (plus its character trigrams) or bigram"""
+        if " " in term:
+            features = [(f"b:{term}", BIGRAM_WEIGHT)]
+        else:
+            features = [(f"w:{term}", UNIGRAM_WEIGHT)]
+            padded = f"<{term}>"
+            features.extend((f"c:{padded[i:i + 3]}", TRIGRAM_WEIGHT) for i in range(len(padded) - 2))
+        hashed = [(self._hash(name), weight) for name, weight in features]
+        return (
+            tuple(index for (index, _), _ in hashed),
+            tuple(sign * weight for (_, sign), weight in hashed)
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return np.vstack([
+            self._embed(texts[i:i + EMBED_BATCH]) for i in range(0, len(texts), EMBED_BATCH)
+        ]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        # Term counts per text over the batch vocabulary (words and bigrams)
+        vocab: Dict[str, int] = {}
+        term_ids, counts = [], []
+        for text in texts:
+            tokens = tokenize(text)
+            terms = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+            term_ids.extend(vocab.setdefault(term, len(vocab)) for term in terms)
+            counts.append(len(terms))
+        rows = np.repeat(np.arange(len(texts)), counts)
+        tf = np.bincount(
+            rows * len(vocab) + np.asarray(term_ids, dtype=np.int64),
+            minlength=len(texts) * len(vocab)
+        ).reshape(len(texts), len(vocab)).astype(np.float32)
+
+        # Hashed feature vector of every term, then one matmul for the batch
+        table_rows, table_cols, table_vals = [], [], []
+        for term, term_id in vocab.items():
+            indices, weights = self._term_features(term)
+            table_rows.extend([term_id] * len(indices))
+            table_cols.extend(indices)
+            table_vals.extend(weights)
+        table = np.bincount(
+            np.asarray(table_rows, dtype=np.int64) * self.dim + np.asarray(table_cols, dtype=np.int64),
+            weights=table_vals,
+            minlength=len(vocab) * self.dim
+        ).reshape(len(vocab), self.dim).astype(np.float32)
+
+        matrix = tf @ table
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+
+class ExtractiveLLM(LLM):
+    """Deterministic local LLM that answers from the retrieved context.
+
+    Expects the "stuff" QA prompt (context, then "Question: ..."), and
+    returns the context sentences sharing the most terms with the question,
+    in their original order. Fast and reproducible, so AI endpoints work
+    offline and in tests. Streams the answer word by word, like token
+    streaming from a hosted model.
+    """
+
+    max_sentences: int = 5
+
+    @property
+    def _llm_type(self) -> str:
+        return "extractive"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"max_sentences": self.max_sentences}
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        return self._answer(prompt)
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[GenerationChunk]:
+        for word in WORD_CHUNK_RE.findall(self._answer(prompt)):
+            yield GenerationChunk(text=word)
+
+    async def _astream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        for chunk in self._stream(prompt, stop=stop, **kwargs):
+            yield chunk
+
+    def _answer(self, prompt: str) -> str:
+        context, question = self._split_prompt(prompt)
+        terms = set(tokenize(question)) - PROMPT_WORDS
+        sentences = [s.strip() for s in SENTENCE_RE.split(context) if s.strip()]
+
+        scored = []
+        for position, sentence in enumerate(sentences):
+            overlap = len(terms.intersection(tokenize(sentence)))
+            if overlap:
+                scored.append((-overlap, position, sentence))
+        best = sorted(sorted(scored)[:self.max_sentences], key=lambda item: item[1])
+
+        if not best:
+            return "I don't know."
+        return " ".join(sentence for _, _, sentence in best)
+
+    @staticmethod
+    def _split_prompt(prompt: str) -> Tuple[str, str]:
+        body, _, question = prompt.rpartition("\nQuestion:")
+        if not body:
+            return "", prompt
+        # Drop the instruction line before the context
+        _, _, context = body.partition("\n\n")
+        question = question.split("\nHelpful Answer:")[0]
+        return context, question
+
+
+def _openai_embeddings() -> Embeddings:
+    return OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+
+
+def _openai_llm() -> BaseLLM:
+    return OpenAI(temperature=0.7, openai_api_key=OPENAI_API_KEY)
+
+
+PROVIDERS: Dict[str, Tuple[Callable[[], Embeddings], Callable[[], BaseLLM]]] = {
+    "openai": (_openai_embeddings, _openai_llm),
+    "local": (LocalHashEmbeddings, ExtractiveLLM),
+}
+
+
+def _provider(name: str):
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown AI provider: {name} (expected one of {', '.join(PROVIDERS)})")
+    return PROVIDERS[name]
+
+
+def create_embeddings(provider: str = AI_PROVIDER) -> Embeddings:
+    """Embeddings for the configured provider"""
+    return _provider(provider)[0]()
+
+
+def create_llm(provider: str = AI_PROVIDER) -> BaseLLM:
+    """LLM for the configured provider"""
+    return _provider(provider)[1]()
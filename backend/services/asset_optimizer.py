@@ -0,0 +1,312 @@
+# backend/services/asset_optimizer.py
+# Asset optimization pipeline: image recompression, minification, precompression
+
+import os
+import gzip
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models import Game, GameAsset
+from backend.services.rollups import add_assets
+from backend.services.asset_store import AssetStore
+from backend.services.storage import StoredFile
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; images are left untouched without it
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; only gzip variants are produced without it
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:  # rjsmin is optional; JavaScript is only precompressed without it
+    rjsmin = None
+
+logger = logging.getLogger(__name__)
+
+ASSET_OPTIMIZER_WORKERS = int(os.getenv("ASSET_OPTIMIZER_WORKERS", "0")) or os.cpu_count()
+ASSET_MAX_IMAGE_DIMENSION = int(os.getenv("ASSET_MAX_IMAGE_DIMENSION", "2048"))
+ASSET_JPEG_QUALITY = int(os.getenv("ASSET_JPEG_QUALITY", "85"))
+ASSET_OPTIMIZE_MAX_BYTES = int(os.getenv("ASSET_OPTIMIZE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+TEXT_EXTENSIONS = {".css", ".html", ".htm", ".svg", ".txt", ".wasm", ".xml", ".csv"}
+PRECOMPRESSED_KINDS = {"js", "json", "text"}
+
+
+def classify(asset_type: Optional[str], filename: Optional[str]) -> str:
+    """Map a content type and filename to an optimizer kind"""
+    asset_type = (asset_type or "").lower()
+    ext = Path(filename or "").suffix.lower()
+    if ext in IMAGE_EXTENSIONS or asset_type in ("image/png", "image/jpeg", "image/webp"):
+        return "image"
+    if ext in (".js", ".mjs") or "javascript" in asset_type:
+        return "js"
+    if ext == ".json" or asset_type == "application/json":
+        return "json"
+    if ext in TEXT_EXTENSIONS or asset_type.startswith("text/") or asset_type in ("image/svg+xml", "application/wasm"):
+        return "text"
+    return "other"
+
+
+def _optimize_image(data: bytes, actions: List[str]) -> Optional[bytes]:
+    if Image is None:
+        return None
+
+    img = Image.open(BytesIO(data))
+    fmt = img.format
+    if max(img.size) > ASSET_MAX_IMAGE_DIMENSION:
+        img.thumbnail((ASSET_MAX_IMAGE_DIMENSION, ASSET_MAX_IMAGE_DIMENSION), Image.LANCZOS)
+        actions.append("Resized textures")
+
+    out = BytesIO()
+    if fmt == "PNG":
+        img.save(out, "PNG", optimize=True)
+    elif fmt == "JPEG":
+        img.save(out, "JPEG", quality=ASSET_JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == "WEBP":
+        img.save(out, "WEBP", quality=ASSET_JPEG_QUALITY, method=6)
+    else:
+        return None
+
+    actions.append("Compressed textures")
+    return out.getvalue()
+
+
+def _minify_json(data: bytes, actions: List[str]) -> bytes:
+    minified = json.dumps(json.loads(data), separators=(",", ":"), ensure_ascii=False).encode()
+    actions.append("Minified JSON")
+    return minified
+
+
+def _minify_js(data: bytes, actions: List[str]) -> Optional[bytes]:
+    if rjsmin is None:
+        return None
+    actions.append("Minified code bundles")
+    return rjsmin.jsmin(data)
+
+
+def optimize_file(src: str, asset_type: Optional[str], filename: Optional[str], scratch_dir: str) -> Dict[str, any]:
+    """Optimize one stored file into scratch_dir.
+
+    Runs in a worker process. Returns the optimized file (only if it is
+    smaller than the original) and gzip/brotli variants of whichever
+    version is kept.
+    """
+    start = time.perf_counter()
+    kind = classify(asset_type, filename)
+    original_size = os.path.getsize(src)
+    result = {
+        "kind": kind,
+        "original_size": original_size,
+        "optimized_size": original_size,
+        "output": None,
+        "sha256": None,
+        "variants": {},
+        "actions": [],
+        "error": None,
+    }
+
+    if kind == "other" or original_size > ASSET_OPTIMIZE_MAX_BYTES:
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    with open(src, "rb") as f:
+        data = f.read()
+
+    actions = result["actions"]
+    optimized = None
+    try:
+        if kind == "image":
+            optimized = _optimize_image(data, actions)
+        elif kind == "json":
+            optimized = _minify_json(data, actions)
+        elif kind == "js":
+            optimized = _minify_js(data, actions)
+    except Exception as e:
+        result["error"] = str(e)
+        optimized = None
+
+    final = data
+    if optimized is not None and len(optimized) < len(data):
+        final = optimized
+        output = Path(scratch_dir) / uuid.uuid4().hex
+        output.write_bytes(final)
+        result.update(
+            output=str(output),
+            optimized_size=len(final),
+            sha256=hashlib.sha256(final).hexdigest()
+        )
+
+    if kind in PRECOMPRESSED_KINDS:
+        base = Path(scratch_dir) / uuid.uuid4().hex
+        gz_path = base.with_suffix(".gz")
+        gz_path.write_bytes(gzip.compress(final, compresslevel=9, mtime=0))
+        result["variants"]["gz"] = str(gz_path)
+        if brotli is not None:
+            br_path = base.with_suffix(".br")
+            br_path.write_bytes(brotli.compress(final, quality=11))
+            result["variants"]["br"] = str(br_path)
+        actions.append("Precompressed static assets")
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class AssetOptimizer:
+    """Optimizes a game's GameAsset blobs across all cores"""
+
+    def __init__(self, store: AssetStore, max_workers: int = ASSET_OPTIMIZER_WORKERS):
+        self.store = store
+        self.max_workers = max_workers
+        self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn avoids forking a process that holds event loop and DB threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def optimize_game(self, db: AsyncSession, game_id: str) -> Dict[str, any]:
+        """Optimize every unoptimized asset of a game and report measured savings"""
+        logger.info(f"Optimizing assets for game: {game_id}")
+        wall_start = time.perf_counter()
+
+        game = await db.scalar(select(Game).where(Game.game_id == game_id))
+        if not game:
+            return None
+
+        assets = (await db.scalars(
+            select(GameAsset).where(GameAsset.game_id == game.id, GameAsset.optimized.is_(False))
+        )).all()
+
+        # Assets sharing a blob are optimized once
+        groups: Dict[str, List[GameAsset]] = defaultdict(list)
+        for asset in assets:
+            groups[asset.file_path].append(asset)
+
+        scratch_dir = self.store.storage.incoming_dir
+        await asyncio.to_thread(scratch_dir.mkdir, parents=True, exist_ok=True)
+
+        loop = asyncio.get_running_loop()
+        paths = list(groups)
+        results = await asyncio.gather(*(
+            loop.run_in_executor(
+                self._pool(),
+                optimize_file,
+                path,
+                groups[path][0].asset_type,
+                groups[path][0].filename or path,
+                str(scratch_dir)
+            )
+            for path in paths
+        ), return_exceptions=True)
+
+        by_type = defaultdict(lambda: {"assets": 0, "original_bytes": 0, "optimized_bytes": 0, "seconds": 0.0})
+        actions = set()
+        released = []
+        promoted: List[StoredFile] = []
+        placements: List[Tuple[Path, Path]] = []
+        size_delta = 0
+        for path, result in zip(paths, results):
+            group = groups[path]
+            if isinstance(result, Exception):
+                logger.error(f"Optimizing {path} failed: {result}")
+                continue
+            if result["error"]:
+                logger.warning(f"Optimizing {path} failed: {result['error']}")
+
+            final_path = path
+            if result["output"]:
+                stored = StoredFile(Path(result["output"]), result["optimized_size"], result["sha256"])
+                blob = await self.store.put(db, stored)
+                promoted.append(stored)
+                for _ in group[1:]:
+                    await self.store.reference(db, blob.sha256)
+                released.extend(a.content_hash for a in group if a.content_hash)
+                final_path = blob.file_path
+                for asset in group:
+                    size_delta += blob.size - (asset.file_size or 0)
+                    asset.content_hash = blob.sha256
+                    asset.file_path = blob.file_path
+                    asset.file_size = blob.size
+
+            for encoding, variant in result["variants"].items():
+                placements.append((Path(variant), Path(f"{final_path}.{encoding}")))
+
+            for asset in group:
+                asset.optimized = True
+
+            stats = by_type[result["kind"]]
+            stats["assets"] += len(group)
+            stats["original_bytes"] += result["original_size"] * len(group)
+            stats["optimized_bytes"] += result["optimized_size"] * len(group)
+            stats["seconds"] += result["seconds"]
+            actions.update(result["actions"])
+
+        await self.store.release(db, released)
+        orphaned = await self.store.collect_garbage(db, released)
+        if size_delta:
+            await add_assets(db, game.id, count=0, size=size_delta)
+        await db.commit()
+        # Files follow the committed rows: new blobs (then their variants) in, collected blobs out
+        for stored in promoted:
+            await self.store.promote(stored)
+        for variant, dest in placements:
+            await self._place_variant(variant, dest)
+        await self.store.remove_files(db, orphaned)
+
+        original = sum(s["original_bytes"] for s in by_type.values())
+        optimized = sum(s["optimized_bytes"] for s in by_type.values())
+        for stats in by_type.values():
+            stats["saved_bytes"] = stats["original_bytes"] - stats["optimized_bytes"]
+            stats["seconds"] = round(stats["seconds"], 4)
+
+        return {
+            "game_id": game_id,
+            "assets_optimized": sum(s["assets"] for s in by_type.values()),
+            "original_size": _format_size(original),
+            "optimized_size": _format_size(optimized),
+            "reduction": f"{(original - optimized) / original * 100:.0f}%" if original else "0%",
+            "saved_bytes": original - optimized,
+            "wall_time_seconds": round(time.perf_counter() - wall_start, 4),
+            "by_type": dict(by_type),
+            "actions": sorted(actions)
+        }
+
+    async def _place_variant(self, variant: Path, dest: Path):
+        """Move a precompressed variant next to its blob"""
+        if await asyncio.to_thread(dest.exists):
+            await self.store.storage.discard(variant)
+        else:
+            await asyncio.to_thread(os.replace, variant, dest)
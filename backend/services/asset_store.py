@@ -0,0 +1,125 @@
+# backend/services/asset_store.py
+# Content-addressed, reference-counted asset blob store
+
+import uuid
+import logging
+from pathlib import Path
+from typing import Iterable, List, Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models import AssetBlob
+from backend.services.storage import AssetStorage, StoredFile
+
+logger = logging.getLogger(__name__)
+
+# Precompressed variants stored next to a blob (see asset_optimizer)
+PRECOMPRESSED_ENCODINGS = ("gz", "br")
+
+
+class AssetStore:
+    """Stores identical asset bytes once, keyed by SHA-256.
+
+    GameAsset rows point at an AssetBlob whose ref_count tracks how many
+    assets share it. Reference changes are made in the caller's session so
+    they commit atomically with the GameAsset rows. Files follow the rows:
+    a new blob's file is moved into place only after its row commits, and
+    removed only after garbage collection has deleted the row and no
+    concurrent upload of the same bytes has inserted it again.
+    """
+
+    def __init__(self, storage: AssetStorage):
+        self.storage = storage
+
+    @staticmethod
+    def _insert(db: AsyncSession):
+        return pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+
+    async def exists(self, db: AsyncSession, sha256: str) -> Optional[AssetBlob]:
+        """Look up a live blob by hash"""
+        blob = await db.get(AssetBlob, sha256)
+        if blob and blob.ref_count > 0:
+            return blob
+        return None
+
+    async def put(self, db: AsyncSession, stored: StoredFile) -> AssetBlob:
+        """Take a reference on a freshly written file's bytes, adding the blob row if new.
+        
+        Call promote() with the file once the session has committed, so a
+        rolled back upload leaves no blob file behind.
+        """
+        path = self.storage.blob_path(stored.sha256)
+        stmt = self._insert(db)(AssetBlob).values(
+            sha256=stored.sha256,
+            size=stored.size,
+            file_path=str(path),
+            ref_count=1
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AssetBlob.sha256],
+            set_={"ref_count": AssetBlob.ref_count + 1}
+        )
+        await db.execute(stmt)
+        return await db.get(AssetBlob, stored.sha256, populate_existing=True)
+
+    async def promote(self, stored: StoredFile):
+        """Move a file passed to put() to its content address, after the commit"""
+        await self.storage.promote(stored)
+
+    async def reference(self, db: AsyncSession, sha256: str) -> Optional[AssetBlob]:
+        """Take a reference on an existing blob, skipping the transfer"""
+        result = await db.execute(
+            update(AssetBlob)
+            .where(AssetBlob.sha256 == sha256, AssetBlob.ref_count > 0)
+            .values(ref_count=AssetBlob.ref_count + 1)
+        )
+        if result.rowcount == 0:
+            return None
+        return await db.get(AssetBlob, sha256, populate_existing=True)
+
+    async def release(self, db: AsyncSession, hashes: Iterable[str]):
+        """Drop one reference per hash occurrence"""
+        for sha256 in hashes:
+            await db.execute(
+                update(AssetBlob)
+                .where(AssetBlob.sha256 == sha256)
+                .values(ref_count=AssetBlob.ref_count - 1)
+            )
+
+    async def collect_garbage(self, db: AsyncSession, hashes: Optional[Iterable[str]] = None) -> List[Path]:
+        """Delete unreferenced blob rows and return their files for removal.
+
+        Pending ORM changes are flushed first, so rows the caller deleted or
+        re-pointed no longer reference the blobs being collected. Call
+        remove_files() with the result once the session has committed.
+        """
+        await db.flush()
+        stmt = delete(AssetBlob).where(AssetBlob.ref_count <= 0)
+        if hashes is not None:
+            stmt = stmt.where(AssetBlob.sha256.in_(set(hashes)))
+        result = await db.execute(stmt.returning(AssetBlob.file_path))
+        return [Path(path) for path in result.scalars().all()]
+
+    async def remove_files(self, db: AsyncSession, paths: Iterable[Path]):
+        """Remove blob files whose rows were garbage collected (after the commit).
+        
+        A concurrent put() of the same bytes may have inserted the row again
+        since. Each file is moved aside first and deleted only if a new
+        transaction still finds no row; otherwise it is moved back. A put()
+        promoting in the meantime only replaces it with the same bytes.
+        """
+        for path in paths:
+            aside = path.with_name(f"{path.name}.{uuid.uuid4().hex}.gc")
+            if not await self.storage.move(path, aside):
+                continue
+            live = await db.scalar(select(AssetBlob.sha256).where(AssetBlob.sha256 == path.name))
+            await db.commit()
+            if live is not None:
+                await self.storage.move(aside, path)
+                logger.info(f"Kept re-uploaded blob: {path.name}")
+                continue
+            await self.storage.discard(aside)
+            for encoding in PRECOMPRESSED_ENCODINGS:
+                await self.storage.discard(path.with_name(f"{path.name}.{encoding}"))
+            logger.info(f"Garbage collected blob: {path.name}")
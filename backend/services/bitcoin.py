@@ -0,0 +1,244 @@
+# backend/services/bitcoin.py
+# Bitcoin payments to per-payment invoice addresses, with a single confirmation tracker
+
+import os
+import json
+import asyncio
+import logging
+import itertools
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+import httpx
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from backend.models import Game, Publication, Transaction
+from backend.services.bitcoin_regtest import LocalRegtestNode
+from backend.services.entity_cache import EntityCache
+from backend.services.rollups import add_revenue
+
+logger = logging.getLogger(__name__)
+
+# bitcoind wallet RPC endpoint, or "local" for the in-process regtest stand-in
+BITCOIN_RPC_URL = os.getenv("BITCOIN_RPC_URL", "http://localhost:8332")
+BITCOIN_RPC_USER = os.getenv("BITCOIN_RPC_USER", "")
+BITCOIN_RPC_PASSWORD = os.getenv("BITCOIN_RPC_PASSWORD", "")
+BITCOIN_RPC_TIMEOUT = float(os.getenv("BITCOIN_RPC_TIMEOUT", "30"))
+BITCOIN_MIN_CONFIRMATIONS = int(os.getenv("BITCOIN_MIN_CONFIRMATIONS", "2"))
+# Confirmation polling: delay after activity, and the cap it backs off to while nothing changes
+BITCOIN_POLL_INTERVAL = float(os.getenv("BITCOIN_POLL_INTERVAL", "30"))
+BITCOIN_POLL_MAX_INTERVAL = float(os.getenv("BITCOIN_POLL_MAX_INTERVAL", "600"))
+
+BITCOIN_METHODS = ("xverse", "vesu")
+
+
+class BitcoinRPCError(Exception):
+    """Error object returned by bitcoind"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{message} (code {code})")
+        self.code = code
+
+
+class BitcoinRPC:
+    """bitcoind JSON-RPC client on one pooled keep-alive session"""
+
+    def __init__(self,
+                 url: str = BITCOIN_RPC_URL,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 user: str = BITCOIN_RPC_USER,
+                 password: str = BITCOIN_RPC_PASSWORD,
+                 timeout: float = BITCOIN_RPC_TIMEOUT):
+        self.url = url
+        self.http = httpx.AsyncClient(
+            transport=transport,
+            auth=(user, password) if user else None,
+            timeout=timeout
+        )
+        self._ids = itertools.count(1)
+        self.calls = 0
+        self.http_requests = 0
+
+    async def call(self, method: str, *params) -> Any:
+        [result] = await self.batch([(method, list(params))])
+        if isinstance(result, BitcoinRPCError):
+            raise result
+        return result
+
+    async def batch(self, calls: Sequence[Tuple[str, List[Any]]]) -> List[Any]:
+        """Send calls in one HTTP request; failed calls come back as BitcoinRPCError values"""
+        payloads = [
+            {"jsonrpc": "1.0", "id": next(self._ids), "method": method, "params": params}
+            for method, params in calls
+        ]
+        self.calls += len(payloads)
+        self.http_requests += 1
+        response = await self.http.post(self.url, json=payloads)
+        # bitcoind reports RPC errors with HTTP 500 and a JSON body
+        if response.status_code != 200 and "json" not in response.headers.get("content-type", ""):
+            response.raise_for_status()
+        # Amounts are parsed as Decimal: floats cannot represent most satoshi values exactly
+        responses = {item.get("id"): item for item in json.loads(response.content, parse_float=Decimal)}
+
+        results = []
+        for payload in payloads:
+            item = responses.get(payload["id"])
+            if item is None:
+                results.append(BitcoinRPCError(-32603, "No response for request"))
+            elif item.get("error"):
+                results.append(BitcoinRPCError(item["error"].get("code"), item["error"].get("message", "")))
+            else:
+                results.append(item.get("result"))
+        return results
+
+    async def close(self):
+        await self.http.aclose()
+
+
+def create_bitcoin_rpc(url: str = BITCOIN_RPC_URL) -> BitcoinRPC:
+    if url == "local":
+        return BitcoinRPC("http://regtest.local/", transport=httpx.ASGITransport(app=LocalRegtestNode(block_time=60)))
+    return BitcoinRPC(url)
+
+
+def pending_settlements():
+    """Bitcoin payments recorded but not yet confirmed"""
+    return (Transaction.payment_method.in_(BITCOIN_METHODS), Transaction.status == "pending")
+
+
+class BitcoinSettlement:
+    """Tracks incoming Bitcoin payments and their confirmations.
+
+    Each payment is invoiced to a fresh address of the platform wallet
+    (see PaymentProcessor.process_bitcoin_payment) and recorded as a
+    pending Transaction with that address as to_address; the developer's
+    wallet pays it. One background loop asks the wallet what every
+    pending address has received, in one batched RPC request, backing
+    off while nothing changes. Once the full amount has arrived the row
+    records the paying transaction, and it moves pending -> confirmed at
+    `min_confirmations`; a publication awaiting that payment is published
+    in the same commit. A payment that is replaced or double-spent drops
+    out of the wallet's totals, so its row goes back to waiting.
+
+    Only the polling is batched. The platform receives these fees and
+    pays nothing out, so there are no outgoing payments to batch into a
+    single sendmany transaction.
+    """
+
+    def __init__(self,
+                 session_factory: async_sessionmaker,
+                 rpc: BitcoinRPC,
+                 min_confirmations: int = BITCOIN_MIN_CONFIRMATIONS,
+                 poll_interval: float = BITCOIN_POLL_INTERVAL,
+                 max_poll_interval: float = BITCOIN_POLL_MAX_INTERVAL,
+                 entity_cache: Optional[EntityCache] = None):
+        self.session_factory = session_factory
+        self.rpc = rpc
+        self.min_confirmations = min_confirmations
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.entity_cache = entity_cache
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Bitcoin settlement started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self):
+        """Wake the loop after recording a payment"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        delay = self.poll_interval
+        while True:
+            self._wakeup.clear()
+            active = False
+            try:
+                async with self.session_factory() as db:
+                    active = await self.track(db)
+            except Exception as e:
+                logger.error(f"Bitcoin settlement cycle failed: {e}")
+
+            delay = self.poll_interval if active else min(delay * 2, self.max_poll_interval)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def track(self, db: AsyncSession) -> bool:
+        """Poll every pending invoice address in one request; True if any payment changed"""
+        rows = (await db.execute(
+            select(Transaction.id, Transaction.transaction_id, Transaction.to_address, Transaction.amount,
+                   Transaction.blockchain_tx_hash, Transaction.confirmations)
+            .where(*pending_settlements(), Transaction.to_address.is_not(None))
+        )).all()
+        if not rows:
+            return False
+
+        # minconf 0 counts mempool payments; "confirmations" is that of the latest payment to the address
+        results = await self.rpc.batch([
+            ("listreceivedbyaddress", [0, True, False, row.to_address]) for row in rows
+        ])
+        changed = False
+        published = []
+        for row, received in zip(rows, results):
+            if isinstance(received, BitcoinRPCError):
+                logger.warning(f"Payment check for {row.to_address} failed: {received}")
+                continue
+            if not received:
+                logger.warning(f"Invoice address {row.to_address} is not in the wallet")
+                continue
+            [entry] = received
+            paid = Decimal(entry["amount"]) >= Decimal(row.amount)
+            txid = entry["txids"][-1] if paid else None
+            confirmations = entry["confirmations"] if paid else 0
+            if (txid, confirmations) == (row.blockchain_tx_hash, row.confirmations or 0):
+                continue
+
+            values = {"blockchain_tx_hash": txid, "confirmations": confirmations}
+            if paid and confirmations >= self.min_confirmations:
+                values.update(status="confirmed", confirmed_at=datetime.utcnow())
+            updated = await db.execute(
+                update(Transaction)
+                .where(*pending_settlements(), Transaction.id == row.id)
+                .values(**values)
+                .returning(Transaction.game_id, Transaction.currency, Transaction.amount)
+            )
+            if "status" in values:
+                # Confirmed payments count towards game revenue in the same commit
+                await add_revenue(db, updated.all())
+                published.extend(await self._publish(db, row.transaction_id))
+            changed = True
+        await db.commit()
+        if self.entity_cache is not None:
+            for game_id in published:
+                await self.entity_cache.invalidate(Game, game_id)
+        return changed
+
+    async def _publish(self, db: AsyncSession, transaction_id: str) -> List[str]:
+        """Publish the game whose publication awaits this payment; returns its public game_id"""
+        now = datetime.utcnow()
+        game_ids = (await db.execute(
+            update(Publication)
+            .where(Publication.transaction_id == transaction_id, Publication.status == "awaiting_payment")
+            .values(status="published", updated_at=now)
+            .returning(Publication.game_id)
+        )).scalars().all()
+        if not game_ids:
+            return []
+        published = await db.execute(
+            update(Game)
+            .where(Game.id.in_(game_ids))
+            .values(status="published", published_at=now)
+            .returning(Game.game_id)
+        )
+        return published.scalars().all()
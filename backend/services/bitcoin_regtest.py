@@ -0,0 +1,135 @@
+# backend/services/bitcoin_regtest.py
+# In-process bitcoind wallet RPC stand-in (regtest-style) for local development and tests
+
+import time
+import hashlib
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INVALID_PARAMS = -32602
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class LocalRegtestNode:
+    """ASGI app answering the bitcoind wallet calls used for invoicing.
+
+    getnewaddress hands out invoice addresses; pay() stands in for a
+    payer's wallet sending to one of them, into the mempool.
+    generatetoaddress (or mine()) confirms it, and with block_time set
+    blocks are also mined as time passes. conflict() marks a transaction
+    as replaced. Serve it through httpx.ASGITransport.
+    """
+
+    def __init__(self, block_time: Optional[float] = None):
+        self.block_time = block_time
+        self.height = 0
+        self.addresses: Dict[str, str] = {}
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+        self.stats = Counter()
+        self._last_block = time.monotonic()
+
+    async def __call__(self, scope, receive, send):
+        body = await Request(scope, receive).json()
+        self.stats["http_requests"] += 1
+        self._mine_due_blocks()
+        if isinstance(body, list):
+            content, status = [self._handle(item) for item in body], 200
+        else:
+            content = self._handle(body)
+            status = 500 if content["error"] else 200
+        await JSONResponse(content, status_code=status)(scope, receive, send)
+
+    def pay(self, address: str, amount: str) -> str:
+        """Send amount BTC to address from outside the wallet; returns the txid"""
+        txid = hashlib.sha256(f"{len(self.transactions)}:{address}:{amount}".encode()).hexdigest()
+        self.transactions[txid] = {
+            "address": address,
+            "amount": Decimal(amount),
+            "height": None,
+            "conflicted": False,
+        }
+        self.stats["transactions"] += 1
+        return txid
+
+    def mine(self, blocks: int = 1):
+        self.height += blocks
+        for tx in self.transactions.values():
+            if tx["height"] is None and not tx["conflicted"]:
+                tx["height"] = self.height - blocks + 1
+
+    def conflict(self, txid: str):
+        self.transactions[txid]["conflicted"] = True
+
+    def _mine_due_blocks(self):
+        if self.block_time:
+            due = int((time.monotonic() - self._last_block) / self.block_time)
+            if due:
+                self._last_block += due * self.block_time
+                self.mine(due)
+
+    def _handle(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.stats["calls"] += 1
+        response = {"result": None, "error": None, "id": payload.get("id")}
+        handler = getattr(self, f"rpc_{payload.get('method')}", None)
+        try:
+            if handler is None:
+                raise RPCError(RPC_METHOD_NOT_FOUND, "Method not found")
+            response["result"] = handler(*payload.get("params", []))
+        except RPCError as e:
+            response["error"] = {"code": e.code, "message": str(e)}
+        except (TypeError, ValueError, KeyError, ArithmeticError) as e:
+            response["error"] = {"code": RPC_INVALID_PARAMS, "message": f"Invalid params: {e}"}
+        return response
+
+    # RPC methods
+
+    def rpc_getblockcount(self) -> int:
+        return self.height
+
+    def rpc_getnewaddress(self, label: str = "", address_type: Optional[str] = None) -> str:
+        address = "bcrt1q" + hashlib.sha256(f"address{len(self.addresses)}".encode()).hexdigest()[:38]
+        self.addresses[address] = label
+        return address
+
+    def rpc_generatetoaddress(self, blocks: int, address: str) -> List[str]:
+        self.mine(blocks)
+        return [hashlib.sha256(f"block{self.height - i}".encode()).hexdigest() for i in range(blocks)]
+
+    def rpc_listreceivedbyaddress(self,
+                                  minconf: int = 1,
+                                  include_empty: bool = False,
+                                  include_watchonly: bool = False,
+                                  address_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        entries = []
+        for address, label in self.addresses.items():
+            if address_filter is not None and address != address_filter:
+                continue
+            received = [
+                (txid, tx) for txid, tx in self.transactions.items()
+                if tx["address"] == address and self._confirmations(tx) >= minconf
+            ]
+            if not received and not include_empty:
+                continue
+            entries.append({
+                "address": address,
+                "amount": float(sum((tx["amount"] for _, tx in received), Decimal(0))),
+                # Like bitcoind: the confirmations of the most recent payment
+                "confirmations": min((self._confirmations(tx) for _, tx in received), default=0),
+                "label": label,
+                "txids": [txid for txid, _ in received],
+            })
+        return entries
+
+    def _confirmations(self, tx: Dict[str, Any]) -> int:
+        if tx["conflicted"]:
+            return -1
+        return 0 if tx["height"] is None else self.height - tx["height"] + 1
@@ -1,13 +1,38 @@
 # backend/services/dojo_engine.py
 # Dojo game engine integration
 
+import os
+import copy
+import json
 import logging
 import hashlib
 import uuid
-from typing import Dict, List
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List
 
 logger = logging.getLogger(__name__)
 
+# Versioned catalog of open-source game templates
+DOJO_TEMPLATES_FILE = os.getenv(
+    "DOJO_TEMPLATES_FILE", str(Path(__file__).resolve().parent.parent / "data" / "game_templates.json")
+)
+
+
+@lru_cache(maxsize=None)
+def load_template_catalog(path: str = DOJO_TEMPLATES_FILE) -> Dict[str, Any]:
+    """Read and validate a template catalog once: {"version": int, "templates": [...]}"""
+    with open(path) as f:
+        catalog = json.load(f)
+    if not isinstance(catalog.get("version"), int) or not isinstance(catalog.get("templates"), list):
+        raise ValueError(f"Template catalog {path} needs an integer version and a templates list")
+    for template in catalog["templates"]:
+        missing = {"id", "name", "description", "repository", "features"} - template.keys()
+        if missing:
+            raise ValueError(f"Template {template.get('id', '?')} in {path} is missing {sorted(missing)}")
+    logger.info(f"Loaded {len(catalog['templates'])} game templates (catalog v{catalog['version']})")
+    return catalog
+
 
 class DojoEngine:
     """Dojo game engine integration"""
@@ -37,56 +62,5 @@ class DojoEngine:
     
     @staticmethod
     async def get_game_templates() -> List[Dict[str, any]]:
-        """Get available open-source game templates"""
-        templates = [
-            {
-                "id": "rpg",
-                "name": "RPG Starter",
-                "description": "Turn-based RPG with Dojo state management",
-                "repository": "https://github.com/dojoengine/dojo-rpg-starter",
-                "license": "MIT",
-                "features": ["Turn-based combat", "Character progression", "Inventory system"]
-            },
-            {
-                "id": "platformer",
-                "name": "2D Platformer",
-                "description": "Physics-based platformer template",
-                "repository": "https://github.com/dojoengine/dojo-platformer",
-                "license": "MIT",
-                "features": ["Physics engine", "Level editor", "Collectibles"]
-            },
-            {
-                "id": "card",
-                "name": "Card Battle",
-                "description": "Deck-building card game framework",
-                "repository": "https://github.com/dojoengine/dojo-card-battle",
-                "license": "MIT",
-                "features": ["Deck builder", "PvP battles", "Card crafting"]
-            },
-            {
-                "id": "strategy",
-                "name": "Strategy Base",
-                "description": "Real-time strategy game template",
-                "repository": "https://github.com/dojoengine/dojo-strategy",
-                "license": "MIT",
-                "features": ["Resource management", "Unit control", "Base building"]
-            },
-            {
-                "id": "puzzle",
-                "name": "Puzzle Kit",
-                "description": "Match-3 and puzzle mechanics",
-                "repository": "https://github.com/dojoengine/dojo-puzzle",
-                "license": "MIT",
-                "features": ["Match-3 engine", "Power-ups", "Level progression"]
-            },
-            {
-                "id": "multiplayer",
-                "name": "Multiplayer Starter",
-                "description": "Online multiplayer with Dojo",
-                "repository": "https://github.com/dojoengine/dojo-multiplayer",
-                "license": "MIT",
-                "features": ["Real-time sync", "Matchmaking", "Leaderboards"]
-            }
-        ]
-        
-        return templates
+        """Get available open-source game templates (from DOJO_TEMPLATES_FILE)"""
+        return copy.deepcopy(load_template_catalog()["templates"])
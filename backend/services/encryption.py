@@ -2,36 +2,506 @@
 # End-to-end encryption for private communications (Wootzapp)
 
 import os
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2
+import re
+import hmac
+import json
+import time
+import fcntl
+import base64
+import asyncio
+import struct
+import hashlib
+import logging
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
-ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", Fernet.generate_key())
+logger = logging.getLogger(__name__)
+
+ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
+# Versioned keys as "id:key,id:key", primary (used for new data) first; overrides ENCRYPTION_KEY
+ENCRYPTION_KEYS = os.getenv("ENCRYPTION_KEYS", "")
+# Where a generated key is kept when neither is set, so it survives restarts
+ENCRYPTION_KEY_FILE = Path(os.getenv("ENCRYPTION_KEY_FILE", ".cache/encryption_keys.json"))
+ENCRYPTION_KDF_ITERATIONS = int(os.getenv("ENCRYPTION_KDF_ITERATIONS", "100000"))
+ENCRYPTION_KDF_WORKERS = int(os.getenv("ENCRYPTION_KDF_WORKERS", "2"))
+ENCRYPTION_KEY_CACHE_SIZE = int(os.getenv("ENCRYPTION_KEY_CACHE_SIZE", "10000"))
+ENCRYPTION_KEY_CACHE_TTL = float(os.getenv("ENCRYPTION_KEY_CACHE_TTL", "900"))
+# Message format: "fernet" tokens, or "aes-gcm" (smaller tokens; both always decrypt)
+ENCRYPTION_MODE = os.getenv("ENCRYPTION_MODE", "fernet")
+ENCRYPTION_STREAM_CHUNK_SIZE = int(os.getenv("ENCRYPTION_STREAM_CHUNK_SIZE", str(64 * 1024)))
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Key id of ENCRYPTION_KEY, and of data encrypted before keys were versioned
+LEGACY_KEY_ID = "default"
+KEY_ID_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+NONCE_SIZE = 12
+TAG_SIZE = 16
+GCM_TOKEN_PREFIX = "gcm1:"
+# Stream header: magic, plaintext chunk size, random nonce prefix
+STREAM_MAGIC = b"WZS1"
+STREAM_HEADER = struct.Struct(">4sI7s")
+# Frame nonce: nonce prefix, frame counter, last-frame flag
+FRAME_NONCE = struct.Struct(">7sIB")
+
+
+def zeroize(material: bytearray):
+    """Overwrite key material in place"""
+    material[:] = bytes(len(material))
+
+
+@dataclass
+class CachedKey:
+    material: bytearray
+    cipher: Fernet
+    expires_at: float
+
+
+class KeyCache:
+    """Bounded LRU of derived user keys with a TTL.
+
+    Key material is held in a bytearray and overwritten as soon as an
+    entry is evicted, expires or is cleared. This is best effort: the
+    Fernet instance keeps its own immutable copy until it is collected.
+    """
+
+    def __init__(self, max_entries: int = ENCRYPTION_KEY_CACHE_SIZE, ttl: float = ENCRYPTION_KEY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedKey]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Fernet]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._discard(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.cipher
+
+    def put(self, key: str, material: bytearray) -> Fernet:
+        """Cache a derived key, returning its cipher"""
+        cipher = Fernet(base64.urlsafe_b64encode(material))
+        if self.max_entries <= 0:
+            zeroize(material)
+            return cipher
+        if key in self._entries:
+            self._discard(key)
+        self._entries[key] = CachedKey(material, cipher, time.monotonic() + self.ttl)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+        return cipher
+
+    def _discard(self, key: str):
+        zeroize(self._entries.pop(key).material)
+
+    def clear(self):
+        for key in list(self._entries):
+            self._discard(key)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class KeyRing:
+    """Versioned master keys, primary first.
+
+    New data is encrypted with the primary key and tagged with its id;
+    older keys stay available for decryption until their data has been
+    re-encrypted, then can be dropped.
+    """
+
+    def __init__(self, keys: List[Tuple[str, Union[str, bytes]]]):
+        if not keys:
+            raise ValueError("A key ring needs at least one key")
+        self.keys: Dict[str, bytes] = {}
+        for key_id, key in keys:
+            if not KEY_ID_RE.match(key_id) or key_id in self.keys:
+                raise ValueError(f"Invalid or duplicate encryption key id: {key_id!r}")
+            key = key.encode() if isinstance(key, str) else key
+            Fernet(key)  # validates the key
+            self.keys[key_id] = key
+        self.primary_id = keys[0][0]
+
+    @property
+    def primary(self) -> bytes:
+        return self.keys[self.primary_id]
+
+    def get(self, key_id: str) -> bytes:
+        try:
+            return self.keys[key_id]
+        except KeyError:
+            raise KeyError(f"Unknown encryption key id: {key_id}") from None
+
+    @classmethod
+    def parse(cls, spec: str) -> "KeyRing":
+        """Parse ENCRYPTION_KEYS: comma-separated id:key pairs, primary first"""
+        pairs = []
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            key_id, sep, key = item.partition(":")
+            if not sep:
+                raise ValueError("ENCRYPTION_KEYS entries must look like id:key")
+            pairs.append((key_id.strip(), key.strip()))
+        return cls(pairs)
+
+
+def load_keyring(keys_spec: str = ENCRYPTION_KEYS,
+                 key: Optional[str] = ENCRYPTION_KEY,
+                 key_file: Path = ENCRYPTION_KEY_FILE) -> KeyRing:
+    """Key ring from ENCRYPTION_KEYS, else ENCRYPTION_KEY, else the key file.
+
+    The key file is created with a generated key on first use, under a
+    lock so every worker on the host gets the same key. Replicas on
+    different hosts must share keys through the environment instead.
+    """
+    if keys_spec:
+        return KeyRing.parse(keys_spec)
+    if key:
+        return KeyRing([(LEGACY_KEY_ID, key)])
+
+    key_file = Path(key_file)
+    key_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(key_file.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not key_file.exists():
+                logger.warning(f"ENCRYPTION_KEYS is not set; generated a key in {key_file}")
+                tmp = key_file.with_suffix(".tmp")
+                with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as fh:
+                    json.dump({"keys": [{"id": LEGACY_KEY_ID, "key": Fernet.generate_key().decode()}]}, fh)
+                os.replace(tmp, key_file)
+            data = json.loads(key_file.read_text())
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return KeyRing([(entry["id"], entry["key"]) for entry in data["keys"]])
+
+
+class StreamSealer:
+    """Incremental encryptor for the chunked AEAD stream format.
+
+    Plaintext is cut into chunk_size frames, each sealed with AES-GCM
+    under a nonce of (random prefix, frame counter, last-frame flag) and
+    the stream header as associated data. Reordered, truncated or extended
+    streams therefore fail to decrypt. Memory is bounded by chunk_size
+    plus one fed piece.
+    """
+
+    def __init__(self, aead: AESGCM, chunk_size: int = ENCRYPTION_STREAM_CHUNK_SIZE):
+        self._aead = aead
+        self.chunk_size = chunk_size
+        self.header = STREAM_HEADER.pack(STREAM_MAGIC, chunk_size, os.urandom(7))
+        self._prefix = self.header[-7:]
+        self._counter = 0
+        self._buffer = bytearray()
+
+    def feed(self, data: BytesLike) -> Iterator[bytes]:
+        """Buffer data, yielding every frame known not to be the last"""
+        self._buffer += data
+        while len(self._buffer) > self.chunk_size:
+            yield self._seal(self.chunk_size, last=False)
+
+    def finish(self) -> bytes:
+        """Seal the remaining data as the last frame (possibly empty)"""
+        return self._seal(len(self._buffer), last=True)
+
+    def _seal(self, size: int, last: bool) -> bytes:
+        nonce = FRAME_NONCE.pack(self._prefix, self._counter, last)
+        frame = self._aead.encrypt(nonce, memoryview(self._buffer)[:size], self.header)
+        del self._buffer[:size]
+        self._counter += 1
+        return frame
+
+
+class StreamOpener:
+    """Incremental decryptor for streams written by StreamSealer.
+
+    Raises InvalidTag if any frame was altered, reordered, dropped or
+    appended, and ValueError if the data is not an encrypted stream.
+    Plaintext is released frame by frame, so callers must discard output
+    already written if finish() raises.
+    """
+
+    def __init__(self, aead: AESGCM):
+        self._aead = aead
+        self._header: Optional[bytes] = None
+        self._frame_size = 0
+        self._counter = 0
+        self._buffer = bytearray()
+
+    def feed(self, data: BytesLike) -> Iterator[bytes]:
+        self._buffer += data
+        if self._header is None:
+            if len(self._buffer) < STREAM_HEADER.size:
+                return
+            self._read_header()
+        while len(self._buffer) > self._frame_size:
+            yield self._open(self._frame_size, last=False)
+
+    def finish(self) -> bytes:
+        if self._header is None:
+            raise ValueError("Not an encrypted stream")
+        return self._open(len(self._buffer), last=True)
+
+    def _read_header(self):
+        magic, chunk_size, prefix = STREAM_HEADER.unpack_from(self._buffer)
+        if magic != STREAM_MAGIC:
+            raise ValueError("Not an encrypted stream")
+        self._header = bytes(self._buffer[:STREAM_HEADER.size])
+        self._prefix = prefix
+        self._frame_size = chunk_size + TAG_SIZE
+        del self._buffer[:STREAM_HEADER.size]
+
+    def _open(self, size: int, last: bool) -> bytes:
+        nonce = FRAME_NONCE.pack(self._prefix, self._counter, last)
+        plaintext = self._aead.decrypt(nonce, memoryview(self._buffer)[:size], self._header)
+        del self._buffer[:size]
+        self._counter += 1
+        return plaintext
+
+
+class AESGCMCipher:
+    """AES-256-GCM over bytes-like data.
+
+    encrypt/decrypt accept bytes, bytearray or memoryview without
+    converting them and produce nonce || ciphertext || tag: 28 bytes of
+    overhead and no base64, versus about 1.4x for a Fernet token. The
+    stream methods encrypt data of any size in bounded memory using the
+    StreamSealer frame format.
+    """
+
+    def __init__(self, key: bytes):
+        self._aead = AESGCM(key)
+
+    def encrypt(self, data: BytesLike, associated_data: Optional[bytes] = None) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self._aead.encrypt(nonce, data, associated_data)
+
+    def decrypt(self, blob: BytesLike, associated_data: Optional[bytes] = None) -> bytes:
+        view = memoryview(blob)
+        return self._aead.decrypt(view[:NONCE_SIZE], view[NONCE_SIZE:], associated_data)
+
+    def encrypt_many(self, items: List[BytesLike]) -> List[bytes]:
+        """Encrypt a batch, drawing all nonces from the OS in one call"""
+        nonces = os.urandom(NONCE_SIZE * len(items))
+        encrypt = self._aead.encrypt
+        blobs = []
+        for i, item in enumerate(items):
+            nonce = nonces[i * NONCE_SIZE:(i + 1) * NONCE_SIZE]
+            blobs.append(nonce + encrypt(nonce, item, None))
+        return blobs
+
+    def encrypt_stream(self, source: BinaryIO, dest: BinaryIO,
+                       chunk_size: int = ENCRYPTION_STREAM_CHUNK_SIZE) -> int:
+        """Encrypt a file object into another; returns plaintext bytes read"""
+        sealer = StreamSealer(self._aead, chunk_size)
+        dest.write(sealer.header)
+        size = 0
+        for data in iter(lambda: source.read(chunk_size), b""):
+            size += len(data)
+            for frame in sealer.feed(data):
+                dest.write(frame)
+        dest.write(sealer.finish())
+        return size
+
+    def decrypt_stream(self, source: BinaryIO, dest: BinaryIO,
+                       chunk_size: int = ENCRYPTION_STREAM_CHUNK_SIZE) -> int:
+        """Decrypt a file object into another; returns plaintext bytes written"""
+        opener = StreamOpener(self._aead)
+        size = 0
+        for data in iter(lambda: source.read(chunk_size), b""):
+            for plaintext in opener.feed(data):
+                size += dest.write(plaintext)
+        return size + dest.write(opener.finish())
+
+    async def encrypt_chunks(self, chunks: AsyncIterator[bytes],
+                             chunk_size: int = ENCRYPTION_STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Encrypt an async byte stream (e.g. an upload fed to AssetStorage.write_stream)"""
+        sealer = StreamSealer(self._aead, chunk_size)
+        yield sealer.header
+        async for data in chunks:
+            for frame in sealer.feed(data):
+                yield frame
+        yield sealer.finish()
+
+    async def decrypt_chunks(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Decrypt an async byte stream produced by encrypt_chunks or encrypt_stream"""
+        opener = StreamOpener(self._aead)
+        async for data in chunks:
+            for plaintext in opener.feed(data):
+                yield plaintext
+        yield opener.finish()
 
 
 class EncryptionService:
-    """End-to-end encryption for private communications"""
-    
-    def __init__(self, key: bytes = ENCRYPTION_KEY):
-        self.cipher = Fernet(key)
-    
+    """End-to-end encryption for private communications.
+
+    Besides the service-wide cipher, each user gets their own key derived
+    with PBKDF2-HMAC-SHA256 from a secret (their password, or the service
+    key for server-managed keys). Derivation is deliberately slow, so it
+    runs on a small dedicated thread pool and the result is kept in a
+    KeyCache; concurrent requests for the same key share one derivation.
+
+    Messages are Fernet tokens, or AES-GCM tokens when mode is "aes-gcm";
+    decryption accepts both, so the mode can be switched on live data.
+    Raw bytes and large files use AES-GCM (see AESGCMCipher).
+
+    Keys are versioned (see KeyRing): everything is encrypted with the
+    primary key, whose id is key_id, and any key in the ring decrypts.
+    """
+
+    def __init__(self,
+                 key: Optional[bytes] = None,
+                 keyring: Optional[KeyRing] = None,
+                 key_cache: Optional[KeyCache] = None,
+                 kdf_iterations: int = ENCRYPTION_KDF_ITERATIONS,
+                 kdf_executor: Optional[Executor] = None,
+                 mode: str = ENCRYPTION_MODE):
+        if mode not in ("fernet", "aes-gcm"):
+            raise ValueError(f"Unknown encryption mode: {mode}")
+        self.keyring = keyring or (KeyRing([(LEGACY_KEY_ID, key)]) if key else load_keyring())
+        self.key_id = self.keyring.primary_id
+        self.key = self.keyring.primary
+        self.cipher = MultiFernet([Fernet(k) for k in self.keyring.keys.values()])
+        self.mode = mode
+        self._aeads = {
+            key_id: AESGCMCipher(hmac.new(k, b"aes-gcm", hashlib.sha256).digest())
+            for key_id, k in self.keyring.keys.items()
+        }
+        self.aead = self._aeads[self.key_id]
+        self.key_cache = key_cache or KeyCache()
+        self.kdf_iterations = kdf_iterations
+        self._kdf_executor = kdf_executor
+        self._pending: Dict[str, asyncio.Future] = {}
+
     def encrypt_message(self, message: str) -> str:
         """Encrypt a message"""
+        if self.mode == "aes-gcm":
+            return self._gcm_token(self.aead.encrypt(message.encode()))
         encrypted = self.cipher.encrypt(message.encode())
         return encrypted.decode()
-    
+
     def decrypt_message(self, encrypted_message: str) -> str:
         """Decrypt a message"""
+        if encrypted_message.startswith(GCM_TOKEN_PREFIX):
+            return self._open_gcm_token(encrypted_message).decode()
         decrypted = self.cipher.decrypt(encrypted_message.encode())
         return decrypted.decode()
-    
+
+    def encrypt_messages(self, messages: List[str]) -> List[str]:
+        """Encrypt a batch of messages"""
+        if self.mode == "aes-gcm":
+            return [self._gcm_token(blob) for blob in self.aead.encrypt_many([m.encode() for m in messages])]
+        encrypt = self.cipher.encrypt
+        return [encrypt(message.encode()).decode() for message in messages]
+
+    def decrypt_messages(self, encrypted_messages: List[str]) -> List[str]:
+        """Decrypt a batch of messages (Fernet and AES-GCM tokens may be mixed)"""
+        decrypt = self.cipher.decrypt
+        return [
+            self._open_gcm_token(token).decode() if token.startswith(GCM_TOKEN_PREFIX)
+            else decrypt(token.encode()).decode()
+            for token in encrypted_messages
+        ]
+
+    def _gcm_token(self, blob: bytes) -> str:
+        return f"{GCM_TOKEN_PREFIX}{self.key_id}:{base64.urlsafe_b64encode(blob).decode()}"
+
+    def _open_gcm_token(self, token: str) -> bytes:
+        key_id, _, payload = token[len(GCM_TOKEN_PREFIX):].partition(":")
+        if key_id not in self._aeads:
+            raise InvalidToken
+        try:
+            return self._aeads[key_id].decrypt(base64.urlsafe_b64decode(payload))
+        except (ValueError, InvalidTag) as e:
+            raise InvalidToken from e
+
+    def encrypt_bytes(self, data: BytesLike, associated_data: Optional[bytes] = None) -> bytes:
+        """Encrypt raw bytes with AES-GCM (no base64)"""
+        return self.aead.encrypt(data, associated_data)
+
+    def decrypt_bytes(self, blob: BytesLike, associated_data: Optional[bytes] = None,
+                      key_id: Optional[str] = None) -> bytes:
+        """Decrypt bytes from encrypt_bytes (made under key_id, default the primary)"""
+        aead = self.aead if key_id is None else self._aeads.get(key_id)
+        if aead is None:
+            raise KeyError(f"Unknown encryption key id: {key_id}")
+        return aead.decrypt(blob, associated_data)
+
+    def user_salt(self, user_id: str, key_id: Optional[str] = None) -> bytes:
+        """Per-user salt, unique to this deployment (not the bare user id)"""
+        master = self.keyring.get(key_id or self.key_id)
+        return hmac.new(master, f"user-salt:{user_id}".encode(), hashlib.sha256).digest()
+
+    def _derive(self, user_id: str, password: str, key_id: Optional[str] = None) -> bytearray:
+        # hashlib releases the GIL while deriving, so KDF threads don't stall the event loop
+        salt = self.user_salt(user_id, key_id)
+        return bytearray(hashlib.pbkdf2_hmac("sha256", password.encode(), salt, self.kdf_iterations, 32))
+
     def generate_user_key(self, user_id: str, password: str) -> bytes:
         """Generate user-specific encryption key"""
-        kdf = PBKDF2(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=user_id.encode(),
-            iterations=100000,
-        )
-        key = kdf.derive(password.encode())
-        return key
+        return bytes(self._derive(user_id, password))
+
+    def _cache_key(self, user_id: str, secret: Optional[str], key_id: str) -> Tuple[str, str]:
+        secret = self.keyring.get(key_id).decode() if secret is None else secret
+        digest = hmac.new(self.key, f"{key_id}\0{user_id}\0{secret}".encode(), hashlib.sha256).hexdigest()
+        return digest, secret
+
+    async def user_cipher(self, user_id, secret: Optional[str] = None, key_id: Optional[str] = None) -> Fernet:
+        """Cipher for a user's key under master key key_id (default the primary).
+
+        The key is derived off the event loop on a cache miss.
+        """
+        user_id = str(user_id)
+        key_id = key_id or self.key_id
+        cache_key, secret = self._cache_key(user_id, secret, key_id)
+        cipher = self.key_cache.get(cache_key)
+        if cipher is not None:
+            return cipher
+
+        pending = self._pending.get(cache_key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._derive_cipher(cache_key, user_id, secret, key_id))
+            self._pending[cache_key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(cache_key, None))
+        # A cancelled caller leaves the derivation running for the others
+        return await asyncio.shield(pending)
+
+    async def _derive_cipher(self, cache_key: str, user_id: str, secret: str, key_id: str) -> Fernet:
+        if self._kdf_executor is None:
+            self._kdf_executor = ThreadPoolExecutor(ENCRYPTION_KDF_WORKERS, thread_name_prefix="kdf")
+        loop = asyncio.get_running_loop()
+        material = await loop.run_in_executor(self._kdf_executor, self._derive, user_id, secret, key_id)
+        return self.key_cache.put(cache_key, material)
+
+    async def encrypt_for_user(self, user_id, message: str, secret: Optional[str] = None) -> str:
+        """Encrypt a message with the user's key"""
+        cipher = await self.user_cipher(user_id, secret)
+        return cipher.encrypt(message.encode()).decode()
+
+    async def decrypt_for_user(self, user_id, encrypted_message: str, secret: Optional[str] = None,
+                               key_id: Optional[str] = None) -> str:
+        """Decrypt a message with the user's key under master key key_id"""
+        cipher = await self.user_cipher(user_id, secret, key_id)
+        return cipher.decrypt(encrypted_message.encode()).decode()
@@ -0,0 +1,254 @@
+# backend/services/entity_cache.py
+# Read-through cache of hot Game/User rows, in-process (LRU + TTL) or in Redis
+
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple, Type
+import redis.asyncio as redis
+from sqlalchemy import DateTime, inspect
+from backend.services.redis_local import LocalRedis
+
+logger = logging.getLogger(__name__)
+
+# "memory" (per process), "redis" (shared by every replica, at REDIS_URL), or "none"
+ENTITY_CACHE_BACKEND = os.getenv("ENTITY_CACHE_BACKEND", "memory")
+ENTITY_CACHE_MAX_ENTRIES = int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", "10000"))
+# Seconds a row is served from cache; missing rows are remembered for NEGATIVE_TTL
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "60"))
+ENTITY_CACHE_NEGATIVE_TTL = float(os.getenv("ENTITY_CACHE_NEGATIVE_TTL", "5"))
+# Redis server, or "local" for the in-process stand-in
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Cached marker for "no such row"
+MISSING = b"null"
+
+
+def to_record(obj) -> bytes:
+    """Serialize a row's column values"""
+    values = {}
+    for attr in inspect(obj).mapper.column_attrs:
+        value = getattr(obj, attr.key)
+        values[attr.key] = value.isoformat() if isinstance(value, datetime) else value
+    return json.dumps(values).encode()
+
+
+def from_record(model: Type, data: bytes):
+    """Rebuild a detached instance from to_record() output"""
+    values = json.loads(data)
+    if values is None:
+        return None
+    for attr in inspect(model).column_attrs:
+        if isinstance(attr.columns[0].type, DateTime) and values.get(attr.key):
+            values[attr.key] = datetime.fromisoformat(values[attr.key])
+    return model(**values)
+
+
+class MemoryBackend:
+    """Bounded LRU of serialized rows with per-entry expiry"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = ENTITY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def clear(self, prefix: str):
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    async def close(self):
+        self._entries.clear()
+
+
+class RedisBackend:
+    """Serialized rows in Redis, expiring server-side"""
+
+    name = "redis"
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    async def clear(self, prefix: str):
+        async for key in self.client.scan_iter(match=f"{prefix}*"):
+            await self.client.delete(key)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_redis_client(url: str = REDIS_URL):
+    if url == "local":
+        return LocalRedis()
+    return redis.from_url(url)
+
+
+class EntityCache:
+    """Read-through cache for single-row lookups by key.
+
+    get() serves a cached copy of the row, or runs the loader, caches the
+    result (including "not found", for negative_ttl) and returns it.
+    Concurrent misses for one key in a process share a single load, so a
+    popular row expiring costs one query per process rather than one per
+    request; TTLs are jittered so rows cached together do not all expire
+    together. Cached rows come back as detached instances (column values
+    only, no relationships): use them for reads, never for writes.
+
+    Call invalidate() after committing a write. A load that was in flight
+    when the key was invalidated is returned but not cached. With several
+    replicas use the redis backend so an invalidation reaches all of them;
+    the memory backend is per process and bounded by the TTL elsewhere.
+    """
+
+    def __init__(self,
+                 backend,
+                 ttl: float = ENTITY_CACHE_TTL,
+                 negative_ttl: float = ENTITY_CACHE_NEGATIVE_TTL,
+                 namespace: str = "entity"):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.namespace = namespace
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stale: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def key(self, model: Type, ident) -> str:
+        return f"{self.namespace}:{model.__tablename__}:{ident}"
+
+    async def get(self, model: Type, ident, loader: Callable[[], Awaitable]):
+        """Cached row for `ident`, loading it with `loader()` on a miss"""
+        key = self.key(model, ident)
+        try:
+            data = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Entity cache read of {key} failed: {e}")
+            data = None
+        if data is not None:
+            self.hits += 1
+            return from_record(model, data)
+        self.misses += 1
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            await asyncio.wait([inflight])
+            if not inflight.cancelled():
+                return from_record(model, inflight.result())
+            # The shared load failed; this caller loads for itself
+            return await loader()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            obj = await loader()
+            data = to_record(obj) if obj is not None else MISSING
+            self.loads += 1
+            if key not in self._stale:
+                await self._store(key, data, self._ttl(obj is not None))
+            future.set_result(data)
+            return obj
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+            self._stale.discard(key)
+
+    async def invalidate(self, model: Type, ident):
+        """Drop a row after its write has committed"""
+        key = self.key(model, ident)
+        if key in self._inflight:
+            self._stale.add(key)
+        self.invalidations += 1
+        try:
+            await self.backend.delete(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Entity cache invalidation of {key} failed: {e}")
+
+    async def clear(self):
+        await self.backend.clear(f"{self.namespace}:")
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats.update(entries=len(self.backend), evictions=self.backend.evictions)
+        return stats
+
+    def _ttl(self, found: bool) -> float:
+        if not found:
+            return self.negative_ttl
+        return self.ttl * random.uniform(0.9, 1.0)
+
+    async def _store(self, key: str, data: bytes, ttl: float):
+        try:
+            await self.backend.set(key, data, ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Entity cache write of {key} failed: {e}")
+
+
+def create_entity_cache(backend: str = ENTITY_CACHE_BACKEND) -> EntityCache:
+    if backend == "redis":
+        return EntityCache(RedisBackend(create_redis_client()))
+    return EntityCache(MemoryBackend(ENTITY_CACHE_MAX_ENTRIES if backend != "none" else 0))
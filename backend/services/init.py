@@ -2,8 +2,23 @@
 # Service modules initialization
 
 from .ai_agent import AIAgent
+from .ai_providers import LocalHashEmbeddings, ExtractiveLLM
 from .payment import PaymentProcessor
-from .encryption import EncryptionService
+from .starknet import StarknetRPC, StarknetAccount
+from .starknet_devnet import LocalStarknetNode
+from .bitcoin import BitcoinRPC, BitcoinSettlement
+from .bitcoin_regtest import LocalRegtestNode
+from .encryption import EncryptionService, KeyCache, KeyRing
+from .key_rotation import ChatReencryptor
 from .dojo_engine import DojoEngine
+from .storage import AssetStorage
+from .asset_store import AssetStore
+from .asset_optimizer import AssetOptimizer
+from .jobs import JobQueue
+from .response_cache import ResponseCache
+from .entity_cache import EntityCache
+from .redis_local import LocalRedis
+from .knowledge_base import KnowledgeBaseIngestor
+from .vector_index import NumpyVectorStore
 
-__all__ = ['AIAgent', 'PaymentProcessor', 'EncryptionService', 'DojoEngine']
+__all__ = ['AIAgent', 'LocalHashEmbeddings', 'ExtractiveLLM', 'PaymentProcessor', 'StarknetRPC', 'StarknetAccount', 'LocalStarknetNode', 'BitcoinRPC', 'BitcoinSettlement', 'LocalRegtestNode', 'EncryptionService', 'KeyCache', 'KeyRing', 'ChatReencryptor', 'DojoEngine', 'AssetStorage', 'AssetStore', 'AssetOptimizer', 'JobQueue', 'ResponseCache', 'EntityCache', 'LocalRedis', 'KnowledgeBaseIngestor', 'NumpyVectorStore']
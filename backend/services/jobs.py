@@ -0,0 +1,335 @@
+# backend/services/jobs.py
+# SQL-backed background job queue with a per-type worker pool
+
+import os
+import json
+import uuid
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from backend.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "900"))
+# How often a running job renews its lease; defaults to a third of the lease
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "0")) or None
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "2.0"))
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", "300"))
+
+Handler = Callable[[AsyncSession, Dict[str, any]], Awaitable[Optional[Dict[str, any]]]]
+
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot succeed"""
+
+
+@dataclass
+class JobType:
+    handler: Handler
+    concurrency: int
+    max_attempts: int
+    timeout: Optional[float]
+
+
+class JobQueue:
+    """Durable job queue stored in the jobs table.
+
+    Any number of replicas can run workers against the same table; a job is
+    claimed with a conditional UPDATE so exactly one worker runs it. Claims
+    carry a lease that the worker renews while the handler runs, and jobs
+    whose worker died are picked up again once the lease expires (or
+    failed, if that was their last attempt). The
+    attempt number identifies the claim: a worker that finds its lease
+    renewed by someone else, or the job cancelled, stops the handler and
+    leaves the job's state alone.
+    """
+
+    def __init__(self,
+                 session_factory: async_sessionmaker,
+                 poll_interval: float = JOB_POLL_INTERVAL,
+                 lease_seconds: float = JOB_LEASE_SECONDS,
+                 heartbeat_interval: Optional[float] = JOB_HEARTBEAT_INTERVAL,
+                 retry_base_delay: float = JOB_RETRY_BASE_DELAY,
+                 retry_max_delay: float = JOB_RETRY_MAX_DELAY):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval or lease_seconds / 3
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.job_types: Dict[str, JobType] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._dispatchers = []
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def handler(self,
+                job_type: str,
+                concurrency: int = 1,
+                max_attempts: int = 3,
+                timeout: Optional[float] = None):
+        """Register an async handler(db, payload) for a job type.
+
+        JOB_CONCURRENCY_<TYPE> overrides the concurrency limit.
+        """
+        concurrency = int(os.getenv(f"JOB_CONCURRENCY_{job_type.upper()}", concurrency))
+
+        def register(func: Handler) -> Handler:
+            self.job_types[job_type] = JobType(func, concurrency, max_attempts, timeout)
+            return func
+        return register
+
+    async def enqueue(self,
+                      db: AsyncSession,
+                      job_type: str,
+                      payload: Dict[str, any],
+                      commit: bool = True) -> Job:
+        """Add a job in the caller's session.
+
+        With commit=False the job becomes visible when the caller commits;
+        call notify() afterwards to skip the poll delay.
+        """
+        if job_type not in self.job_types:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        job = Job(
+            job_id=f"job_{uuid.uuid4().hex[:16]}",
+            job_type=job_type,
+            payload=json.dumps(payload),
+            status="queued",
+            attempts=0,
+            max_attempts=self.job_types[job_type].max_attempts,
+            run_after=datetime.utcnow()
+        )
+        db.add(job)
+        if commit:
+            await db.commit()
+            self.notify(job_type)
+        else:
+            await db.flush()
+        return job
+
+    def notify(self, job_type: str):
+        """Wake the dispatcher for a job type"""
+        if job_type in self._wakeups:
+            self._wakeups[job_type].set()
+
+    async def get(self, db: AsyncSession, job_id: str) -> Optional[Job]:
+        return await db.scalar(select(Job).where(Job.job_id == job_id))
+
+    async def wait_for(self, job_id: str, timeout: float = 30.0) -> Job:
+        """Poll until a job finishes (used by tests and scripts)"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            async with self.session_factory() as db:
+                job = await self.get(db, job_id)
+            if job is None or job.status in FINISHED_STATUSES:
+                return job
+            if loop.time() > deadline:
+                raise asyncio.TimeoutError(f"Job {job_id} still {job.status}")
+            await asyncio.sleep(0.02)
+
+    async def cancel(self, db: AsyncSession, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job.
+
+        A job running in this process is interrupted immediately, which
+        also cancels any in-flight LLM or network call it is awaiting. A job
+        running on another replica finishes its current attempt, but its
+        result is discarded.
+        """
+        await db.execute(
+            update(Job)
+            .where(Job.job_id == job_id, Job.status.in_(("queued", "running")))
+            .values(status="cancelled", locked_until=None, finished_at=datetime.utcnow())
+        )
+        await db.commit()
+
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return await self.get(db, job_id)
+
+    # Workers
+
+    async def start(self):
+        """Start one dispatcher per registered job type"""
+        for job_type, spec in self.job_types.items():
+            self._wakeups[job_type] = asyncio.Event()
+            self._dispatchers.append(asyncio.create_task(self._dispatch(job_type, spec)))
+        logger.info(f"Job workers started: {', '.join(self.job_types)}")
+
+    async def stop(self):
+        """Stop dispatchers and cancel running jobs (their leases will expire)"""
+        tasks = self._dispatchers + list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatchers.clear()
+        self._wakeups.clear()
+
+    async def _dispatch(self, job_type: str, spec: JobType):
+        slots = asyncio.Semaphore(spec.concurrency)
+        wakeup = self._wakeups[job_type]
+        while True:
+            await slots.acquire()
+            wakeup.clear()
+            try:
+                job = await self._claim(job_type)
+            except Exception as e:
+                logger.error(f"Claiming {job_type} job failed: {e}")
+                job = None
+
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._run(job, spec))
+            self._running[job.job_id] = task
+            task.add_done_callback(lambda _, job_id=job.job_id: self._running.pop(job_id, None))
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _claim(self, job_type: str) -> Optional[Job]:
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            while True:
+                candidate = select(Job.id, Job.job_id, Job.status, Job.attempts, Job.max_attempts).where(
+                    Job.job_type == job_type,
+                    or_(
+                        and_(Job.status == "queued", Job.run_after <= now),
+                        and_(Job.status == "running", Job.locked_until < now)
+                    )
+                ).order_by(Job.run_after).limit(1)
+                if db.bind.dialect.name == "postgresql":
+                    candidate = candidate.with_for_update(skip_locked=True)
+
+                row = (await db.execute(candidate)).first()
+                if row is None:
+                    return None
+
+                claimed = Job.id == row.id, Job.status == row.status, Job.attempts == row.attempts
+                if row.status == "running" and row.attempts >= row.max_attempts:
+                    # The last attempt died with its worker (e.g. OOM-killed): give up instead of retrying forever
+                    logger.error(f"Job {row.job_id} failed: lease expired on its last attempt")
+                    await db.execute(
+                        update(Job).where(*claimed).values(
+                            status="failed",
+                            error="Lease expired: the worker running the last attempt stopped",
+                            locked_until=None,
+                            finished_at=now
+                        )
+                    )
+                    await db.commit()
+                    continue
+
+                # Conditional update: only one worker wins the claim
+                result = await db.execute(
+                    update(Job)
+                    .where(*claimed)
+                    .values(
+                        status="running",
+                        attempts=Job.attempts + 1,
+                        locked_until=now + timedelta(seconds=self.lease_seconds),
+                        started_at=now
+                    )
+                )
+                await db.commit()
+                if result.rowcount != 1:
+                    return None
+                return await db.get(Job, row.id)
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.retry_base_delay * 2 ** (attempts - 1), self.retry_max_delay)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _held(self, job: Job):
+        """Condition matching a job only while this worker's claim on it stands"""
+        return and_(Job.id == job.id, Job.status == "running", Job.attempts == job.attempts)
+
+    async def _heartbeat(self, job: Job, worker: asyncio.Task):
+        """Extend the lease while the handler runs; stop the worker once it is lost"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                async with self.session_factory() as db:
+                    result = await db.execute(
+                        update(Job)
+                        .where(self._held(job))
+                        .values(locked_until=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+                    )
+                    await db.commit()
+            except Exception as e:
+                # Keep running; the next beat retries before the lease runs out
+                logger.warning(f"Renewing the lease of job {job.job_id} failed: {e}")
+                continue
+            if result.rowcount != 1:
+                logger.warning(f"Job {job.job_id} was cancelled or re-claimed, stopping attempt {job.attempts}")
+                worker.cancel()
+                return
+
+    async def _run(self, job: Job, spec: JobType):
+        logger.info(f"Running {job.job_type} job {job.job_id} (attempt {job.attempts})")
+        values = {"locked_until": None}
+        heartbeat = asyncio.create_task(self._heartbeat(job, asyncio.current_task()))
+        try:
+            async with self.session_factory() as db:
+                result = await asyncio.wait_for(spec.handler(db, json.loads(job.payload)), spec.timeout)
+            values.update(
+                status="succeeded",
+                result=json.dumps(result, default=str),
+                error=None,
+                finished_at=datetime.utcnow()
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+                logger.error(f"Job {job.job_id} failed: {error}")
+                values.update(status="failed", error=error, finished_at=datetime.utcnow())
+            else:
+                delay = self._backoff(job.attempts)
+                logger.warning(f"Job {job.job_id} failed, retrying in {delay:.1f}s: {error}")
+                values.update(
+                    status="queued",
+                    error=error,
+                    run_after=datetime.utcnow() + timedelta(seconds=delay)
+                )
+        finally:
+            heartbeat.cancel()
+
+        # Only while the claim stands, so a cancelled or re-claimed job keeps its state
+        async with self.session_factory() as db:
+            result = await db.execute(update(Job).where(self._held(job)).values(**values))
+            await db.commit()
+        if result.rowcount != 1:
+            logger.warning(f"Discarded the outcome of job {job.job_id} attempt {job.attempts}: lease lost")
+
+
+def job_status(job: Job) -> Dict[str, any]:
+    """Public view of a job"""
+    return {
+        "job_id": job.job_id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
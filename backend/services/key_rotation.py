@@ -0,0 +1,156 @@
+# backend/services/key_rotation.py
+# Background re-encryption of chat history onto the primary encryption key
+
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy import bindparam, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models import ChatMessage, ReencryptionCheckpoint
+from backend.services.encryption import LEGACY_KEY_ID, EncryptionService
+
+logger = logging.getLogger(__name__)
+
+REENCRYPT_BATCH_SIZE = int(os.getenv("REENCRYPT_BATCH_SIZE", "500"))
+# Pause between batches (seconds), leaving database and CPU headroom for live traffic
+REENCRYPT_BATCH_DELAY = float(os.getenv("REENCRYPT_BATCH_DELAY", "0.1"))
+
+
+class ChatReencryptor:
+    """Moves encrypted ChatMessage rows onto the primary key.
+
+    Walks the table in id order, batch_size rows at a time. Each batch is
+    decrypted with the key recorded on the row (legacy rows without a
+    key_id fall back to the service-wide cipher), re-encrypted with the
+    user's primary-key cipher, and written in one short transaction
+    together with a checkpoint, so an interrupted run resumes where it
+    stopped. Updates are guarded on the old key_id and touch only the
+    batch's rows, so live chat traffic is never blocked. Rows that cannot
+    be decrypted are counted and skipped.
+    """
+
+    def __init__(self,
+                 encryption_service: EncryptionService,
+                 batch_size: int = REENCRYPT_BATCH_SIZE,
+                 delay: float = REENCRYPT_BATCH_DELAY):
+        self.encryption_service = encryption_service
+        self.batch_size = batch_size
+        self.delay = delay
+
+    async def _checkpoint(self, db: AsyncSession, restart: bool) -> ReencryptionCheckpoint:
+        target = self.encryption_service.key_id
+        checkpoint = await db.scalar(
+            select(ReencryptionCheckpoint).where(ReencryptionCheckpoint.target_key_id == target)
+        )
+        if checkpoint is None:
+            checkpoint = ReencryptionCheckpoint(target_key_id=target, last_message_id=0, rotated=0, failed=0)
+            db.add(checkpoint)
+        elif restart:
+            checkpoint.last_message_id = 0
+            checkpoint.failed = 0
+        checkpoint.completed_at = None
+        await db.commit()
+        return checkpoint
+
+    async def run(self, db: AsyncSession, restart: bool = False, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """Re-encrypt until no stale rows remain (or max_batches); returns progress"""
+        checkpoint = await self._checkpoint(db, restart)
+        target = checkpoint.target_key_id
+        batches = 0
+
+        while max_batches is None or batches < max_batches:
+            rows = (await db.execute(
+                select(ChatMessage.id, ChatMessage.user_id, ChatMessage.message,
+                       ChatMessage.response, ChatMessage.key_id)
+                .where(
+                    ChatMessage.id > checkpoint.last_message_id,
+                    ChatMessage.encrypted.is_(True),
+                    or_(ChatMessage.key_id != target, ChatMessage.key_id.is_(None))
+                )
+                .order_by(ChatMessage.id)
+                .limit(self.batch_size)
+            )).all()
+            if not rows:
+                checkpoint.completed_at = datetime.utcnow()
+                await db.commit()
+                break
+
+            updates, failed = await self._reencrypt(rows)
+            if updates:
+                # Core executemany; the ORM's bulk-by-primary-key mode would drop the key_id guard
+                columns = ChatMessage.__table__.c
+                await db.execute(
+                    update(ChatMessage.__table__)
+                    .where(
+                        columns.id == bindparam("row_id"),
+                        columns.key_id.is_not_distinct_from(bindparam("old_key_id"))
+                    )
+                    .values(message=bindparam("new_message"), response=bindparam("new_response"), key_id=target),
+                    updates
+                )
+            checkpoint.last_message_id = rows[-1].id
+            checkpoint.rotated += len(updates)
+            checkpoint.failed += failed
+            checkpoint.updated_at = datetime.utcnow()
+            await db.commit()
+            batches += 1
+
+            if self.delay:
+                await asyncio.sleep(self.delay)
+
+        progress = {
+            "target_key_id": target,
+            "rotated": checkpoint.rotated,
+            "failed": checkpoint.failed,
+            "last_message_id": checkpoint.last_message_id,
+            "completed": checkpoint.completed_at is not None,
+        }
+        logger.info(f"Chat re-encryption progress: {progress}")
+        return progress
+
+    async def _reencrypt(self, rows) -> Tuple[List[Dict[str, Any]], int]:
+        service = self.encryption_service
+        ciphers: Dict[Tuple[int, Optional[str]], Tuple[Optional[Fernet], Fernet]] = {}
+        for row in rows:
+            if (row.user_id, row.key_id) in ciphers:
+                continue
+            try:
+                old = await service.user_cipher(row.user_id, key_id=row.key_id or LEGACY_KEY_ID)
+            except KeyError:
+                old = None  # key retired from the ring
+            ciphers[row.user_id, row.key_id] = (old, await service.user_cipher(row.user_id))
+
+        def work():
+            updates, failed = [], 0
+            for row in rows:
+                old, new = ciphers[row.user_id, row.key_id]
+                try:
+                    message = self._decrypt(old, row.key_id, row.message)
+                    response = self._decrypt(old, row.key_id, row.response)
+                except InvalidToken:
+                    failed += 1
+                    continue
+                updates.append({
+                    "row_id": row.id,
+                    "old_key_id": row.key_id,
+                    "new_message": new.encrypt(message).decode(),
+                    "new_response": new.encrypt(response).decode(),
+                })
+            return updates, failed
+
+        # Fernet work is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(work)
+
+    def _decrypt(self, cipher: Optional[Fernet], key_id: Optional[str], token: str) -> bytes:
+        try:
+            if cipher is None:
+                raise InvalidToken
+            return cipher.decrypt(token.encode())
+        except InvalidToken:
+            if key_id is not None:
+                raise
+            # Rows from before per-user keys used the service-wide cipher
+            return self.encryption_service.decrypt_message(token).encode()
@@ -0,0 +1,247 @@
+# backend/services/knowledge_base.py
+# Incremental knowledge base ingestion into a persistent vector store
+
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.vectorstores.base import VectorStore
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_BASE_PATHS = [p for p in os.getenv("KNOWLEDGE_BASE_PATHS", "docs").split(os.pathsep) if p]
+KB_EMBED_BATCH_SIZE = int(os.getenv("KB_EMBED_BATCH_SIZE", "256"))
+KB_MAX_FILE_BYTES = int(os.getenv("KB_MAX_FILE_BYTES", str(2 * 1024 * 1024)))
+KB_FILE_EXTENSIONS = {".md", ".mdx", ".rst", ".txt", ".cairo", ".toml", ".py", ".js", ".ts"}
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class Source:
+    """A document to ingest; load() is only called if the fingerprint changed"""
+    source: str
+    fingerprint: str
+    load: Callable[[], str]
+
+
+def text_sources(prefix: str, texts: Iterable[str]) -> Iterator[Source]:
+    """Sources for in-memory texts, named <prefix>:<n>"""
+    for i, text in enumerate(texts):
+        yield Source(f"{prefix}:{i}", hashlib.sha256(text.encode()).hexdigest(), lambda text=text: text)
+
+
+def file_sources(roots: Iterable[str],
+                 extensions: Iterable[str] = KB_FILE_EXTENSIONS,
+                 max_bytes: int = KB_MAX_FILE_BYTES) -> Iterator[Source]:
+    """Walk roots lazily, fingerprinting files by size and mtime without reading them"""
+    extensions = set(extensions)
+    for root in roots:
+        root = Path(root)
+        paths = [root] if root.is_file() else _walk(root)
+        for path in paths:
+            if path.suffix.lower() not in extensions:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if stat.st_size > max_bytes:
+                logger.warning(f"Skipping large knowledge base file: {path}")
+                continue
+            yield Source(
+                str(path),
+                f"{stat.st_size}:{stat.st_mtime_ns}",
+                lambda path=path: path.read_text(encoding="utf-8", errors="replace")
+            )
+
+
+def path_scope(roots: Iterable[str]) -> List[str]:
+    """Ingest scope matching the sources file_sources() yields for roots"""
+    return [str(Path(root)) if Path(root).is_file() else os.path.join(str(Path(root)), "") for root in roots]
+
+
+def _walk(root: Path) -> Iterator[Path]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            yield Path(dirpath) / name
+
+
+def chunk_ids(source: str, chunks: List[str]) -> List[str]:
+    """Stable vector ids: unchanged chunk text in a source keeps its id"""
+    seen = Counter()
+    ids = []
+    for text in chunks:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        seen[digest] += 1
+        ids.append(hashlib.sha256(f"{source}\0{digest}\0{seen[digest]}".encode()).hexdigest()[:32])
+    return ids
+
+
+@dataclass
+class IngestReport:
+    sources_seen: int = 0
+    sources_changed: int = 0
+    sources_removed: int = 0
+    chunks_embedded: int = 0
+    chunks_skipped: int = 0
+    chunks_deleted: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.chunks_embedded or self.chunks_deleted)
+
+    @property
+    def chunks_per_second(self) -> float:
+        return round(self.chunks_embedded / self.seconds, 1) if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, any]:
+        return {**asdict(self), "chunks_per_second": self.chunks_per_second}
+
+
+class KnowledgeBaseIngestor:
+    """Keeps a vector store in sync with a set of sources.
+
+    A JSON manifest next to the index records each source's fingerprint and
+    chunk ids. Unchanged sources are skipped without being read; changed
+    ones are re-split, and only chunks whose content hash is new are
+    embedded, in batches of batch_size per embedding call. Chunks and
+    sources that disappeared are deleted from the store.
+
+    Works with any langchain VectorStore that upserts on add_texts(ids=...)
+    and supports delete(ids=...); a store with reload() is re-read before each
+    run. Not thread-safe: callers serialize runs.
+    """
+
+    def __init__(self,
+                 vectorstore: VectorStore,
+                 manifest_path: Path,
+                 chunk_size: int = CHUNK_SIZE,
+                 chunk_overlap: int = CHUNK_OVERLAP,
+                 batch_size: int = KB_EMBED_BATCH_SIZE):
+        self.vectorstore = vectorstore
+        self.manifest_path = Path(manifest_path)
+        self.batch_size = batch_size
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict[str, any]]:
+        try:
+            data = json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data["sources"]
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "sources": self.manifest}))
+        os.replace(tmp, self.manifest_path)
+
+    def ingest(self, sources: Iterable[Source], scope: Optional[Iterable[str]] = None) -> IngestReport:
+        """Sync the store with sources.
+
+        Manifest entries whose name starts with a scope prefix but were not
+        yielded are deleted; with scope=None every unseen entry is.
+        """
+        start = time.perf_counter()
+        report = IngestReport()
+        # Another process may have ingested since this instance last ran
+        self.manifest = self._load_manifest()
+        if hasattr(self.vectorstore, "reload"):
+            self.vectorstore.reload()
+        scope = None if scope is None else tuple(str(s) for s in scope)
+        seen = set()
+        stale_ids: List[str] = []
+        batch_texts: List[str] = []
+        batch_ids: List[str] = []
+        batch_metadatas: List[Dict[str, str]] = []
+        batch_entries: Dict[str, Dict[str, any]] = {}
+
+        def delete(ids: List[str]):
+            for i in range(0, len(ids), self.batch_size):
+                self.vectorstore.delete(ids=ids[i:i + self.batch_size])
+            report.chunks_deleted += len(ids)
+
+        def flush():
+            for i in range(0, len(batch_texts), self.batch_size):
+                end = i + self.batch_size
+                self.vectorstore.add_texts(batch_texts[i:end], metadatas=batch_metadatas[i:end], ids=batch_ids[i:end])
+                report.batches += 1
+            report.chunks_embedded += len(batch_texts)
+            delete(stale_ids)
+            # Record sources only once their vectors are stored
+            self.manifest.update(batch_entries)
+            stale_ids.clear()
+            batch_texts.clear()
+            batch_ids.clear()
+            batch_metadatas.clear()
+            batch_entries.clear()
+
+        try:
+            for src in sources:
+                seen.add(src.source)
+                report.sources_seen += 1
+                previous = self.manifest.get(src.source)
+                if previous and previous["fingerprint"] == src.fingerprint:
+                    report.chunks_skipped += len(previous["chunks"])
+                    continue
+
+                try:
+                    chunks = self.splitter.split_text(src.load())
+                except (OSError, UnicodeError) as e:
+                    report.errors.append(f"{src.source}: {e}")
+                    logger.warning(f"Skipping knowledge base source {src.source}: {e}")
+                    continue
+
+                ids = chunk_ids(src.source, chunks)
+                previous_ids = set(previous["chunks"]) if previous else set()
+                for chunk_id, text in zip(ids, chunks):
+                    if chunk_id in previous_ids:
+                        report.chunks_skipped += 1
+                        continue
+                    batch_texts.append(text)
+                    batch_ids.append(chunk_id)
+                    batch_metadatas.append({"source": src.source})
+                stale_ids.extend(previous_ids.difference(ids))
+                batch_entries[src.source] = {"fingerprint": src.fingerprint, "chunks": ids}
+                report.sources_changed += 1
+
+                if len(batch_texts) >= self.batch_size:
+                    flush()
+            flush()
+
+            removed = [
+                name for name in self.manifest
+                if name not in seen and (scope is None or name.startswith(scope))
+            ]
+            for name in removed:
+                delete(self.manifest[name]["chunks"])
+                del self.manifest[name]
+            report.sources_removed = len(removed)
+        finally:
+            if hasattr(self.vectorstore, "persist"):
+                self.vectorstore.persist()
+            self._save_manifest()
+            report.seconds = round(time.perf_counter() - start, 4)
+
+        logger.info(
+            f"Knowledge base ingest: {report.sources_changed}/{report.sources_seen} sources changed, "
+            f"{report.chunks_embedded} chunks embedded, {report.chunks_deleted} deleted "
+            f"in {report.seconds}s"
+        )
+        return report
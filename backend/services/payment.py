@@ -3,87 +3,165 @@
 
 import os
 import logging
-import hashlib
-import uuid
+from decimal import Decimal
+from typing import Optional
+import httpx
 from fastapi import HTTPException
-from starknet_py.net.full_node_client import FullNodeClient
+from backend.services.bitcoin import BITCOIN_METHODS, BitcoinRPC, create_bitcoin_rpc
+from backend.services.starknet import (
+    STRK_TOKEN_ADDRESS, StarknetAccount, StarknetRPC, strk_to_wei, transfer_from_call
+)
+from backend.services.starknet_devnet import DEVNET_ACCOUNT_ADDRESS, DEVNET_PRIVATE_KEY, LocalStarknetNode
 
 logger = logging.getLogger(__name__)
 
+# "local" runs an in-process devnet stand-in (tests, offline development)
 STARKNET_NODE_URL = os.getenv("STARKNET_NODE_URL", "https://starknet-mainnet.public.blastapi.io")
+STARKNET_ACCOUNT_ADDRESS = os.getenv("STARKNET_ACCOUNT_ADDRESS")
+STARKNET_PRIVATE_KEY = os.getenv("STARKNET_PRIVATE_KEY")
+# Receives publish fees; defaults to the platform account itself
+STARKNET_PLATFORM_ADDRESS = os.getenv("STARKNET_PLATFORM_ADDRESS")
+
+PAYMENT_METHODS = (
+    {
+        "id": "chipi_pay",
+        "name": "Chipi Pay",
+        "chain": "Starknet",
+        "currency": "STRK",
+        "fee": "0.02%",
+        "settlement": "Instant"
+    },
+    {
+        "id": "xverse",
+        "name": "Xverse",
+        "chain": "Bitcoin",
+        "currency": "BTC",
+        "fee": "0.05%",
+        "settlement": "~10 minutes"
+    },
+    {
+        "id": "vesu",
+        "name": "Vesu",
+        "chain": "Bitcoin",
+        "currency": "BTC",
+        "fee": "0.03%",
+        "settlement": "~10 minutes"
+    },
+)
+
+
+def create_starknet_account(node_url: str = STARKNET_NODE_URL) -> Optional[StarknetAccount]:
+    """Platform account on a shared RPC client, or None if no account is configured"""
+    if node_url == "local":
+        rpc = StarknetRPC("http://starknet.local/rpc", transport=httpx.ASGITransport(app=LocalStarknetNode()))
+        address, private_key = DEVNET_ACCOUNT_ADDRESS, DEVNET_PRIVATE_KEY
+    else:
+        rpc = StarknetRPC(node_url)
+        if not (STARKNET_ACCOUNT_ADDRESS and STARKNET_PRIVATE_KEY):
+            logger.warning("STARKNET_ACCOUNT_ADDRESS/STARKNET_PRIVATE_KEY not set; Starknet payments disabled")
+            return None
+        address, private_key = int(STARKNET_ACCOUNT_ADDRESS, 16), int(STARKNET_PRIVATE_KEY, 16)
+    return StarknetAccount(rpc, address, private_key)
 
 
 class PaymentProcessor:
     """Multi-chain payment processing"""
     
-    def __init__(self):
-        self.starknet_client = FullNodeClient(node_url=STARKNET_NODE_URL)
+    def __init__(self,
+                 starknet_account: Optional[StarknetAccount] = None,
+                 bitcoin_rpc: Optional[BitcoinRPC] = None):
+        self.starknet_account = starknet_account or create_starknet_account()
+        self.starknet_client = self.starknet_account.rpc if self.starknet_account else None
+        self.bitcoin_rpc = bitcoin_rpc or create_bitcoin_rpc()
+    
+    @property
+    def starknet_platform_address(self) -> str:
+        if STARKNET_PLATFORM_ADDRESS:
+            return STARKNET_PLATFORM_ADDRESS
+        return hex(self.starknet_account.address) if self.starknet_account else "0x0"
+    
+    async def close(self):
+        if self.starknet_client is not None:
+            await self.starknet_client.close()
+        await self.bitcoin_rpc.close()
     
     async def process_starknet_payment(self, 
                                       from_address: str, 
                                       to_address: str, 
                                       amount: str) -> str:
-        """Process Starknet payment via Chipi Pay"""
-        logger.info(f"Processing Starknet payment: {amount} STRK")
+        """Process Starknet payment via Chipi Pay.
         
+        The platform account pulls `amount` STRK from the payer with
+        transfer_from (against the allowance granted at onboarding) and
+        waits until L2 accepts it. Callers that must not charge twice on a
+        retry record the hash from submit_starknet_payment() first and
+        resume with confirm_starknet_payment().
+        """
         try:
-            tx_hash = f"0x{hashlib.sha256(f'{from_address}{to_address}{amount}'.encode()).hexdigest()}"
-            
-            logger.info(f"Starknet transaction hash: {tx_hash}")
-            return tx_hash
+            tx_hash = await self.submit_starknet_payment(from_address, to_address, amount)
+            return await self.confirm_starknet_payment(tx_hash)
         except Exception as e:
             logger.error(f"Starknet payment failed: {e}")
             raise HTTPException(status_code=500, detail="Payment processing failed")
     
-    async def process_bitcoin_payment(self, 
+    async def submit_starknet_payment(self,
+                                      from_address: str,
+                                      to_address: str,
+                                      amount: str,
+                                      merge: bool = True) -> str:
+        """Sign and send the transfer_from; returns its hash without waiting.
+        
+        With merge, the transfer may share a multicall with concurrent
+        payments; pass merge=False to resend one whose multicall reverted.
+        """
+        logger.info(f"Processing Starknet payment: {amount} STRK")
+        if self.starknet_account is None:
+            raise RuntimeError("Starknet account not configured")
+        call = transfer_from_call(
+            STRK_TOKEN_ADDRESS, int(from_address, 16), int(to_address, 16), strk_to_wei(amount)
+        )
+        if merge:
+            tx_hash = await self.starknet_account.submit(call)
+        else:
+            tx_hash = await self.starknet_account.send([call])
+        logger.info(f"Starknet transaction hash: {tx_hash}")
+        return tx_hash
+    
+    async def confirm_starknet_payment(self, tx_hash: str) -> str:
+        """Wait until L2 accepts a submitted payment.
+        
+        Raises TransactionReverted if it reverted (nothing was charged), or
+        TimeoutError if it is still unconfirmed (it may yet be accepted).
+        """
+        if self.starknet_account is None:
+            raise RuntimeError("Starknet account not configured")
+        await self.starknet_account.poller.wait(tx_hash)
+        return tx_hash
+    
+    async def process_bitcoin_payment(self,
                                      method: str,
-                                     from_address: str, 
-                                     to_address: str, 
-                                     amount: float) -> str:
-        """Process Bitcoin payment via Xverse or Vesu"""
+                                     amount: Decimal,
+                                     label: str) -> str:
+        """Invoice a Bitcoin payment via Xverse or Vesu; returns the address to pay.
+        
+        The address is a fresh one from the platform wallet, labelled so
+        the wallet shows what it is for. The caller records a pending
+        Transaction to it, which BitcoinSettlement confirms once the payer's
+        transfer of `amount` BTC arrives.
+        """
         logger.info(f"Processing Bitcoin payment via {method}: {amount} BTC")
         
         try:
-            if method == "xverse":
-                tx_id = f"xverse_{uuid.uuid4().hex[:16]}"
-            elif method == "vesu":
-                tx_id = f"vesu_{uuid.uuid4().hex[:16]}"
-            else:
+            if method not in BITCOIN_METHODS:
                 raise ValueError("Invalid payment method")
+            address = await self.bitcoin_rpc.call("getnewaddress", label)
             
-            logger.info(f"Bitcoin transaction ID: {tx_id}")
-            return tx_id
+            logger.info(f"Bitcoin invoice address: {address}")
+            return address
         except Exception as e:
             logger.error(f"Bitcoin payment failed: {e}")
             raise HTTPException(status_code=500, detail="Payment processing failed")
     
     async def get_payment_methods(self):
         """Get available payment methods"""
-        return {
-            "methods": [
-                {
-                    "id": "chipi_pay",
-                    "name": "Chipi Pay",
-                    "chain": "Starknet",
-                    "currency": "STRK",
-                    "fee": "0.02%",
-                    "settlement": "Instant"
-                },
-                {
-                    "id": "xverse",
-                    "name": "Xverse",
-                    "chain": "Bitcoin",
-                    "currency": "BTC",
-                    "fee": "0.05%",
-                    "settlement": "~10 minutes"
-                },
-                {
-                    "id": "vesu",
-                    "name": "Vesu",
-                    "chain": "Bitcoin",
-                    "currency": "BTC",
-                    "fee": "0.03%",
-                    "settlement": "~10 minutes"
-                }
-            ]
-        }
+        return {"methods": [dict(method) for method in PAYMENT_METHODS]}
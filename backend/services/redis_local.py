@@ -0,0 +1,70 @@
+# backend/services/redis_local.py
+# In-process stand-in for the subset of redis.asyncio.Redis the entity cache uses
+
+import time
+import fnmatch
+from collections import Counter
+from typing import AsyncIterator, Dict, Optional, Tuple, Union
+
+
+class LocalRedis:
+    """Key/value store answering like redis.asyncio.Redis (bytes values, EX/PX expiry).
+
+    For local development and tests when no Redis server is running; the
+    data lives in this process only.
+    """
+
+    def __init__(self):
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.stats = Counter()
+
+    @staticmethod
+    def _key(key: Union[str, bytes]) -> bytes:
+        return key.encode() if isinstance(key, str) else key
+
+    def _live(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def ping(self) -> bool:
+        return True
+
+    async def get(self, key) -> Optional[bytes]:
+        self.stats["get"] += 1
+        return self._live(self._key(key))
+
+    async def set(self, key, value, ex: Optional[float] = None, px: Optional[int] = None, nx: bool = False):
+        self.stats["set"] += 1
+        key = self._key(key)
+        if nx and self._live(key) is not None:
+            return None
+        ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+        value = value.encode() if isinstance(value, str) else bytes(value)
+        self._data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        return True
+
+    async def delete(self, *keys) -> int:
+        self.stats["delete"] += 1
+        deleted = 0
+        for key in map(self._key, keys):
+            if self._live(key) is not None:
+                del self._data[key]
+                deleted += 1
+        return deleted
+
+    async def scan_iter(self, match: Optional[str] = None) -> AsyncIterator[bytes]:
+        for key in list(self._data):
+            if self._live(key) is not None and (match is None or fnmatch.fnmatchcase(key.decode(), match)):
+                yield key
+
+    async def flushdb(self):
+        self._data.clear()
+
+    async def aclose(self):
+        pass
@@ -0,0 +1,168 @@
+# backend/services/response_cache.py
+# LRU + TTL cache of RAG responses with exact and semantic prompt matching
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024"))
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "86400"))
+AI_CACHE_SIMILARITY = float(os.getenv("AI_CACHE_SIMILARITY", "0.97"))
+
+Embedder = Callable[[str], List[float]]
+
+
+def prompt_key(prompt: str, scope: str = "") -> str:
+    """Exact-match key for a prompt within a scope (whitespace-insensitive at the ends)"""
+    return hashlib.sha256(f"{scope}\0{prompt.strip()}".encode()).hexdigest()
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@dataclass
+class CacheEntry:
+    response: str
+    vector: Optional[np.ndarray]
+    expires_at: float
+    scope: str = ""
+
+
+class ResponseCache:
+    """In-process cache in front of the RAG chain.
+
+    A lookup first tries the SHA-256 of the prompt, then the cosine
+    similarity of the prompt's embedding against every cached prompt;
+    the best match at or above similarity_threshold is a hit. Callers
+    pass the prompt's structured inputs (e.g. the game it is about) as
+    the scope: it is part of the exact key and semantic matches never
+    cross it, since prompts built from one template score as near
+    duplicates whatever they are about. Entries
+    expire after ttl seconds and the least recently used entry is evicted
+    once max_entries is reached. Without an embedder only exact matches
+    are served.
+    """
+
+    def __init__(self,
+                 embedder: Optional[Embedder] = None,
+                 max_entries: int = AI_CACHE_MAX_ENTRIES,
+                 ttl: float = AI_CACHE_TTL,
+                 similarity_threshold: float = AI_CACHE_SIMILARITY):
+        self.embedder = embedder
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # Per scope: keys and stacked unit vectors of the semantic entries, rebuilt lazily
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def lookup(self, prompt: str, scope: str = "") -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Return (cached response or None, prompt embedding for a later put)"""
+        if not self.enabled:
+            return None, None
+        self._expire()
+
+        key = prompt_key(prompt, scope)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.response, entry.vector
+
+        vector = None
+        if self.embedder is not None:
+            vector = _normalize(await asyncio.to_thread(self.embedder, prompt))
+            match = self._nearest(vector, scope)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self.semantic_hits += 1
+                logger.info("Semantic cache hit for RAG prompt")
+                return self._entries[match].response, vector
+
+        self.misses += 1
+        return None, vector
+
+    async def get(self, prompt: str, scope: str = "") -> Optional[str]:
+        response, _ = await self.lookup(prompt, scope)
+        return response
+
+    async def put(self, prompt: str, response: str, vector: Optional[np.ndarray] = None, scope: str = ""):
+        """Cache a response; pass the vector from lookup() to avoid re-embedding"""
+        if not self.enabled:
+            return
+        if vector is None and self.embedder is not None:
+            vector = _normalize(await asyncio.to_thread(self.embedder, prompt))
+
+        key = prompt_key(prompt, scope)
+        self._entries[key] = CacheEntry(response, vector, time.monotonic() + self.ttl, scope)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._matrices.clear()
+
+    def clear(self):
+        self._entries.clear()
+        self._matrices.clear()
+
+    def stats(self) -> Dict[str, any]:
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrices.clear()
+
+    def _nearest(self, vector: np.ndarray, scope: str) -> Optional[str]:
+        if scope not in self._matrices:
+            keys = [
+                key for key, entry in self._entries.items()
+                if entry.vector is not None and entry.scope == scope
+            ]
+            matrix = (
+                np.stack([self._entries[key].vector for key in keys])
+                if keys else np.empty((0, vector.shape[0]), dtype=np.float32)
+            )
+            self._matrices[scope] = (keys, matrix)
+        keys, matrix = self._matrices[scope]
+        if not keys or matrix.shape[1] != vector.shape[0]:
+            return None
+
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return keys[best]
+        return None
@@ -0,0 +1,134 @@
+# backend/services/rollups.py
+# Incrementally maintained per-game asset and revenue rollups
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models import GameAsset, GameRevenue, GameStats, Publication, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Transaction statuses that count towards revenue
+SETTLED_STATUSES = ("completed", "confirmed")
+
+
+def format_amount(value: Decimal) -> str:
+    """Plain decimal string without exponent or trailing zeros (NUMERIC(36, 18) pads them)"""
+    return format(Decimal(value).normalize(), "f")
+
+
+def _insert(db: AsyncSession):
+    return pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+
+
+async def add_assets(db: AsyncSession, game_id: int, count: int = 1, size: int = 0):
+    """Adjust a game's asset count and bytes in the caller's transaction"""
+    stmt = _insert(db)(GameStats).values(
+        game_id=game_id,
+        asset_count=count,
+        asset_bytes=size,
+        updated_at=datetime.utcnow()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GameStats.game_id],
+        set_={
+            "asset_count": GameStats.asset_count + count,
+            "asset_bytes": GameStats.asset_bytes + size,
+            "updated_at": datetime.utcnow()
+        }
+    )
+    await db.execute(stmt)
+
+
+async def add_revenue(db: AsyncSession, payments: Iterable[Tuple[Optional[int], str, Decimal]]):
+    """Add settled (game_id, currency, amount) payments to the revenue rollup.
+
+    Runs in the caller's transaction so the rollup commits atomically with
+    the status change that settled the payments. Rows are locked in sorted
+    order and summed as Decimal, never through float.
+    """
+    totals: Dict[Tuple[int, str], list] = defaultdict(lambda: [Decimal(0), 0])
+    for game_id, currency, amount in payments:
+        if game_id is None or amount is None:
+            continue
+        totals[(game_id, currency)][0] += Decimal(amount)
+        totals[(game_id, currency)][1] += 1
+
+    for (game_id, currency), (amount, count) in sorted(totals.items()):
+        await db.execute(
+            _insert(db)(GameRevenue)
+            .values(game_id=game_id, currency=currency, total=Decimal(0), payments=0)
+            .on_conflict_do_nothing(index_elements=[GameRevenue.game_id, GameRevenue.currency])
+        )
+        revenue = await db.scalar(
+            select(GameRevenue)
+            .where(GameRevenue.game_id == game_id, GameRevenue.currency == currency)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        revenue.total += amount
+        revenue.payments += count
+        revenue.updated_at = datetime.utcnow()
+    await db.flush()
+
+
+async def delete_game_rollups(db: AsyncSession, game_id: int):
+    """Drop a deleted game's rollups and detach its ledger rows"""
+    await db.execute(delete(GameStats).where(GameStats.game_id == game_id))
+    await db.execute(delete(GameRevenue).where(GameRevenue.game_id == game_id))
+    await db.execute(update(Transaction).where(Transaction.game_id == game_id).values(game_id=None))
+    await db.execute(update(Publication).where(Publication.game_id == game_id).values(game_id=None))
+
+
+async def rebuild_game_rollups(db: AsyncSession) -> Dict[str, int]:
+    """Recompute every rollup from the base tables and commit.
+
+    Also links transactions recorded before Transaction.game_id existed to
+    their game through the publication that charged them.
+    """
+    linked = await db.execute(
+        update(Transaction)
+        .where(
+            Transaction.game_id.is_(None),
+            Transaction.transaction_id.in_(
+                select(Publication.transaction_id).where(Publication.game_id.is_not(None))
+            )
+        )
+        .values(game_id=(
+            select(Publication.game_id)
+            .where(Publication.transaction_id == Transaction.transaction_id)
+            .scalar_subquery()
+        ))
+    )
+
+    await db.execute(delete(GameStats))
+    await db.execute(
+        _insert(db)(GameStats).from_select(
+            ["game_id", "asset_count", "asset_bytes"],
+            select(GameAsset.game_id, func.count(GameAsset.id), func.coalesce(func.sum(GameAsset.file_size), 0))
+            .where(GameAsset.game_id.is_not(None))
+            .group_by(GameAsset.game_id)
+        )
+    )
+
+    await db.execute(delete(GameRevenue))
+    settled = await db.stream(
+        select(Transaction.game_id, Transaction.currency, Transaction.amount)
+        .where(Transaction.game_id.is_not(None), Transaction.status.in_(SETTLED_STATUSES))
+    )
+    await add_revenue(db, [tuple(row) async for row in settled])
+    await db.commit()
+
+    counts = {
+        "linked_transactions": linked.rowcount,
+        "games_with_assets": await db.scalar(select(func.count()).select_from(GameStats)),
+        "revenue_rows": await db.scalar(select(func.count()).select_from(GameRevenue)),
+    }
+    logger.info(f"Rebuilt game rollups: {counts}")
+    return counts
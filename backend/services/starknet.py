@@ -0,0 +1,429 @@
+# backend/services/starknet.py
+# Async Starknet JSON-RPC client: pooled HTTP, request batching, receipt polling, nonces
+
+import os
+import asyncio
+import logging
+import itertools
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import httpx
+from starknet_py.hash.selector import get_selector_from_name
+from starknet_py.hash.transaction import compute_invoke_transaction_hash
+from starknet_py.hash.utils import message_signature
+
+logger = logging.getLogger(__name__)
+
+STARKNET_RPC_MAX_CONNECTIONS = int(os.getenv("STARKNET_RPC_MAX_CONNECTIONS", "20"))
+STARKNET_RPC_TIMEOUT = float(os.getenv("STARKNET_RPC_TIMEOUT", "30"))
+# Concurrent calls made within this window (seconds) share one HTTP request
+STARKNET_RPC_BATCH_WINDOW = float(os.getenv("STARKNET_RPC_BATCH_WINDOW", "0.002"))
+STARKNET_RPC_MAX_BATCH = int(os.getenv("STARKNET_RPC_MAX_BATCH", "100"))
+# Receipt polling: first delay, backoff cap, and give-up time (seconds)
+STARKNET_RECEIPT_POLL_INTERVAL = float(os.getenv("STARKNET_RECEIPT_POLL_INTERVAL", "2.0"))
+STARKNET_RECEIPT_POLL_MAX_INTERVAL = float(os.getenv("STARKNET_RECEIPT_POLL_MAX_INTERVAL", "15"))
+STARKNET_RECEIPT_TIMEOUT = float(os.getenv("STARKNET_RECEIPT_TIMEOUT", "300"))
+# Calls merged into one multicall transaction (one signature and nonce per transaction)
+STARKNET_MAX_CALLS_PER_TX = int(os.getenv("STARKNET_MAX_CALLS_PER_TX", "50"))
+STARKNET_MAX_FEE = int(os.getenv("STARKNET_MAX_FEE", str(10 ** 16)))
+
+STRK_TOKEN_ADDRESS = 0x04718F5A0FC34CC1AF16A1CDEE98FFB20C31F5CD61D6AB07201858F4287C938D
+STRK_DECIMALS = 18
+TRANSFER_FROM_SELECTOR = get_selector_from_name("transfer_from")
+
+# JSON-RPC error codes from the Starknet spec
+TXN_HASH_NOT_FOUND = 29
+INVALID_TRANSACTION_NONCE = 52
+
+ACCEPTED_STATUSES = ("ACCEPTED_ON_L2", "ACCEPTED_ON_L1")
+
+
+class StarknetRPCError(Exception):
+    """Error object returned by the node"""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(f"{message} (code {code})")
+        self.code = code
+        self.data = data
+
+
+class TransactionReverted(Exception):
+    """Transaction was included but its execution reverted"""
+
+    def __init__(self, tx_hash: str, reason: Optional[str] = None):
+        super().__init__(f"Transaction {tx_hash} reverted: {reason or 'unknown reason'}")
+        self.tx_hash = tx_hash
+        self.reason = reason
+
+
+@dataclass
+class Call:
+    to_addr: int
+    selector: int
+    calldata: List[int] = field(default_factory=list)
+
+
+def encode_multicall(calls: Sequence[Call]) -> List[int]:
+    """__execute__ calldata for a Cairo 1 account: [n, (to, selector, len, *data)...]"""
+    calldata = [len(calls)]
+    for call in calls:
+        calldata += [call.to_addr, call.selector, len(call.calldata), *call.calldata]
+    return calldata
+
+
+def strk_to_wei(amount: str) -> int:
+    wei = Decimal(amount) * 10 ** STRK_DECIMALS
+    if wei <= 0 or wei != wei.to_integral_value():
+        raise ValueError(f"Invalid STRK amount: {amount}")
+    return int(wei)
+
+
+def transfer_from_call(token: int, sender: int, recipient: int, amount: int) -> Call:
+    """ERC-20 transfer_from; amount is a u256 (low, high)"""
+    return Call(token, TRANSFER_FROM_SELECTOR, [sender, recipient, amount & (2 ** 128 - 1), amount >> 128])
+
+
+class StarknetRPC:
+    """JSON-RPC client over one pooled, keep-alive HTTP session.
+
+    request() calls made within batch_window of each other are sent as a
+    single JSON-RPC batch, so many concurrent publishes cost a handful of
+    HTTP round trips rather than one each. batch() sends an explicit batch
+    immediately.
+    """
+
+    def __init__(self,
+                 node_url: str,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 max_connections: int = STARKNET_RPC_MAX_CONNECTIONS,
+                 timeout: float = STARKNET_RPC_TIMEOUT,
+                 batch_window: float = STARKNET_RPC_BATCH_WINDOW,
+                 max_batch: int = STARKNET_RPC_MAX_BATCH):
+        self.node_url = node_url
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.http = httpx.AsyncClient(
+            transport=transport,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+        self._ids = itertools.count(1)
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._sends = set()
+        self.calls = 0
+        self.http_requests = 0
+
+    async def request(self, method: str, params: Dict[str, Any]) -> Any:
+        """Make one call, batched with any others made in the same window"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((self._payload(method, params), future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    async def batch(self, calls: Sequence[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Send calls as one batch; failed calls come back as StarknetRPCError values"""
+        payloads = [self._payload(method, params) for method, params in calls]
+        responses = await self._post(payloads)
+        return [self._result(responses.get(payload["id"])) for payload in payloads]
+
+    async def close(self):
+        await self.http.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "http_requests": self.http_requests}
+
+    def _payload(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.create_task(self._send(pending))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, pending: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        try:
+            responses = await self._post([payload for payload, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for payload, future in pending:
+            if future.done():
+                continue  # caller went away
+            result = self._result(responses.get(payload["id"]))
+            if isinstance(result, StarknetRPCError):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _post(self, payloads: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        self.calls += len(payloads)
+        self.http_requests += 1
+        response = await self.http.post(self.node_url, json=payloads[0] if len(payloads) == 1 else payloads)
+        response.raise_for_status()
+        body = response.json()
+        return {item.get("id"): item for item in (body if isinstance(body, list) else [body])}
+
+    @staticmethod
+    def _result(response: Optional[Dict[str, Any]]) -> Any:
+        if response is None:
+            return StarknetRPCError(-32603, "No response for request")
+        if "error" in response:
+            error = response["error"]
+            return StarknetRPCError(error.get("code"), error.get("message", ""), error.get("data"))
+        return response.get("result")
+
+
+class NonceManager:
+    """Hands out account nonces locally instead of asking the node per transaction.
+
+    reserve() holds a per-account lock from nonce allocation until the
+    transaction is submitted, so concurrent sends get consecutive nonces
+    and reach the node in order. A failed submission drops the cached
+    nonce; the next reserve() resyncs from the pending block.
+    """
+
+    def __init__(self, rpc: StarknetRPC):
+        self.rpc = rpc
+        self._nonces: Dict[int, int] = {}
+        self._locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    @asynccontextmanager
+    async def reserve(self, address: int):
+        async with self._locks[address]:
+            if address not in self._nonces:
+                nonce = await self.rpc.request(
+                    "starknet_getNonce", {"block_id": "pending", "contract_address": hex(address)}
+                )
+                self._nonces[address] = int(nonce, 16)
+            nonce = self._nonces[address]
+            try:
+                yield nonce
+            except BaseException:
+                self._nonces.pop(address, None)
+                raise
+            self._nonces[address] = nonce + 1
+
+
+@dataclass
+class _Watch:
+    tx_hash: str
+    future: asyncio.Future
+    deadline: float
+    delay: float
+    next_poll: float
+
+
+class ReceiptPoller:
+    """Waits for transaction receipts with a single polling loop.
+
+    Each tick fetches every due receipt in one JSON-RPC batch, and each
+    transaction backs off exponentially from interval to max_interval, so
+    hundreds of in-flight payments cost one request per tick.
+    """
+
+    def __init__(self,
+                 rpc: StarknetRPC,
+                 interval: float = STARKNET_RECEIPT_POLL_INTERVAL,
+                 max_interval: float = STARKNET_RECEIPT_POLL_MAX_INTERVAL,
+                 timeout: float = STARKNET_RECEIPT_TIMEOUT):
+        self.rpc = rpc
+        self.interval = interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self._watches: Dict[str, _Watch] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def wait(self, tx_hash: str) -> Dict[str, Any]:
+        """Receipt once the transaction is accepted; raises TransactionReverted or TimeoutError"""
+        watch = self._watches.get(tx_hash)
+        if watch is None:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            watch = _Watch(tx_hash, loop.create_future(), now + self.timeout, self.interval, now + self.interval)
+            self._watches[tx_hash] = watch
+            if self._task is None or self._task.done():
+                self._wakeup = asyncio.Event()
+                self._task = asyncio.create_task(self._run())
+            self._wakeup.set()
+        # Shielded: one waiter giving up must not stop the others
+        return await asyncio.shield(watch.future)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._watches:
+            now = loop.time()
+            due = [watch for watch in self._watches.values() if watch.next_poll <= now]
+            if due:
+                try:
+                    results = await self.rpc.batch([
+                        ("starknet_getTransactionReceipt", {"transaction_hash": watch.tx_hash}) for watch in due
+                    ])
+                except Exception as e:
+                    logger.warning(f"Receipt poll failed: {e}")
+                    results = [None] * len(due)
+                now = loop.time()
+                for watch, result in zip(due, results):
+                    self._update(watch, result, now)
+
+            if self._watches:
+                self._wakeup.clear()
+                sleep = min(watch.next_poll for watch in self._watches.values()) - loop.time()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(sleep, 0))
+                except asyncio.TimeoutError:
+                    pass
+
+    def _update(self, watch: _Watch, result: Any, now: float):
+        if isinstance(result, StarknetRPCError) and result.code != TXN_HASH_NOT_FOUND:
+            self._finish(watch, exception=result)
+        elif isinstance(result, dict) and result.get("finality_status") in ACCEPTED_STATUSES:
+            if result.get("execution_status") == "REVERTED":
+                self._finish(watch, exception=TransactionReverted(watch.tx_hash, result.get("revert_reason")))
+            else:
+                self._finish(watch, result=result)
+        elif now >= watch.deadline:
+            self._finish(watch, exception=asyncio.TimeoutError(f"No receipt for {watch.tx_hash}"))
+        else:
+            watch.delay = min(watch.delay * 2, self.max_interval)
+            watch.next_poll = now + watch.delay
+
+    def _finish(self, watch: _Watch, result: Any = None, exception: Optional[BaseException] = None):
+        del self._watches[watch.tx_hash]
+        if watch.future.done():
+            return
+        if exception is not None:
+            watch.future.set_exception(exception)
+        else:
+            watch.future.set_result(result)
+
+
+class StarknetAccount:
+    """Signs and sends invoke transactions from one account.
+
+    Calls submitted while a transaction is being signed and sent are
+    merged into the next one as a multicall (up to max_calls_per_tx), so
+    signing (the slow part) and the nonce are paid once per batch rather
+    than once per payment. If a merged transaction reverts, its calls are
+    retried one per transaction so one bad call cannot fail the others.
+    """
+
+    def __init__(self,
+                 rpc: StarknetRPC,
+                 address: int,
+                 private_key: int,
+                 nonces: Optional[NonceManager] = None,
+                 poller: Optional[ReceiptPoller] = None,
+                 max_fee: int = STARKNET_MAX_FEE,
+                 max_calls_per_tx: int = STARKNET_MAX_CALLS_PER_TX):
+        self.rpc = rpc
+        self.address = address
+        self.private_key = private_key
+        self.nonces = nonces or NonceManager(rpc)
+        self.poller = poller or ReceiptPoller(rpc)
+        self.max_fee = max_fee
+        self.max_calls_per_tx = max_calls_per_tx
+        self._chain_id: Optional[int] = None
+        self._queue: List[Tuple[Call, asyncio.Future]] = []
+        self._sender: Optional[asyncio.Task] = None
+        self.transactions = 0
+
+    async def execute(self, call: Call) -> Dict[str, Any]:
+        """Send a call and wait until it is accepted; returns the receipt"""
+        tx_hash, merged = await self._submit(call)
+        try:
+            return await self.poller.wait(tx_hash)
+        except TransactionReverted:
+            if not merged:
+                raise
+            logger.warning(f"Multicall {tx_hash} reverted, retrying its calls individually")
+            return await self.poller.wait(await self.send([call]))
+
+    async def submit(self, call: Call) -> str:
+        """Send a call, possibly merged with concurrent ones; returns the hash without waiting"""
+        tx_hash, _ = await self._submit(call)
+        return tx_hash
+
+    async def send(self, calls: Sequence[Call]) -> str:
+        """Sign and submit one invoke transaction; returns its hash"""
+        chain_id = await self.chain_id()
+        calldata = encode_multicall(calls)
+        for attempt in range(2):
+            try:
+                async with self.nonces.reserve(self.address) as nonce:
+                    # ECDSA signing is CPU-bound (native code that releases the GIL)
+                    signature = await asyncio.to_thread(self._sign, calldata, nonce, chain_id)
+                    result = await self.rpc.request("starknet_addInvokeTransaction", {
+                        "invoke_transaction": {
+                            "type": "INVOKE",
+                            "version": "0x1",
+                            "sender_address": hex(self.address),
+                            "calldata": [hex(value) for value in calldata],
+                            "max_fee": hex(self.max_fee),
+                            "nonce": hex(nonce),
+                            "signature": [hex(value) for value in signature],
+                        }
+                    })
+            except StarknetRPCError as e:
+                # Another process sent from this account; the nonce was resynced
+                if e.code == INVALID_TRANSACTION_NONCE and attempt == 0:
+                    continue
+                raise
+            self.transactions += 1
+            return result["transaction_hash"]
+
+    async def chain_id(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = int(await self.rpc.request("starknet_chainId", {}), 16)
+        return self._chain_id
+
+    def _sign(self, calldata: List[int], nonce: int, chain_id: int) -> Tuple[int, int]:
+        tx_hash = compute_invoke_transaction_hash(
+            version=1,
+            sender_address=self.address,
+            calldata=calldata,
+            max_fee=self.max_fee,
+            chain_id=chain_id,
+            nonce=nonce
+        )
+        return message_signature(tx_hash, self.private_key)
+
+    async def _submit(self, call: Call) -> Tuple[str, bool]:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((call, future))
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        while self._queue:
+            batch = [(call, future) for call, future in self._queue[:self.max_calls_per_tx] if not future.done()]
+            del self._queue[:self.max_calls_per_tx]
+            if not batch:
+                continue
+            try:
+                tx_hash = await self.send([call for call, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, future in batch:
+                if not future.done():
+                    future.set_result((tx_hash, len(batch) > 1))
@@ -0,0 +1,151 @@
+# backend/services/starknet_devnet.py
+# In-process Starknet JSON-RPC node for local development, tests and benchmarks
+
+import asyncio
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Set
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starknet_py.hash.transaction import compute_invoke_transaction_hash
+from starknet_py.hash.utils import private_to_stark_key, verify_message_signature
+from backend.services.starknet import TRANSFER_FROM_SELECTOR, TXN_HASH_NOT_FOUND, INVALID_TRANSACTION_NONCE
+
+# Predeployed account, as on starknet-devnet (never use outside local development)
+DEVNET_ACCOUNT_ADDRESS = 0x64B48806902A367C8598F4F95C305E8C1A1ACBA5F082D294A43793113115691
+DEVNET_PRIVATE_KEY = 0x71D7BB07B9A64F6F78AC4C816AFF4DA9
+DEVNET_CHAIN_ID = int.from_bytes(b"SN_LOCAL", "big")
+
+CONTRACT_NOT_FOUND = 20
+DUPLICATE_TX = 59
+VALIDATION_FAILURE = 55
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class LocalStarknetNode:
+    """ASGI app speaking the subset of Starknet JSON-RPC the client uses.
+
+    Validates nonces and account signatures like a real node, includes
+    transactions in a block after block_time seconds, and can add network
+    latency per HTTP request. transfer_from calls pulling from an address
+    in revert_senders revert. Serve it through httpx.ASGITransport.
+    """
+
+    def __init__(self, block_time: float = 0.0, latency: float = 0.0):
+        self.block_time = block_time
+        self.latency = latency
+        self.accounts: Dict[int, int] = {DEVNET_ACCOUNT_ADDRESS: private_to_stark_key(DEVNET_PRIVATE_KEY)}
+        self.nonces: Dict[int, int] = defaultdict(int)
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+        self.revert_senders: Set[int] = set()
+        self.stats = Counter()
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        body = await request.json()
+        self.stats["http_requests"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if isinstance(body, list):
+            content = [self._handle(item) for item in body]
+        else:
+            content = self._handle(body)
+        await JSONResponse(content)(scope, receive, send)
+
+    def _handle(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.stats["calls"] += 1
+        response = {"jsonrpc": "2.0", "id": payload.get("id")}
+        handler = getattr(self, payload.get("method", ""), None)
+        try:
+            if handler is None or not payload["method"].startswith("starknet_"):
+                raise RPCError(METHOD_NOT_FOUND, "Method not found")
+            response["result"] = handler(**payload.get("params", {}))
+        except RPCError as e:
+            response["error"] = {"code": e.code, "message": str(e)}
+        except (TypeError, ValueError, KeyError) as e:
+            response["error"] = {"code": INVALID_PARAMS, "message": f"Invalid params: {e}"}
+        return response
+
+    # JSON-RPC methods
+
+    def starknet_chainId(self) -> str:
+        return hex(DEVNET_CHAIN_ID)
+
+    def starknet_getNonce(self, block_id: str, contract_address: str) -> str:
+        address = int(contract_address, 16)
+        if address not in self.accounts:
+            raise RPCError(CONTRACT_NOT_FOUND, "Contract not found")
+        return hex(self.nonces[address])
+
+    def starknet_addInvokeTransaction(self, invoke_transaction: Dict[str, Any]) -> Dict[str, str]:
+        sender = int(invoke_transaction["sender_address"], 16)
+        calldata = [int(value, 16) for value in invoke_transaction["calldata"]]
+        nonce = int(invoke_transaction["nonce"], 16)
+        if sender not in self.accounts:
+            raise RPCError(CONTRACT_NOT_FOUND, "Contract not found")
+        if nonce != self.nonces[sender]:
+            raise RPCError(INVALID_TRANSACTION_NONCE, "Invalid transaction nonce")
+
+        tx_hash = compute_invoke_transaction_hash(
+            version=1,
+            sender_address=sender,
+            calldata=calldata,
+            max_fee=int(invoke_transaction["max_fee"], 16),
+            chain_id=DEVNET_CHAIN_ID,
+            nonce=nonce
+        )
+        signature = [int(value, 16) for value in invoke_transaction["signature"]]
+        if not verify_message_signature(tx_hash, signature, self.accounts[sender]):
+            raise RPCError(VALIDATION_FAILURE, "Account validation failed")
+        if hex(tx_hash) in self.transactions:
+            raise RPCError(DUPLICATE_TX, "A transaction with the same hash already exists")
+
+        calls = self._decode_calls(calldata)
+        reverted = any(
+            selector == TRANSFER_FROM_SELECTOR and data and data[0] in self.revert_senders
+            for _, selector, data in calls
+        )
+        self.nonces[sender] += 1
+        self.transactions[hex(tx_hash)] = {
+            "calls": calls,
+            "reverted": reverted,
+            "accepted_at": time.monotonic() + self.block_time,
+            "block_number": len(self.transactions) + 1,
+        }
+        self.stats["transactions"] += 1
+        return {"transaction_hash": hex(tx_hash)}
+
+    def starknet_getTransactionReceipt(self, transaction_hash: str) -> Dict[str, Any]:
+        tx = self.transactions.get(hex(int(transaction_hash, 16)))
+        if tx is None or time.monotonic() < tx["accepted_at"]:
+            raise RPCError(TXN_HASH_NOT_FOUND, "Transaction hash not found")
+        receipt = {
+            "type": "INVOKE",
+            "transaction_hash": transaction_hash,
+            "actual_fee": "0x0",
+            "finality_status": "ACCEPTED_ON_L2",
+            "execution_status": "REVERTED" if tx["reverted"] else "SUCCEEDED",
+            "block_number": tx["block_number"],
+            "events": [],
+            "messages_sent": [],
+        }
+        if tx["reverted"]:
+            receipt["revert_reason"] = "ERC20: insufficient allowance"
+        return receipt
+
+    @staticmethod
+    def _decode_calls(calldata: List[int]):
+        calls, position = [], 1
+        for _ in range(calldata[0]):
+            to_addr, selector, length = calldata[position:position + 3]
+            calls.append((to_addr, selector, calldata[position + 3:position + 3 + length]))
+            position += 3 + length
+        return calls
@@ -0,0 +1,251 @@
+# backend/services/storage.py
+# Streaming, chunked storage for game asset uploads
+
+import os
+import json
+import uuid
+import shutil
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(1024 * 1024 * 1024)))
+
+
+@dataclass
+class StoredFile:
+    """Result of a streamed write"""
+    path: Path
+    size: int
+    sha256: str
+
+
+class AssetStorage:
+    """Streams uploads to disk in fixed-size chunks with bounded memory"""
+
+    def __init__(self,
+                 root: Path = UPLOAD_DIR,
+                 chunk_size: int = UPLOAD_CHUNK_SIZE,
+                 max_size: int = MAX_UPLOAD_SIZE):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.sessions_dir = self.root / ".sessions"
+        self.incoming_dir = self.root / ".incoming"
+        self.blobs_dir = self.root / ".blobs"
+
+    @staticmethod
+    def safe_filename(filename: str) -> str:
+        """Strip directory components from a client-supplied filename"""
+        name = Path(filename or "").name
+        if name in ("", ".", ".."):
+            raise HTTPException(status_code=400, detail="Invalid filename")
+        return name
+
+    async def iter_upload(self, file: UploadFile) -> AsyncIterator[bytes]:
+        """Yield an UploadFile in chunk_size pieces"""
+        while True:
+            chunk = await file.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    async def write_stream(self,
+                           chunks: AsyncIterator[bytes],
+                           dest: Path,
+                           max_size: Optional[int] = None) -> StoredFile:
+        """Write chunks to dest off the event loop, hashing incrementally.
+
+        Data goes to a temporary file that is renamed into place once
+        complete, so readers never see a partial file. Exceeding max_size
+        aborts the write with 413.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        dest = Path(dest)
+        tmp_path = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+        await asyncio.to_thread(dest.parent.mkdir, parents=True, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        fh = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Upload exceeds maximum size of {max_size} bytes"
+                    )
+                await asyncio.to_thread(self._write_chunk, fh, hasher, chunk)
+            await asyncio.to_thread(fh.close)
+            await asyncio.to_thread(os.replace, tmp_path, dest)
+        except BaseException:
+            await asyncio.to_thread(fh.close)
+            await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+            raise
+
+        return StoredFile(path=dest, size=size, sha256=hasher.hexdigest())
+
+    @staticmethod
+    def _write_chunk(fh, hasher, chunk: bytes):
+        fh.write(chunk)
+        hasher.update(chunk)
+
+    async def save_upload(self, file: UploadFile, dest: Optional[Path] = None) -> StoredFile:
+        """Stream a multipart UploadFile to dest (a fresh incoming file by default)"""
+        return await self.write_stream(self.iter_upload(file), dest or self.incoming_path())
+
+    # Content-addressed blobs
+
+    def incoming_path(self) -> Path:
+        """Scratch path for data whose hash is not known yet"""
+        return self.incoming_dir / uuid.uuid4().hex
+
+    def blob_path(self, sha256: str) -> Path:
+        """Location of a blob, fanned out by hash prefix"""
+        if len(sha256) != 64 or not all(c in "0123456789abcdef" for c in sha256):
+            raise HTTPException(status_code=400, detail="Invalid SHA-256 digest")
+        return self.blobs_dir / sha256[:2] / sha256
+
+    async def promote(self, stored: StoredFile) -> Path:
+        """Move a scratch file to its content address.
+        
+        An existing copy is replaced rather than kept: the bytes are the
+        same, and a concurrent garbage collection may be removing it.
+        """
+        dest = self.blob_path(stored.sha256)
+        await asyncio.to_thread(dest.parent.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread(os.replace, stored.path, dest)
+        return dest
+    
+    async def move(self, path: Path, dest: Path) -> bool:
+        """Rename a stored file; False if it does not exist"""
+        try:
+            await asyncio.to_thread(os.replace, path, dest)
+        except FileNotFoundError:
+            return False
+        return True
+
+    async def discard(self, path: Path):
+        """Remove a stored file if it exists"""
+        await asyncio.to_thread(Path(path).unlink, missing_ok=True)
+
+    # Resumable multipart uploads
+
+    def _session_dir(self, upload_id: str) -> Path:
+        if not upload_id.isalnum():
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return self.sessions_dir / upload_id
+
+    def _part_path(self, upload_id: str, part_number: int) -> Path:
+        return self._session_dir(upload_id) / f"part-{part_number:05d}"
+
+    async def create_session(self,
+                             game_id: str,
+                             filename: str,
+                             content_type: Optional[str] = None,
+                             total_size: Optional[int] = None) -> Dict[str, any]:
+        """Start a resumable upload and return its manifest"""
+        if total_size is not None and total_size > self.max_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Upload exceeds maximum size of {self.max_size} bytes"
+            )
+
+        upload_id = uuid.uuid4().hex
+        manifest = {
+            "upload_id": upload_id,
+            "game_id": game_id,
+            "filename": self.safe_filename(filename),
+            "content_type": content_type,
+            "total_size": total_size,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        session_dir = self._session_dir(upload_id)
+        await asyncio.to_thread(session_dir.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread((session_dir / "manifest.json").write_text, json.dumps(manifest))
+
+        logger.info(f"Created upload session {upload_id} for game: {game_id}")
+        return manifest
+
+    async def get_session(self, upload_id: str) -> Dict[str, any]:
+        """Return the session manifest with the parts received so far"""
+        manifest_path = self._session_dir(upload_id) / "manifest.json"
+        try:
+            manifest = json.loads(await asyncio.to_thread(manifest_path.read_text))
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+
+        parts = await asyncio.to_thread(self._list_parts, upload_id)
+        manifest["parts"] = parts
+        manifest["received_size"] = sum(p["size"] for p in parts)
+        return manifest
+
+    def _list_parts(self, upload_id: str) -> List[Dict[str, int]]:
+        return [
+            {"part_number": int(p.name.split("-")[1]), "size": p.stat().st_size}
+            for p in sorted(self._session_dir(upload_id).glob("part-*"))
+        ]
+
+    async def write_part(self,
+                         upload_id: str,
+                         part_number: int,
+                         chunks: AsyncIterator[bytes]) -> Dict[str, any]:
+        """Store one part; re-sending a part number replaces it"""
+        if part_number < 1:
+            raise HTTPException(status_code=400, detail="Part numbers start at 1")
+
+        session = await self.get_session(upload_id)
+        other_parts = sum(p["size"] for p in session["parts"] if p["part_number"] != part_number)
+        stored = await self.write_stream(
+            chunks,
+            self._part_path(upload_id, part_number),
+            max_size=self.max_size - other_parts
+        )
+
+        return {"part_number": part_number, "size": stored.size, "sha256": stored.sha256}
+
+    async def commit_session(self, upload_id: str, dest: Path) -> StoredFile:
+        """Concatenate parts in order into dest and remove the session"""
+        session = await self.get_session(upload_id)
+        parts = session["parts"]
+        if not parts:
+            raise HTTPException(status_code=400, detail="Upload has no parts")
+
+        numbers = [p["part_number"] for p in parts]
+        if numbers != list(range(1, len(numbers) + 1)):
+            raise HTTPException(status_code=400, detail=f"Missing parts, received {numbers}")
+        if session["total_size"] is not None and session["received_size"] != session["total_size"]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Received {session['received_size']} of {session['total_size']} bytes"
+            )
+
+        stored = await self.write_stream(self._iter_parts(upload_id, numbers), dest)
+        await self.abort_session(upload_id)
+        return stored
+
+    async def _iter_parts(self, upload_id: str, numbers: List[int]) -> AsyncIterator[bytes]:
+        for number in numbers:
+            fh = await asyncio.to_thread(open, self._part_path(upload_id, number), "rb")
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(fh.read, self.chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                await asyncio.to_thread(fh.close)
+
+    async def abort_session(self, upload_id: str):
+        """Discard a session and any parts received"""
+        await asyncio.to_thread(shutil.rmtree, self._session_dir(upload_id), True)
@@ -0,0 +1,398 @@
+# backend/services/vector_index.py
+# Memory-mapped NumPy vector store with exact and IVF top-k cosine search
+
+import os
+import json
+import math
+import uuid
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.vectorstores.base import VectorStore
+
+logger = logging.getLogger(__name__)
+
+VECTOR_IVF_MIN_SIZE = int(os.getenv("VECTOR_IVF_MIN_SIZE", "50000"))
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+VECTOR_QUANTIZE = os.getenv("VECTOR_QUANTIZE", "false").lower() == "true"
+
+MIN_CAPACITY = 1024
+KMEANS_ITERATIONS = 10
+# Queries scored per matmul; bounds the (queries x rows) score matrix
+QUERY_BATCH = 64
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k highest scores per row, best first"""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1)
+
+
+class IVFIndex:
+    """Inverted-file index over a vector matrix.
+
+    A spherical k-means coarse quantizer splits rows into nlist lists; a
+    query scores only the rows in its nprobe nearest lists. With
+    quantize=True, candidates are first scored with int8 codes (4x less
+    memory traffic) and the best are re-ranked exactly in float32.
+    """
+
+    def __init__(self, nlist: int, quantize: bool = False, seed: int = 0):
+        self.nlist = nlist
+        self.quantize = quantize
+        self.rng = np.random.default_rng(seed)
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        self.scale: Optional[np.ndarray] = None
+        self.codes: Optional[np.ndarray] = None
+        self.trained_size = 0
+
+    def train(self, matrix: np.ndarray, rows: np.ndarray):
+        """Fit centroids on a sample of rows and assign every row"""
+        sample = matrix[self.rng.choice(rows, size=min(len(rows), 64 * self.nlist), replace=False)]
+        centroids = sample[self.rng.choice(len(sample), size=self.nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=self.nlist) == 0
+            sums[empty] = sample[self.rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = normalize(sums)
+        self.centroids = centroids.astype(np.float32)
+
+        if self.quantize:
+            self.scale = np.maximum(np.abs(matrix[rows]).max(axis=0), 1e-6) / 127
+            self.codes = np.zeros(matrix.shape, dtype=np.int8)
+        self.lists = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+        self.add(matrix, rows)
+        self.trained_size = len(rows)
+
+    def add(self, matrix: np.ndarray, rows: np.ndarray):
+        """Assign new rows to their nearest list"""
+        if len(rows) == 0:
+            return
+        vectors = np.asarray(matrix[rows])
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        for list_id in np.unique(assign):
+            self.lists[list_id] = np.concatenate([self.lists[list_id], rows[assign == list_id]])
+        if self.quantize:
+            if self.codes.shape[0] < matrix.shape[0]:
+                grown = np.zeros(matrix.shape, dtype=np.int8)
+                grown[:self.codes.shape[0]] = self.codes
+                self.codes = grown
+            self.codes[rows] = np.clip(np.round(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def search(self, matrix: np.ndarray, valid: np.ndarray, queries: np.ndarray,
+               k: int, nprobe: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        probes = top_k(queries @ self.centroids.T, nprobe)
+        results = []
+        for query, probe in zip(queries, probes):
+            # Overwritten or reused rows can sit in more than one list
+            candidates = np.unique(np.concatenate([self.lists[p] for p in probe]))
+            candidates = candidates[valid[candidates]]
+            if self.quantize and len(candidates) > 4 * k:
+                approx = self.codes[candidates].astype(np.float32) @ (query * self.scale).astype(np.float32)
+                candidates = candidates[top_k(approx[None, :], 4 * k)[0]]
+            scores = np.asarray(matrix[candidates]) @ query
+            best = top_k(scores[None, :], k)[0]
+            results.append((candidates[best], scores[best]))
+        return results
+
+
+class NumpyVectorStore(VectorStore):
+    """Vector store holding unit-normalized float32 embeddings in one contiguous matrix.
+
+    With a persist_directory the matrix is a memory-mapped file
+    (vectors.f32) and documents live in index.json; otherwise everything is
+    in memory. Search is a batched matrix product for exact cosine top-k.
+    Once the store holds ivf_min_size vectors an IVF index (optionally
+    int8-quantized) is trained for approximate search; set ivf_min_size=0
+    to always search exactly.
+
+    Writes go to the memory map immediately; call persist() to save the
+    document table. Thread-safe. Processes sharing a persist_directory must
+    serialize writes (e.g. with a file lock) and call reload() before
+    writing; searches reload the table whenever another process persisted.
+    """
+
+    def __init__(self,
+                 embedding: Embeddings,
+                 persist_directory: Optional[str] = None,
+                 ivf_min_size: int = VECTOR_IVF_MIN_SIZE,
+                 nlist: Optional[int] = None,
+                 nprobe: int = VECTOR_IVF_NPROBE,
+                 quantize: bool = VECTOR_QUANTIZE):
+        self._embedding = embedding
+        self.persist_directory = Path(persist_directory) if persist_directory else None
+        self.ivf_min_size = ivf_min_size
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.quantize = quantize
+        self._lock = threading.RLock()
+        self.dim: Optional[int] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._ids: List[Optional[str]] = []
+        self._texts: List[Optional[str]] = []
+        self._metadatas: List[Optional[dict]] = []
+        self._rows = {}
+        self._free: List[int] = []
+        self._valid = np.zeros(0, dtype=bool)
+        self._index: Optional[IVFIndex] = None
+        self._loaded_stamp = None
+        if self.persist_directory:
+            self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # Storage
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.persist_directory / "vectors.f32"
+
+    @property
+    def _index_path(self) -> Path:
+        return self.persist_directory / "index.json"
+
+    def _stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Identifies the persisted document table; changes whenever a process persists"""
+        try:
+            stat = self._index_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        stamp = self._stamp()
+        if stamp is None:
+            return
+        data = json.loads(self._index_path.read_text())
+        self.dim = data["dim"]
+        self._ids = data["ids"]
+        self._texts = data["texts"]
+        self._metadatas = data["metadatas"]
+        self._size = len(self._ids)
+        capacity = self._vectors_path.stat().st_size // (4 * self.dim)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids) if doc_id is not None}
+        self._free = [row for row, doc_id in enumerate(self._ids) if doc_id is None]
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._valid[list(self._rows.values())] = True
+        self._index = None
+        self._loaded_stamp = stamp
+
+    def reload(self):
+        """Re-read the document table and vectors if another process persisted since"""
+        if not self.persist_directory:
+            return
+        with self._lock:
+            stamp = self._stamp()
+            if stamp is not None and stamp != self._loaded_stamp:
+                self._load()
+
+    def persist(self):
+        """Flush vectors and save the document table"""
+        if not self.persist_directory:
+            return
+        with self._lock:
+            if self._matrix is None:
+                return
+            self._matrix.flush()
+            tmp = self._index_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({
+                "dim": self.dim,
+                "ids": self._ids,
+                "texts": self._texts,
+                "metadatas": self._metadatas,
+            }))
+            os.replace(tmp, self._index_path)
+            self._loaded_stamp = self._stamp()
+
+    def _ensure_capacity(self, dim: int, size: int):
+        if self.dim is None:
+            self.dim = dim
+        elif dim != self.dim:
+            raise ValueError(f"Embedding dimension {dim} does not match index dimension {self.dim}")
+
+        old_capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if size <= old_capacity:
+            return
+        capacity = max(MIN_CAPACITY, 2 * old_capacity, size)
+
+        if self.persist_directory:
+            # Grow the file in place (new rows read as zeros) and map it again. Other
+            # processes' maps of the same file stay valid and see these writes.
+            self.persist_directory.mkdir(parents=True, exist_ok=True)
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(max(f.tell(), 4 * capacity * dim))
+            matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        else:
+            matrix = np.zeros((capacity, dim), dtype=np.float32)
+            if old_capacity:
+                matrix[:old_capacity] = self._matrix
+        self._matrix = matrix
+
+        valid = np.zeros(capacity, dtype=bool)
+        valid[:len(self._valid)] = self._valid
+        self._valid = valid
+
+    # Writes
+
+    def add_texts(self,
+                  texts: Iterable[str],
+                  metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None,
+                  **kwargs: Any) -> List[str]:
+        """Embed texts in one batch and upsert them by id"""
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+        return self.add_embeddings(texts, vectors, metadatas, ids)
+
+    def add_embeddings(self,
+                       texts: List[str],
+                       vectors: np.ndarray,
+                       metadatas: Optional[List[dict]] = None,
+                       ids: Optional[List[str]] = None) -> List[str]:
+        """Upsert precomputed embeddings"""
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+
+        with self._lock:
+            rows = []
+            assigned = {}
+            for doc_id in ids:
+                if doc_id in assigned:
+                    rows.append(assigned[doc_id])
+                elif doc_id in self._rows:
+                    rows.append(self._rows[doc_id])
+                elif self._free:
+                    rows.append(self._free.pop())
+                else:
+                    rows.append(self._size)
+                    self._size += 1
+                    self._ids.append(None)
+                    self._texts.append(None)
+                    self._metadatas.append(None)
+                assigned[doc_id] = rows[-1]
+            self._ensure_capacity(vectors.shape[1], self._size)
+
+            rows = np.asarray(rows, dtype=np.int64)
+            self._matrix[rows] = vectors
+            self._valid[rows] = True
+            for row, doc_id, text, metadata in zip(rows.tolist(), ids, texts, metadatas):
+                self._rows[doc_id] = row
+                self._ids[row] = doc_id
+                self._texts[row] = text
+                self._metadatas[row] = metadata or {}
+
+            if self._index is not None:
+                self._index.add(self._matrix, np.unique(rows))
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            for doc_id in ids or []:
+                row = self._rows.pop(doc_id, None)
+                if row is None:
+                    continue
+                self._matrix[row] = 0
+                self._valid[row] = False
+                self._ids[row] = self._texts[row] = self._metadatas[row] = None
+                self._free.append(row)
+        return True
+
+    # Search
+
+    def _ivf(self) -> Optional[IVFIndex]:
+        if not self.ivf_min_size or len(self._rows) < self.ivf_min_size:
+            return None
+        if self._index is None or len(self._rows) > 2 * self._index.trained_size:
+            nlist = self.nlist or max(16, int(math.sqrt(len(self._rows))))
+            logger.info(f"Training IVF index: {len(self._rows)} vectors, {nlist} lists")
+            index = IVFIndex(nlist, quantize=self.quantize)
+            index.train(self._matrix, np.flatnonzero(self._valid[:self._size]))
+            self._index = index
+        return self._index
+
+    def search_vectors(self, queries: np.ndarray, k: int = 4,
+                       exact: bool = False) -> List[List[Tuple[int, float]]]:
+        """Batched top-k: for each query, (row, cosine similarity) best first"""
+        queries = normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        self.reload()
+        with self._lock:
+            if not self._rows:
+                return [[] for _ in queries]
+            index = None if exact else self._ivf()
+            if index is not None:
+                return [
+                    list(zip(rows.tolist(), scores.tolist()))
+                    for rows, scores in index.search(self._matrix, self._valid, queries, k, self.nprobe)
+                ]
+
+            matrix = self._matrix[:self._size]
+            invalid = ~self._valid[:self._size]
+            results = []
+            for start in range(0, len(queries), QUERY_BATCH):
+                scores = queries[start:start + QUERY_BATCH] @ matrix.T
+                scores[:, invalid] = -np.inf
+                for row_scores, best in zip(scores, top_k(scores, min(k, len(self._rows)))):
+                    results.append([(int(row), float(row_scores[row])) for row in best])
+            return results
+
+    def _documents(self, hits: List[Tuple[int, float]]) -> List[Tuple[Document, float]]:
+        return [
+            (Document(page_content=self._texts[row], metadata=dict(self._metadatas[row])), score)
+            for row, score in hits
+        ]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self._documents(self.search_vectors(np.asarray(embedding), k)[0])
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] to a relevance score in [0, 1]
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(cls,
+                   texts: List[str],
+                   embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None,
+                   persist_directory: Optional[str] = None,
+                   **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding, persist_directory=persist_directory, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
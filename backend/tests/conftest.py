@@ -0,0 +1,46 @@
+# backend/tests/conftest.py
+# Shared test fixtures
+
+import os
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Run AI endpoints on the offline provider
+os.environ.setdefault("AI_PROVIDER", "local")
+# Starknet payments against the in-process devnet, polled without real block times
+os.environ.setdefault("STARKNET_NODE_URL", "local")
+os.environ.setdefault("STARKNET_RECEIPT_POLL_INTERVAL", "0.01")
+os.environ.setdefault("BITCOIN_RPC_URL", "local")
+# A fixed key, so importing the app does not create a key file
+os.environ.setdefault("ENCRYPTION_KEY", "dGVzdC1lbmNyeXB0aW9uLWtleS0wMDAwMDAwMDAwMDA=")
+
+from backend.database import create_session_factory, init_models
+from backend.api.cache import entity_cache
+
+
+def enforce_foreign_keys(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    """File-backed aiosqlite database with all tables.
+
+    A file (rather than :memory:) gives each session its own connection,
+    so concurrent workers in a test see real transaction isolation.
+    Foreign keys are enforced, as they are on Postgres.
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    event.listen(engine.sync_engine, "connect", enforce_foreign_keys)
+    await init_models(engine)
+    yield create_session_factory(engine)
+    await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+async def clear_entity_cache():
+    """Each test's database starts with an empty Game/User cache"""
+    await entity_cache.clear()
+    yield
+    await entity_cache.clear()
@@ -1,24 +1,84 @@
 # backend/tests/test_ai.py
 # AI Agent tests
 
+import asyncio
 import pytest
-from backend.services.ai_agent import AIAgent
+from langchain.embeddings import FakeEmbeddings
+from langchain.llms.fake import FakeListLLM
+from backend.services import ai_agent as ai_agent_module
+from backend.services.ai_agent import AIAgent, knowledge_base_hash
 
 
 @pytest.fixture
-def ai_agent():
-    """Create AI agent instance"""
-    return AIAgent()
+def ai_agent(tmp_path):
+    """Create AI agent instance on the offline provider"""
+    return AIAgent(provider="local", index_dir=tmp_path, knowledge_paths=[])
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    """Offline embeddings that count embedding calls"""
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        CountingEmbeddings.calls += 1
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def offline_agent(tmp_path, monkeypatch):
+    """Factory for agents using offline embeddings and LLM"""
+    monkeypatch.setattr(ai_agent_module, "create_embeddings", lambda provider: CountingEmbeddings(size=16))
+    monkeypatch.setattr(ai_agent_module, "create_llm", lambda provider: FakeListLLM(responses=["ok"]))
+    CountingEmbeddings.calls = 0
+    return lambda docs=ai_agent_module.KNOWLEDGE_BASE_DOCS, paths=(), store="numpy": AIAgent(
+        index_dir=tmp_path, docs=docs, knowledge_paths=paths, vector_store=store
+    )
 
 
 @pytest.mark.asyncio
 async def test_ai_agent_initialization(ai_agent):
     """Test AI agent initializes correctly"""
     assert ai_agent is not None
+    await ai_agent.ensure_ready()
     assert ai_agent.vectorstore is not None
     assert ai_agent.qa_chain is not None
 
 
+def test_ai_agent_construction_is_lazy(tmp_path):
+    """Test constructing the agent does no embedding or network work"""
+    agent = AIAgent(index_dir=tmp_path)
+    assert not agent.ready
+    assert agent.embeddings is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("store", ["numpy", "chroma"])
+async def test_knowledge_base_index_is_persisted(offline_agent, tmp_path, store):
+    """Test the index is embedded once and only changed docs are re-embedded"""
+    first = offline_agent(store=store)
+    await first.ensure_ready()
+    await first.ensure_ready()
+    assert first.ready
+    assert CountingEmbeddings.calls == 1
+
+    second = offline_agent(store=store)
+    await second.ensure_ready()
+    assert CountingEmbeddings.calls == 1
+
+    changed = offline_agent(docs=["Dojo models are Cairo structs."], store=store)
+    await changed.ensure_ready()
+    assert CountingEmbeddings.calls == 2
+    assert len(changed.vectorstore.similarity_search("Cairo", k=10)) == 1
+    assert len([p for p in tmp_path.iterdir() if p.is_dir()]) == 1
+
+
+def test_knowledge_base_hash():
+    """Test the index key tracks the embedding model, not the docs"""
+    assert knowledge_base_hash("m") == knowledge_base_hash("m")
+    assert knowledge_base_hash("m") != knowledge_base_hash("other")
+
+
 @pytest.mark.asyncio
 async def test_generate_documentation(ai_agent):
     """Test documentation generation"""
@@ -38,6 +98,44 @@ async def test_generate_documentation(ai_agent):
     assert "Test RPG" in docs["overview"]
 
 
+@pytest.mark.asyncio
+async def test_documentation_is_not_shared_between_games(ai_agent):
+    """Test two games with the same description each get their own answers, not the other's cached ones"""
+    # Each section's two prompts embed at ~0.98 cosine similarity with the local embedder, above the threshold
+    description = "A fast multiplayer racing game where players drift around neon tracks"
+    await ai_agent.generate_documentation(game_title="Dragon Quest", description=description)
+    sequel = await ai_agent.generate_documentation(game_title="Dragon Quest II", description=description)
+
+    stats = ai_agent.response_cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"]) == (0, 0)
+    assert stats["entries"] == 2 * len(ai_agent_module.DOC_SECTIONS)
+    assert sequel["overview"].startswith("# Dragon Quest II")
+
+
+@pytest.mark.asyncio
+async def test_stream_chain_matches_run_chain(ai_agent):
+    """Test streamed chunks join to the chain's answer and are cached once complete"""
+    question = "How do I deploy a Dojo game?"
+    chunks = [chunk async for chunk in ai_agent.stream_chain(question)]
+
+    assert len(chunks) > 1
+    assert ai_agent.response_cache.stats()["entries"] == 1
+    assert [chunk async for chunk in ai_agent.stream_chain(question)] == ["".join(chunks)]
+    ai_agent.response_cache.clear()
+    assert await ai_agent.run_chain(question) == "".join(chunks)
+
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_is_not_cached(ai_agent):
+    """Test closing a stream early releases the LLM slot without caching a partial answer"""
+    stream = ai_agent.stream_chain("How do I deploy a Dojo game?")
+    await anext(stream)
+    await stream.aclose()
+
+    assert ai_agent.response_cache.stats()["entries"] == 0
+    assert not ai_agent._llm_slots.locked()
+
+
 @pytest.mark.asyncio
 async def test_analyze_game(ai_agent):
     """Test game analysis"""
@@ -50,13 +148,141 @@ async def test_analyze_game(ai_agent):
     assert "estimated_gas" in analysis
 
 
+class SlowChain:
+    """Async chain stub that records concurrency and cancellation"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self.cancelled = 0
+
+    async def arun(self, prompt):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            return f"answer: {prompt}"
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.running -= 1
+
+
 @pytest.mark.asyncio
-async def test_optimize_assets(ai_agent):
-    """Test asset optimization"""
-    optimization = await ai_agent.optimize_assets("test_game_id")
-    
-    assert isinstance(optimization, dict)
-    assert "original_size" in optimization
-    assert "optimized_size" in optimization
-    assert "reduction" in optimization
-    assert "actions" in optimization
+async def test_run_chain_bounds_concurrency(tmp_path):
+    """Test concurrent LLM calls are capped without blocking the loop"""
+    agent = AIAgent(index_dir=tmp_path, max_concurrency=2)
+    agent.qa_chain = SlowChain(delay=0.05)
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    tick_task = asyncio.create_task(ticker())
+    results = await asyncio.gather(*(agent.run_chain(f"q{i}") for i in range(6)))
+    tick_task.cancel()
+
+    assert results[0] == "answer: q0"
+    assert agent.qa_chain.peak == 2
+    assert ticks > 10
+
+
+@pytest.mark.asyncio
+async def test_run_chain_timeout_and_cancellation(tmp_path):
+    """Test slow calls time out and cancelled callers abort the LLM call"""
+    agent = AIAgent(index_dir=tmp_path, request_timeout=0.05)
+    agent.qa_chain = SlowChain(delay=10)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await agent.run_chain("slow")
+
+    task = asyncio.create_task(agent.run_chain("abandoned", timeout=10))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert agent.qa_chain.cancelled == 2
+    assert agent.qa_chain.running == 0
+
+
+class SectionChain:
+    """Async chain stub whose latency depends on the requested section"""
+
+    delays = {"Game Overview": 0.15, "API Reference": 0.1, "Smart Contracts": 0.2,
+              "Player Guide": 0.05, "Developer Setup": 0.25}
+
+    def __init__(self):
+        self.cancelled = 0
+
+    async def arun(self, prompt):
+        heading = next(h for h in self.delays if h in prompt)
+        try:
+            await asyncio.sleep(self.delays[heading])
+            return f"{heading} body"
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+@pytest.mark.asyncio
+async def test_sections_generated_concurrently(tmp_path):
+    """Test sections are generated in parallel and yielded as they finish"""
+    agent = AIAgent(index_dir=tmp_path, max_concurrency=5)
+    agent.qa_chain = SectionChain()
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    order = [section async for section, _ in agent.iter_documentation("Test RPG", "desc")]
+    elapsed = loop.time() - start
+
+    assert order == ["player_guide", "api_reference", "overview", "smart_contracts", "setup_guide"]
+    assert elapsed < 0.5
+
+    docs = await agent.generate_documentation("Test RPG", "desc")
+    assert list(docs) == ["overview", "api_reference", "smart_contracts", "player_guide", "setup_guide"]
+    assert docs["overview"].startswith("# Test RPG\n\ndesc")
+    assert docs["player_guide"] == "## Player Guide\n\nPlayer Guide body"
+
+
+@pytest.mark.asyncio
+async def test_closing_documentation_stream_cancels_pending_sections(tmp_path):
+    """Test abandoning the stream cancels sections still being generated"""
+    agent = AIAgent(index_dir=tmp_path, max_concurrency=5)
+    agent.qa_chain = SectionChain()
+
+    sections = agent.iter_documentation("Test RPG", "desc")
+    section, _ = await sections.__anext__()
+    await sections.aclose()
+
+    assert section == "player_guide"
+    assert agent.qa_chain.cancelled == 4
+
+
+@pytest.mark.asyncio
+async def test_repeat_prompts_skip_the_llm(tmp_path):
+    """Test repeated generations are answered from the response cache"""
+    agent = AIAgent(index_dir=tmp_path)
+    agent.qa_chain = SlowChain(delay=0)
+    calls = 0
+    arun = agent.qa_chain.arun
+
+    async def counting_arun(prompt):
+        nonlocal calls
+        calls += 1
+        return await arun(prompt)
+
+    agent.qa_chain.arun = counting_arun
+
+    first = await agent.generate_documentation("Test RPG", "desc")
+    second = await agent.generate_documentation("Test RPG", "desc")
+
+    assert first == second
+    assert calls == 5
+    assert agent.response_cache.stats()["exact_hits"] == 5
@@ -0,0 +1,66 @@
+# backend/tests/test_ai_providers.py
+# Local AI provider tests
+
+import numpy as np
+import pytest
+from langchain.chains.question_answering.stuff_prompt import PROMPT
+
+from backend.services.ai_providers import (
+    ExtractiveLLM, LocalHashEmbeddings, create_embeddings, create_llm
+)
+
+
+def test_local_embeddings_are_deterministic_and_normalized():
+    """Test batch and single embeddings agree and are unit length"""
+    embeddings = LocalHashEmbeddings(dim=256)
+    texts = ["Deploy the Dojo world with sozo", "Players collect items", ""]
+    batch = np.array(embeddings.embed_documents(texts))
+
+    assert batch.shape == (3, 256)
+    assert np.allclose(batch[0], embeddings.embed_query(texts[0]))
+    assert np.allclose(np.linalg.norm(batch[:2], axis=1), 1.0, atol=1e-5)
+    assert not batch[2].any()
+    assert np.allclose(LocalHashEmbeddings(dim=256).embed_query(texts[0]), batch[0])
+
+
+def test_local_embeddings_rank_related_text_higher():
+    """Test related texts are closer than unrelated ones"""
+    embeddings = LocalHashEmbeddings()
+    query, related, unrelated = np.array(embeddings.embed_documents([
+        "how do I deploy my dojo contracts",
+        "To deploy a Dojo game, define your world and deploy contracts.",
+        "Players earn gold by defeating monsters in the dungeon.",
+    ]))
+    assert query @ related > query @ unrelated + 0.2
+
+
+def test_extractive_llm_answers_from_context():
+    """Test the local LLM returns the most relevant context sentences"""
+    prompt = PROMPT.format(
+        context="Dojo uses Cairo for smart contracts. Best practices: keep state minimal.\n"
+                "Worlds contain entities and systems.",
+        question="Which language are Dojo smart contracts written in?"
+    )
+    llm = ExtractiveLLM(max_sentences=1)
+    assert llm(prompt) == "Dojo uses Cairo for smart contracts."
+    assert llm(prompt) == llm(prompt)
+    assert ExtractiveLLM()(PROMPT.format(context="Unrelated.", question="Cairo?")) == "I don't know."
+
+
+@pytest.mark.asyncio
+async def test_extractive_llm_streams_word_chunks():
+    """Test streaming yields the same answer word by word"""
+    prompt = PROMPT.format(context="Dojo uses Cairo for smart contracts.", question="Dojo smart contracts?")
+    llm = ExtractiveLLM()
+    chunks = [chunk async for chunk in llm.astream(prompt)]
+
+    assert chunks == ["Dojo ", "uses ", "Cairo ", "for ", "smart ", "contracts."]
+    assert "".join(chunks) == llm(prompt)
+
+
+def test_provider_factory():
+    """Test providers are selected by name"""
+    assert isinstance(create_embeddings("local"), LocalHashEmbeddings)
+    assert isinstance(create_llm("local"), ExtractiveLLM)
+    with pytest.raises(ValueError):
+        create_llm("missing")
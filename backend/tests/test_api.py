@@ -64,6 +64,41 @@ async def test_payment_methods():
         assert "vesu" in methods
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/games/templates", "/payments/methods"])
+async def test_catalogs_revalidate_with_etag(path):
+    """Test catalogs carry a strong ETag and answer a matching If-None-Match with 304"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(path)
+        etag = response.headers["etag"]
+        assert etag.startswith('"')
+        assert "max-age" in response.headers["cache-control"]
+        
+        cached = await client.get(path, headers={"If-None-Match": f'W/"stale", {etag}'})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+        
+        stale = await client.get(path, headers={"If-None-Match": '"stale"'})
+        assert stale.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_templates_filter_by_feature():
+    """Test templates can be filtered by features, each filter with its own ETag"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        full = await client.get("/games/templates")
+        leaderboards = await client.get("/games/templates", params={"feature": "leaderboards"})
+        both = await client.get("/games/templates", params={"feature": ["Matchmaking", "Leaderboards"]})
+        unknown = await client.get("/games/templates", params={"feature": "Flight simulator"})
+    
+    assert [t["id"] for t in leaderboards.json()["templates"]] == ["multiplayer"]
+    assert both.json() == leaderboards.json()
+    assert leaderboards.headers["etag"] != full.headers["etag"]
+    assert unknown.json()["templates"] == []
+    assert full.json()["version"] == 1
+
+
 @pytest.mark.asyncio
 async def test_user_registration():
     """Test user registration"""
@@ -80,3 +115,37 @@ async def test_user_registration():
             data = response.json()
             assert "user_id" in data
             assert data["username"] == "testuser"
+
+
+@pytest.mark.asyncio
+async def test_stream_documentation(session_factory, tmp_path, monkeypatch):
+    """Test documentation sections stream as server-sent events and are written as they finish"""
+    from backend import main
+    from backend.database import get_db, session_dependency
+    from backend.models import Game, User
+    from backend.services.ai_agent import AIAgent
+
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com"))
+        db.add(Game(game_id="game_docs", title="Docs RPG", description="", template_type="rpg", developer_id=1))
+        await db.commit()
+
+    monkeypatch.setattr(main, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(main, "ai_agent", AIAgent(provider="local", index_dir=tmp_path / "index", knowledge_paths=[]))
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.get("/ai/generate-docs/stream", params={"game_id": "game_docs"})
+            missing = await client.get("/ai/generate-docs/stream", params={"game_id": "nope"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert events == ["event: section"] * 5 + ["event: done"]
+    assert (tmp_path / "game_docs" / "overview.md").read_text().startswith("# Docs RPG")
+    assert missing.status_code == 404
+
+    async with session_factory() as db:
+        game = await db.get(Game, 1)
+        assert game.documentation_path == str(tmp_path / "game_docs")
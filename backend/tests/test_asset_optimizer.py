@@ -0,0 +1,143 @@
+# backend/tests/test_asset_optimizer.py
+# Asset optimization pipeline tests
+
+import json
+import gzip
+import hashlib
+import pytest
+from io import BytesIO
+from pathlib import Path
+from PIL import Image
+from sqlalchemy import select
+
+from backend.models import AssetBlob, Game, GameAsset, User
+from backend.services.asset_optimizer import AssetOptimizer, classify, optimize_file
+from backend.services.asset_store import AssetStore
+from backend.services.storage import AssetStorage
+
+LEVEL_JSON = json.dumps({"levels": [{"id": i, "name": f"Level {i}"} for i in range(50)]}, indent=4).encode()
+GAME_JS = b"""
+// Game loop
+function update(state) {
+    /* advance one tick */
+    return state + 1;
+}
+""" * 20
+
+
+def make_png(size):
+    out = BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(out, "PNG")
+    return out.getvalue()
+
+
+async def chunked(data: bytes):
+    yield data
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AssetStore(AssetStorage(root=tmp_path))
+
+
+@pytest.fixture
+async def optimizer(store):
+    optimizer = AssetOptimizer(store, max_workers=2)
+    yield optimizer
+    optimizer.shutdown()
+
+
+async def add_asset(db, store, game, filename, content_type, data):
+    """Stage an asset in db; returns the file to promote once committed"""
+    stored = await store.storage.write_stream(chunked(data), store.storage.incoming_path())
+    blob = await store.put(db, stored)
+    db.add(GameAsset(
+        game_id=game.id,
+        asset_type=content_type,
+        filename=filename,
+        file_path=blob.file_path,
+        file_size=blob.size,
+        content_hash=blob.sha256
+    ))
+    return stored
+
+
+def test_classify():
+    """Test assets are routed by content type and extension"""
+    assert classify("image/png", "sprite.png") == "image"
+    assert classify(None, "main.js") == "js"
+    assert classify("application/json", "level.dat") == "json"
+    assert classify("text/css", "style.css") == "text"
+    assert classify("audio/ogg", "theme.ogg") == "other"
+
+
+def test_optimize_file_minifies_json(tmp_path):
+    """Test JSON is minified and precompressed"""
+    src = tmp_path / "level.json"
+    src.write_bytes(LEVEL_JSON)
+
+    result = optimize_file(str(src), "application/json", "level.json", str(tmp_path))
+
+    assert result["optimized_size"] < result["original_size"]
+    assert json.loads(Path(result["output"]).read_bytes()) == json.loads(LEVEL_JSON)
+    minified = Path(result["output"]).read_bytes()
+    assert gzip.decompress(Path(result["variants"]["gz"]).read_bytes()) == minified
+    assert "br" in result["variants"]
+
+
+@pytest.mark.asyncio
+async def test_optimize_game(session_factory, store, optimizer):
+    """Test a game's assets are optimized, re-stored and reported by type"""
+    big_png = make_png((4096, 1024))
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com"))
+        game = Game(game_id="game_opt", title="Opt", description="", template_type="rpg", developer_id=1)
+        db.add(game)
+        await db.flush()
+        staged = [
+            await add_asset(db, store, game, "hero.png", "image/png", big_png),
+            await add_asset(db, store, game, "level.json", "application/json", LEVEL_JSON),
+            await add_asset(db, store, game, "main.js", "application/javascript", GAME_JS),
+            await add_asset(db, store, game, "theme.ogg", "audio/ogg", b"OggS" * 100),
+        ]
+        await db.commit()
+        for stored in staged:
+            await store.promote(stored)
+
+    async with session_factory() as db:
+        report = await optimizer.optimize_game(db, "game_opt")
+
+    assert report["assets_optimized"] == 4
+    assert report["saved_bytes"] > 0
+    assert set(report["by_type"]) == {"image", "json", "js", "other"}
+    assert report["by_type"]["other"]["saved_bytes"] == 0
+    assert report["by_type"]["json"]["saved_bytes"] > 0
+    assert report["wall_time_seconds"] > 0
+
+    async with session_factory() as db:
+        assets = {a.filename: a for a in (await db.scalars(select(GameAsset))).all()}
+        assert all(a.optimized for a in assets.values())
+
+        hero = assets["hero.png"]
+        with Image.open(hero.file_path) as img:
+            assert max(img.size) == 2048
+        assert hero.file_size == Path(hero.file_path).stat().st_size
+        assert hero.content_hash == hashlib.sha256(Path(hero.file_path).read_bytes()).hexdigest()
+
+        level = assets["level.json"]
+        assert Path(f"{level.file_path}.gz").exists()
+
+        # Original blobs are garbage collected once nothing references them
+        assert await db.get(AssetBlob, hashlib.sha256(LEVEL_JSON).hexdigest()) is None
+        assert not store.storage.blob_path(hashlib.sha256(LEVEL_JSON).hexdigest()).exists()
+
+    async with session_factory() as db:
+        again = await optimizer.optimize_game(db, "game_opt")
+        assert again["assets_optimized"] == 0
+
+
+@pytest.mark.asyncio
+async def test_optimize_unknown_game(session_factory, optimizer):
+    """Test optimizing a missing game returns None"""
+    async with session_factory() as db:
+        assert await optimizer.optimize_game(db, "missing") is None
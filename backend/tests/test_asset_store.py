@@ -0,0 +1,174 @@
+# backend/tests/test_asset_store.py
+# Content-addressed asset store tests
+
+import hashlib
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import delete, select, text
+
+from backend.database import get_db, session_dependency
+from backend.models import AssetBlob, Game, GameAsset, User
+from backend.services.storage import AssetStorage
+from backend.services.asset_store import AssetStore
+from backend.api import games
+
+TEXTURES = b"shared texture pack"
+DIGEST = hashlib.sha256(TEXTURES).hexdigest()
+
+
+@pytest.fixture
+async def app(session_factory, tmp_path, monkeypatch):
+    """Games router with two games sharing a template"""
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com"))
+        for game_id in ("game_a", "game_b"):
+            db.add(Game(game_id=game_id, title=game_id, description="", template_type="rpg", developer_id=1))
+        await db.commit()
+
+    storage = AssetStorage(root=tmp_path)
+    monkeypatch.setattr(games, "asset_storage", storage)
+    monkeypatch.setattr(games, "asset_store", AssetStore(storage))
+    app = FastAPI()
+    app.include_router(games.router)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+    return app
+
+
+async def upload(client, game_id, name="textures.pak", data=TEXTURES):
+    return await client.post(
+        "/games/upload",
+        params={"game_id": game_id},
+        files={"file": (name, data, "application/octet-stream")}
+    )
+
+
+@pytest.mark.asyncio
+async def test_identical_uploads_stored_once(app, session_factory):
+    """Test identical bytes across games share one blob"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await upload(client, "game_a")
+        second = await upload(client, "game_b")
+
+    assert first.json()["deduplicated"] is False
+    assert second.json()["deduplicated"] is True
+
+    async with session_factory() as db:
+        blob = await db.get(AssetBlob, DIGEST)
+        assert blob.ref_count == 2
+        paths = (await db.scalars(select(GameAsset.file_path))).all()
+        assert len(set(paths)) == 1
+
+
+@pytest.mark.asyncio
+async def test_upload_by_hash_skips_transfer(app, session_factory):
+    """Test a known hash can be attached without sending bytes"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        missing = await client.head(f"/games/blobs/{DIGEST}")
+        assert missing.status_code == 404
+
+        await upload(client, "game_a")
+        assert (await client.head(f"/games/blobs/{DIGEST}")).status_code == 200
+
+        response = await client.post("/games/upload/by-hash", json={
+            "game_id": "game_b",
+            "sha256": DIGEST,
+            "filename": "textures.pak"
+        })
+        assert response.status_code == 200
+        assert response.json()["size"] == len(TEXTURES)
+
+        unknown = await client.post("/games/upload/by-hash", json={
+            "game_id": "game_b",
+            "sha256": "0" * 64,
+            "filename": "other.pak"
+        })
+        assert unknown.status_code == 404
+
+    async with session_factory() as db:
+        assert (await db.get(AssetBlob, DIGEST)).ref_count == 2
+
+
+@pytest.mark.asyncio
+async def test_delete_game_garbage_collects_blobs(app, session_factory):
+    """Test blobs are removed only when the last referencing game is deleted"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await upload(client, "game_a")
+        await upload(client, "game_a", name="unique.bin", data=b"only in game a")
+        await upload(client, "game_b")
+
+        assert (await client.delete("/games/game_a")).status_code == 200
+
+        async with session_factory() as db:
+            shared = await db.get(AssetBlob, DIGEST)
+            assert shared.ref_count == 1
+            assert await db.get(AssetBlob, hashlib.sha256(b"only in game a").hexdigest()) is None
+        assert games.asset_storage.blob_path(DIGEST).exists()
+
+        assert (await client.delete("/games/game_b")).status_code == 200
+
+    async with session_factory() as db:
+        assert await db.get(AssetBlob, DIGEST) is None
+    assert not games.asset_storage.blob_path(DIGEST).exists()
+
+
+@pytest.mark.asyncio
+async def test_delete_game_with_deduplicated_asset(app, session_factory):
+    """Test a game's only references to a blob are deleted before the blob, with foreign keys enforced"""
+    async with session_factory() as db:
+        assert await db.scalar(text("PRAGMA foreign_keys")) == 1
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await upload(client, "game_a")
+        assert (await upload(client, "game_a", name="copy.pak")).json()["deduplicated"] is True
+
+        assert (await client.delete("/games/game_a")).status_code == 200
+
+    async with session_factory() as db:
+        assert await db.get(AssetBlob, DIGEST) is None
+        assert (await db.scalars(select(GameAsset))).all() == []
+    assert not games.asset_storage.blob_path(DIGEST).exists()
+
+
+async def chunks(data):
+    yield data
+
+
+@pytest.mark.asyncio
+async def test_reupload_during_garbage_collection_keeps_file(app, session_factory):
+    """Test a blob re-uploaded between GC's commit and file removal keeps its file"""
+    storage = games.asset_storage
+    store = games.asset_store
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await upload(client, "game_a")
+
+    async with session_factory() as gc_db:
+        await gc_db.execute(delete(GameAsset).where(GameAsset.content_hash == DIGEST))
+        await store.release(gc_db, [DIGEST])
+        orphaned = await store.collect_garbage(gc_db, [DIGEST])
+        await gc_db.commit()
+
+        async with session_factory() as db:
+            stored = await storage.write_stream(chunks(TEXTURES), storage.incoming_path())
+            await store.put(db, stored)
+            await db.commit()
+            await store.promote(stored)
+
+        await store.remove_files(gc_db, orphaned)
+
+    assert storage.blob_path(DIGEST).read_bytes() == TEXTURES
+    assert list(storage.blob_path(DIGEST).parent.glob("*.gc")) == []
+    async with session_factory() as db:
+        assert (await db.get(AssetBlob, DIGEST)).ref_count == 1
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_upload_leaves_no_blob(app, session_factory):
+    """Test a blob file only appears once its row has committed"""
+    storage = games.asset_storage
+    async with session_factory() as db:
+        stored = await storage.write_stream(chunks(TEXTURES), storage.incoming_path())
+        await games.asset_store.put(db, stored)
+        await db.rollback()
+
+    assert not storage.blob_path(DIGEST).exists()
@@ -0,0 +1,135 @@
+# backend/tests/test_bitcoin.py
+# Bitcoin invoice settlement tests (against the in-process regtest node)
+
+import asyncio
+from decimal import Decimal
+import httpx
+import pytest
+from sqlalchemy import select
+
+from backend.models import Transaction, User
+from backend.services.bitcoin import BitcoinRPC, BitcoinSettlement
+from backend.services.bitcoin_regtest import LocalRegtestNode
+
+
+@pytest.fixture
+def node():
+    return LocalRegtestNode()
+
+
+@pytest.fixture
+async def settlement(session_factory, node):
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com"))
+        await db.commit()
+    rpc = BitcoinRPC("http://regtest/", transport=httpx.ASGITransport(app=node))
+    settlement = BitcoinSettlement(session_factory, rpc, min_confirmations=2,
+                                   poll_interval=0.01, max_poll_interval=0.05)
+    yield settlement
+    await settlement.stop()
+    await rpc.close()
+
+
+async def record_invoices(session_factory, settlement, count, amount="0.001"):
+    """Pending payments, each invoiced to a new wallet address; returns the addresses"""
+    addresses = [await settlement.rpc.call("getnewaddress", f"tx_{i}") for i in range(count)]
+    async with session_factory() as db:
+        for i, address in enumerate(addresses):
+            db.add(Transaction(transaction_id=f"tx_{i}", user_id=1, payment_method="xverse", amount=Decimal(amount),
+                               currency="BTC", status="pending", to_address=address))
+        await db.commit()
+    return addresses
+
+
+async def transactions(session_factory):
+    async with session_factory() as db:
+        return (await db.scalars(select(Transaction).order_by(Transaction.id))).all()
+
+
+@pytest.mark.asyncio
+async def test_incoming_payments_are_tracked_in_one_request(settlement, session_factory, node):
+    """Test every pending invoice is polled in a single batched call until its payment confirms"""
+    addresses = await record_invoices(session_factory, settlement, 3)
+    async with session_factory() as db:
+        assert not await settlement.track(db)  # nothing paid yet
+
+        txids = [node.pay(address, "0.001") for address in addresses[:2]]
+        requests = node.stats["http_requests"]
+        assert await settlement.track(db)
+        assert node.stats["http_requests"] == requests + 1
+        assert [row.blockchain_tx_hash for row in await transactions(session_factory)] == [*txids, None]
+
+        node.mine(2)
+        await settlement.track(db)
+
+    rows = await transactions(session_factory)
+    assert [row.status for row in rows] == ["confirmed", "confirmed", "pending"]
+    assert all(row.confirmed_at is not None for row in rows[:2])
+
+
+@pytest.mark.asyncio
+async def test_underpaid_invoice_waits_for_the_rest(settlement, session_factory, node):
+    """Test a partial payment is not accepted until the full amount has arrived"""
+    [address] = await record_invoices(session_factory, settlement, 1, amount="0.00012345")
+    node.pay(address, "0.0001")
+    node.mine(2)
+    async with session_factory() as db:
+        assert not await settlement.track(db)
+
+        rest = node.pay(address, "0.00002345")
+        assert await settlement.track(db)
+        [row] = await transactions(session_factory)
+        assert (row.blockchain_tx_hash, row.confirmations, row.status) == (rest, 0, "pending")
+
+        node.mine(2)
+        await settlement.track(db)
+    [row] = await transactions(session_factory)
+    assert row.status == "confirmed"
+
+
+@pytest.mark.asyncio
+async def test_conflicted_payment_is_waited_for_again(settlement, session_factory, node):
+    """Test a replaced or double-spent payment no longer counts towards its invoice"""
+    [address] = await record_invoices(session_factory, settlement, 1)
+    txid = node.pay(address, "0.001")
+    async with session_factory() as db:
+        assert await settlement.track(db)
+        node.conflict(txid)
+        assert await settlement.track(db)
+
+    [row] = await transactions(session_factory)
+    assert (row.blockchain_tx_hash, row.confirmations, row.status) == (None, 0, "pending")
+
+
+@pytest.mark.asyncio
+async def test_amounts_are_read_exactly(settlement, node):
+    """Test wallet amounts come back as Decimal, not float"""
+    address = await settlement.rpc.call("getnewaddress", "exact")
+    for _ in range(3):
+        node.pay(address, "0.00012345")
+
+    [entry] = await settlement.rpc.call("listreceivedbyaddress", 0, True, False, address)
+    assert entry["amount"] == Decimal("0.00037035")
+
+
+@pytest.mark.asyncio
+async def test_background_loop_confirms_payments(settlement, session_factory, node):
+    """Test the loop moves paid invoices pending -> confirmed on its own"""
+    await settlement.start()
+    addresses = await record_invoices(session_factory, settlement, 3)
+    settlement.notify()
+
+    async def wait_for(predicate):
+        for _ in range(200):
+            rows = await transactions(session_factory)
+            if predicate(rows):
+                return rows
+            await asyncio.sleep(0.01)
+        raise AssertionError("Timed out")
+
+    for address in addresses:
+        node.pay(address, "0.001")
+    await wait_for(lambda rows: all(row.blockchain_tx_hash for row in rows))
+    node.mine(2)
+    rows = await wait_for(lambda rows: all(row.status == "confirmed" for row in rows))
+    assert len({row.blockchain_tx_hash for row in rows}) == 3
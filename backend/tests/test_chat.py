@@ -0,0 +1,177 @@
+# backend/tests/test_chat.py
+# Chat history pagination and batched send tests
+
+import json
+from datetime import datetime, timedelta
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from backend.database import create_session_factory, get_db, init_models, session_dependency
+from backend.models import ChatMessage, User
+from backend.services.ai_agent import AIAgent
+from backend.api import chat
+
+
+@pytest.fixture
+async def app(session_factory):
+    """Chat router wired to the test database"""
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com"))
+        db.add(User(id=2, username="other", email="other@example.com"))
+        await db.commit()
+
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+    return app
+
+
+@pytest.fixture
+def local_agent(tmp_path, monkeypatch):
+    """Chat router answering with the offline AI provider"""
+    agent = AIAgent(provider="local", index_dir=tmp_path / "index", knowledge_paths=[])
+    monkeypatch.setattr(chat, "ai_agent", agent)
+    return agent
+
+
+def parse_events(text: str):
+    events = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+@pytest.fixture
+async def history(session_factory):
+    """25 messages for user 1, several sharing a timestamp, plus one for user 2"""
+    start = datetime(2024, 1, 1)
+    async with session_factory() as db:
+        db.add_all([
+            ChatMessage(user_id=1, message=f"m{i}", response="r", encrypted=False,
+                        created_at=start + timedelta(minutes=i // 3))
+            for i in range(25)
+        ])
+        db.add(ChatMessage(user_id=2, message="private", response="r", encrypted=False, created_at=start))
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_history_pages_cover_every_message_once(app, history):
+    """Test following next_cursor walks the history newest first without gaps"""
+    seen, cursor = [], None
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        while True:
+            params = {"user_id": 1, "limit": 10}
+            if cursor:
+                params["cursor"] = cursor
+            page = (await client.get("/chat/history", params=params)).json()
+            seen.extend(message["message"] for message in page["messages"])
+            if not page["has_more"]:
+                assert page["next_cursor"] is None
+                break
+            cursor = page["next_cursor"]
+
+    assert len(seen) == 25
+    assert sorted(seen) == sorted(f"m{i}" for i in range(25))
+    assert seen[0] == "m24"
+    assert "private" not in seen
+
+
+@pytest.mark.asyncio
+async def test_history_rejects_bad_cursor_and_limit(app):
+    """Test malformed cursors and out-of-range limits are client errors"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        bad_cursor = await client.get("/chat/history", params={"user_id": 1, "cursor": "not-a-cursor"})
+        bad_limit = await client.get("/chat/history", params={"user_id": 1, "limit": 1000})
+
+    assert bad_cursor.status_code == 400
+    assert bad_limit.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_send_batch_stores_all_messages(app):
+    """Test a batch is stored in one request, encrypting only flagged messages"""
+    payload = {"messages": [
+        {"message": "plain", "encrypted": False},
+        {"message": "secret", "encrypted": True},
+    ]}
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/chat/send/batch", params={"user_id": 1}, json=payload)
+        page = (await client.get("/chat/history", params={"user_id": 1})).json()
+
+    assert response.status_code == 200
+    sent = response.json()["messages"]
+    assert [m["encrypted"] for m in sent] == [False, True]
+    assert sent[0]["message"] == "plain"
+    assert await chat.encryption_service.decrypt_for_user(1, sent[1]["message"]) == "secret"
+    assert {m["id"] for m in page["messages"]} == {m["id"] for m in sent}
+
+
+@pytest.mark.asyncio
+async def test_send_batch_validates_size(app):
+    """Test empty and oversized batches are rejected"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        empty = await client.post("/chat/send/batch", params={"user_id": 1}, json={"messages": []})
+        too_big = await client.post(
+            "/chat/send/batch", params={"user_id": 1},
+            json={"messages": [{"message": "hi"}] * 101}
+        )
+
+    assert empty.status_code == 422
+    assert too_big.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_stream_sse_sends_encrypted_chunks_then_stores_exchange(app, local_agent, session_factory):
+    """Test the SSE fallback streams per-chunk ciphertext and persists the full reply"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/chat/stream", params={"user_id": 1},
+            json={"message": "How do I deploy a Dojo game?", "encrypted": True}
+        )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert [event for event, _ in events[:-1]] == ["chunk"] * (len(events) - 1)
+    assert events[-1][0] == "done"
+    cipher = await chat.encryption_service.user_cipher(1)
+    reply = "".join(cipher.decrypt(data["data"].encode()).decode() for _, data in events[:-1])
+    assert "Deploy" in reply
+
+    async with session_factory() as db:
+        stored = await db.get(ChatMessage, events[-1][1]["id"])
+    assert stored.encrypted
+    assert await chat.encryption_service.decrypt_for_user(1, stored.response) == reply
+    assert await chat.encryption_service.decrypt_for_user(1, stored.message) == "How do I deploy a Dojo game?"
+
+
+def test_websocket_conversation(tmp_path, local_agent):
+    """Test a WebSocket carries several streamed turns and reports bad input without closing"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ws.db'}", poolclass=NullPool)
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.dependency_overrides[get_db] = session_dependency(create_session_factory(engine))
+
+    with TestClient(app) as client:
+        client.portal.call(init_models, engine)
+        with client.websocket_connect("/chat/ws?user_id=1") as websocket:
+            replies = []
+            for question in ["How do I deploy a Dojo game?", "What are Dojo worlds?"]:
+                websocket.send_json({"message": question, "encrypted": False})
+                chunks = []
+                while (event := websocket.receive_json())["event"] == "chunk":
+                    chunks.append(event["data"])
+                assert event["event"] == "done"
+                assert event["chunks"] == len(chunks)
+                replies.append("".join(chunks))
+
+            websocket.send_json({"encrypted": False})
+            assert websocket.receive_json()["event"] == "error"
+
+    assert "Deploy" in replies[0]
+    assert "worlds" in replies[1]
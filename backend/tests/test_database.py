@@ -0,0 +1,195 @@
+# backend/tests/test_database.py
+# Async database layer tests
+
+from pathlib import Path
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.database import (
+    MeteredAsyncQueuePool, get_db, pool_metrics, pool_options,
+    session_dependency, to_async_url, to_sync_url,
+)
+from backend.models import Base, User
+from backend.api.users import router as users_router
+
+
+@pytest.fixture
+def app(session_factory):
+    """Users router wired to the test database"""
+    app = FastAPI()
+    app.include_router(users_router)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+    return app
+
+
+def test_async_url_translation():
+    """Test sync URLs map to async drivers and back"""
+    assert to_async_url("postgresql://u:p@db:5432/x") == "postgresql+asyncpg://u:p@db:5432/x"
+    assert to_async_url("sqlite:///test.db") == "sqlite+aiosqlite:///test.db"
+    assert to_async_url("postgresql+asyncpg://db/x") == "postgresql+asyncpg://db/x"
+    assert to_sync_url("postgresql+asyncpg://db/x") == "postgresql://db/x"
+
+
+@pytest.mark.asyncio
+async def test_async_session_queries(session_factory):
+    """Test models can be written and read through AsyncSession"""
+    async with session_factory() as db:
+        db.add(User(username="alice", email="alice@example.com"))
+        await db.commit()
+
+    async with session_factory() as db:
+        user = await db.scalar(select(User).where(User.email == "alice@example.com"))
+        assert user.username == "alice"
+
+
+@pytest.mark.asyncio
+async def test_register_and_fetch_user(app):
+    """Test user routes run end-to-end on the async session"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/users/register", json={
+            "username": "bob",
+            "email": "bob@example.com"
+        })
+        assert response.status_code == 200
+        user_id = response.json()["user_id"]
+
+        duplicate = await client.post("/users/register", json={
+            "username": "bob",
+            "email": "bob@example.com"
+        })
+        assert duplicate.status_code == 400
+
+        response = await client.get("/users/me", params={"user_id": user_id})
+        assert response.status_code == 200
+        assert response.json()["username"] == "bob"
+
+
+def test_pool_options():
+    """Test pool settings apply to server databases but not SQLite"""
+    options = pool_options("postgresql+asyncpg://db/x", pool_size=20)
+    assert options["pool_size"] == 20
+    assert "max_overflow" in options
+    assert options["pool_pre_ping"] in (True, False)
+    assert pool_options("sqlite+aiosqlite://") == {}
+
+
+@pytest.mark.asyncio
+async def test_pool_checkout_metrics():
+    """Test checkout waits and pool timeouts are recorded"""
+    pool_metrics.reset()
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        poolclass=MeteredAsyncQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+
+    async with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            async with engine.connect():
+                pass
+
+    snapshot = pool_metrics.snapshot()
+    assert snapshot["checkouts"] == 1
+    assert snapshot["timeouts"] == 1
+    await engine.dispose()
+
+
+def alembic_config(url: str) -> Config:
+    config = Config(str(Path(__file__).resolve().parents[2] / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url)
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def test_migrations_upgrade_baseline_schema(tmp_path):
+    """Test alembic builds the baseline on an empty database and adds the tables and columns added since"""
+    url = f"sqlite:///{tmp_path / 'baseline.db'}"
+    config = alembic_config(url)
+    command.upgrade(config, "0001")
+    engine = create_engine(url)
+    assert "content_hash" not in {column["name"] for column in inspect(engine).get_columns("game_assets")}
+
+    command.upgrade(config, "head")
+    inspector = inspect(engine)
+    assert {"asset_blobs", "jobs", "publications"} <= set(inspector.get_table_names())
+    assert {"filename", "content_hash"} <= {column["name"] for column in inspector.get_columns("game_assets")}
+    assert {"to_address", "confirmations"} <= {column["name"] for column in inspector.get_columns("transactions")}
+    assert "ix_game_assets_content_hash" in {index["name"] for index in inspector.get_indexes("game_assets")}
+    assert "key_id" in {column["name"] for column in inspector.get_columns("chat_messages")}
+    assert "reencryption_checkpoints" in inspector.get_table_names()
+
+    command.downgrade(config, "base")
+    assert set(inspect(engine).get_table_names()) == {"alembic_version"}
+    engine.dispose()
+
+
+def test_migrations_match_models(tmp_path):
+    """Test alembic upgrade head on an empty database yields exactly the models' schema"""
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    command.upgrade(alembic_config(url), "head")
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        differences = compare_metadata(MigrationContext.configure(conn), Base.metadata)
+    engine.dispose()
+
+    assert differences == []
+
+
+def test_ledger_migration_upgrades_old_schema(tmp_path):
+    """Test alembic adds game links, rollups and history indexes to an existing database, and reverts them"""
+    url = f"sqlite:///{tmp_path / 'ledger.db'}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE games (id INTEGER PRIMARY KEY, game_id VARCHAR)"))
+        conn.execute(text("CREATE TABLE game_assets (id INTEGER PRIMARY KEY, game_id INTEGER, file_path VARCHAR)"))
+        conn.execute(text("CREATE TABLE chat_messages (id INTEGER PRIMARY KEY, user_id INTEGER, created_at DATETIME)"))
+        conn.execute(text(
+            "CREATE TABLE transactions (id INTEGER PRIMARY KEY, transaction_id VARCHAR, user_id INTEGER, "
+            "payment_method VARCHAR, amount VARCHAR, currency VARCHAR, status VARCHAR, created_at DATETIME)"
+        ))
+
+    config = alembic_config(url)
+    command.upgrade(config, "head")
+
+    inspector = inspect(engine)
+    assert "game_id" in {column["name"] for column in inspector.get_columns("transactions")}
+    assert {"ix_transactions_user_created", "ix_transactions_created"} <= {
+        index["name"] for index in inspector.get_indexes("transactions")
+    }
+    assert {"game_stats", "game_revenue"} <= set(inspector.get_table_names())
+
+    command.downgrade(config, "0001")
+    inspector = inspect(engine)
+    assert "game_id" not in {column["name"] for column in inspector.get_columns("transactions")}
+    assert not inspector.get_indexes("transactions")
+    engine.dispose()
+
+
+def test_publication_migration_keeps_one_per_game(tmp_path):
+    """Test making publications unique per game keeps the published one linked and detaches the rest"""
+    url = f"sqlite:///{tmp_path / 'publications.db'}"
+    config = alembic_config(url)
+    command.upgrade(config, "0006")
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO publications (id, idempotency_key, game_id, status) VALUES "
+                          "(1, 'a', 7, 'published'), (2, 'b', 7, 'pending'), (3, 'c', 8, 'pending')"))
+
+    command.upgrade(config, "head")
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, game_id FROM publications ORDER BY id")).all()
+    [index] = [index for index in inspect(engine).get_indexes("publications") if index["name"] == "ix_publications_game_id"]
+    engine.dispose()
+
+    assert [tuple(row) for row in rows] == [(1, 7), (2, None), (3, 8)]
+    assert index["unique"]
@@ -1,8 +1,9 @@
 # backend/tests/test_dojo_engine.py
 # Dojo Engine tests
 
+import json
 import pytest
-from backend.services.dojo_engine import DojoEngine
+from backend.services.dojo_engine import DojoEngine, load_template_catalog
 
 
 @pytest.mark.asyncio
@@ -51,3 +52,17 @@ async def test_get_game_templates():
         assert "license" in template
         assert "features" in template
         assert template["license"] == "MIT"
+
+
+def test_template_catalog_is_validated(tmp_path):
+    """Test the template data file must be versioned and complete"""
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps({"version": 2, "templates": [
+        {"id": "idle", "name": "Idle", "description": "", "repository": "", "features": ["Offline progress"]}
+    ]}))
+    assert load_template_catalog(str(path))["version"] == 2
+    
+    path = tmp_path / "broken.json"
+    path.write_text(json.dumps({"templates": [{"id": "idle"}]}))
+    with pytest.raises(ValueError):
+        load_template_catalog(str(path))
@@ -1,8 +1,13 @@
 # backend/tests/test_encryption.py
 # Encryption service tests
 
+import io
+import asyncio
+import threading
 import pytest
-from backend.services.encryption import EncryptionService
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from backend.services.encryption import STREAM_HEADER, TAG_SIZE, EncryptionService, KeyCache
 
 
 @pytest.fixture
@@ -48,3 +53,167 @@ def test_generate_user_key(encryption_service):
     # Different inputs should generate different keys
     key3 = encryption_service.generate_user_key("user456", password)
     assert key != key3
+
+    
+    # Salts are deployment-specific, not the bare user id
+    other_deployment = EncryptionService(key=Fernet.generate_key())
+    assert other_deployment.generate_user_key(user_id, password) != key
+
+
+def test_key_cache_evicts_and_zeroizes():
+    """Test the LRU bound and TTL, overwriting evicted key material"""
+    cache = KeyCache(max_entries=2, ttl=60)
+    materials = [bytearray(bytes([i + 1]) * 32) for i in range(3)]
+    cache.put("a", materials[0])
+    cache.put("b", materials[1])
+    assert cache.get("a") is not None  # "b" is now least recently used
+    cache.put("c", materials[2])
+
+    assert cache.get("b") is None
+    assert materials[1] == bytearray(32)
+    assert materials[0] != bytearray(32)
+    assert cache.stats()["evictions"] == 1
+
+    expired = KeyCache(ttl=0)
+    material = bytearray(b"k" * 32)
+    expired.put("a", material)
+    assert expired.get("a") is None
+    assert material == bytearray(32)
+
+
+@pytest.mark.asyncio
+async def test_user_keys_are_derived_once_off_the_event_loop(monkeypatch):
+    """Test concurrent requests share one KDF run in the pool, then hit the cache"""
+    service = EncryptionService(kdf_iterations=1000)
+    threads = []
+    derive = service._derive
+
+    def counting_derive(*args):
+        threads.append(threading.current_thread())
+        return derive(*args)
+
+    monkeypatch.setattr(service, "_derive", counting_derive)
+    ciphers = await asyncio.gather(*(service.user_cipher(7) for _ in range(10)))
+    await service.user_cipher("7")
+
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
+    assert all(cipher is ciphers[0] for cipher in ciphers)
+    assert service.key_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_per_user_encryption_is_isolated():
+    """Test messages only decrypt with the same user's key"""
+    service = EncryptionService(kdf_iterations=1000)
+    token = await service.encrypt_for_user(1, "secret")
+
+    assert await service.decrypt_for_user(1, token) == "secret"
+    with pytest.raises(InvalidToken):
+        await service.decrypt_for_user(2, token)
+    with pytest.raises(InvalidToken):
+        service.decrypt_message(token)
+    with pytest.raises(InvalidToken):
+        await service.decrypt_for_user(1, await service.encrypt_for_user(1, "x", secret="password"))
+
+
+@pytest.mark.parametrize("mode", ["fernet", "aes-gcm"])
+def test_batch_encryption_round_trip(mode):
+    """Test batch APIs match single-message results in both modes"""
+    service = EncryptionService(mode=mode)
+    messages = ["hello", "", "ünïcode ✓", "x" * 5000]
+    tokens = service.encrypt_messages(messages)
+
+    assert service.decrypt_messages(tokens) == messages
+    assert [service.decrypt_message(token) for token in tokens] == messages
+    assert len(set(tokens)) == len(tokens)
+
+
+def test_aes_gcm_tokens_are_smaller_and_interoperable():
+    """Test AES-GCM tokens are compact and both formats decrypt under either mode"""
+    key = Fernet.generate_key()
+    fernet, gcm = EncryptionService(key=key), EncryptionService(key=key, mode="aes-gcm")
+    message = "x" * 1000
+
+    assert len(gcm.encrypt_message(message)) < len(fernet.encrypt_message(message))
+    assert fernet.decrypt_message(gcm.encrypt_message(message)) == message
+    assert gcm.decrypt_message(fernet.encrypt_message(message)) == message
+    with pytest.raises(InvalidToken):
+        EncryptionService(mode="aes-gcm").decrypt_message(gcm.encrypt_message(message))
+    with pytest.raises(ValueError):
+        EncryptionService(mode="rot13")
+
+
+def test_encrypt_bytes_accepts_views(encryption_service):
+    """Test raw AES-GCM works on memoryview slices and binds associated data"""
+    buffer = bytearray(b"header|payload|trailer")
+    blob = encryption_service.encrypt_bytes(memoryview(buffer)[7:14], b"asset-1")
+
+    assert encryption_service.decrypt_bytes(memoryview(blob), b"asset-1") == b"payload"
+    with pytest.raises(InvalidTag):
+        encryption_service.decrypt_bytes(blob, b"asset-2")
+
+
+def encrypted_stream(service, data: bytes, chunk_size: int = 16) -> bytes:
+    dest = io.BytesIO()
+    service.aead.encrypt_stream(io.BytesIO(data), dest, chunk_size=chunk_size)
+    return dest.getvalue()
+
+
+def decrypt_stream(service, data: bytes) -> bytes:
+    dest = io.BytesIO()
+    service.aead.decrypt_stream(io.BytesIO(data), dest, chunk_size=7)
+    return dest.getvalue()
+
+
+@pytest.mark.parametrize("size", [0, 5, 16, 32, 100])
+def test_stream_round_trip(encryption_service, size):
+    """Test streamed encryption at, below and across chunk boundaries"""
+    data = bytes(range(size))
+    encrypted = encrypted_stream(encryption_service, data)
+
+    frames = max(1, -(-size // 16))
+    assert len(encrypted) == STREAM_HEADER.size + size + frames * TAG_SIZE
+    assert decrypt_stream(encryption_service, encrypted) == data
+
+
+def test_stream_rejects_tampering(encryption_service):
+    """Test altered, truncated, extended and reordered streams fail"""
+    data = bytes(range(64))
+    encrypted = encrypted_stream(encryption_service, data)
+    frame = 16 + TAG_SIZE
+    header, frames = encrypted[:STREAM_HEADER.size], encrypted[STREAM_HEADER.size:]
+
+    flipped = bytearray(encrypted)
+    flipped[-1] ^= 1
+    tampered = [
+        bytes(flipped),
+        header + frames[:2 * frame],
+        encrypted + frames[-frame:],
+        header + frames[frame:2 * frame] + frames[:frame] + frames[2 * frame:],
+    ]
+    for stream in tampered:
+        with pytest.raises(InvalidTag):
+            decrypt_stream(encryption_service, stream)
+    with pytest.raises(ValueError):
+        decrypt_stream(encryption_service, b"not encrypted at all")
+
+
+@pytest.mark.asyncio
+async def test_async_chunk_streams(encryption_service):
+    """Test async encryption re-frames irregular input and decrypts frame by frame"""
+    data = bytes(range(256)) * 40
+
+    async def pieces(blob: bytes, sizes):
+        offset, i = 0, 0
+        while offset < len(blob):
+            size = sizes[i % len(sizes)]
+            yield blob[offset:offset + size]
+            offset, i = offset + size, i + 1
+
+    aead = encryption_service.aead
+    encrypted = b"".join([chunk async for chunk in aead.encrypt_chunks(pieces(data, [1, 999, 4096]), 1024)])
+    plaintext = [chunk async for chunk in aead.decrypt_chunks(pieces(encrypted, [333]))]
+
+    assert b"".join(plaintext) == data
+    assert max(len(chunk) for chunk in plaintext) == 1024
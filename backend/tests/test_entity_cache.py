@@ -0,0 +1,169 @@
+# backend/tests/test_entity_cache.py
+# Read-through Game/User cache tests
+
+import asyncio
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from backend.database import get_db, session_dependency
+from backend.models import Game, User
+from backend.services.entity_cache import EntityCache, MemoryBackend, RedisBackend
+from backend.services.redis_local import LocalRedis
+from backend.api import cache, games, users
+
+
+def make_game(**values):
+    values = {"id": 1, "game_id": "game_a", "title": "Game A", "description": "", "template_type": "rpg",
+              "status": "draft", **values}
+    return Game(**values)
+
+
+class CountingLoader:
+    def __init__(self, result=None, delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.result
+
+
+@pytest.fixture(params=["memory", "redis"])
+def entity_cache(request):
+    backend = MemoryBackend(max_entries=100) if request.param == "memory" else RedisBackend(LocalRedis())
+    return EntityCache(backend, ttl=60, negative_ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_rows_are_read_through(entity_cache):
+    """Test a row is loaded once, then served as a detached copy"""
+    loader = CountingLoader(make_game())
+
+    first = await entity_cache.get(Game, "game_a", loader)
+    second = await entity_cache.get(Game, "game_a", loader)
+
+    assert loader.calls == 1
+    assert first is loader.result
+    assert (second.id, second.title, second.status) == (1, "Game A", "draft")
+    assert entity_cache.stats()["hit_ratio"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load(entity_cache):
+    """Test a stampede on a cold key runs the loader once"""
+    loader = CountingLoader(make_game(), delay=0.05)
+
+    results = await asyncio.gather(*(entity_cache.get(Game, "game_a", loader) for _ in range(50)))
+
+    assert loader.calls == 1
+    assert {game.game_id for game in results} == {"game_a"}
+    assert entity_cache.stats()["coalesced"] == 49
+
+
+@pytest.mark.asyncio
+async def test_failed_load_is_retried_by_waiters(entity_cache):
+    """Test waiters load for themselves when the shared load fails"""
+    async def failing():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("database unavailable")
+    loader = CountingLoader(make_game())
+
+    results = await asyncio.gather(
+        entity_cache.get(Game, "game_a", failing),
+        entity_cache.get(Game, "game_a", loader),
+        return_exceptions=True
+    )
+
+    assert isinstance(results[0], RuntimeError)
+    assert results[1].game_id == "game_a"
+
+
+@pytest.mark.asyncio
+async def test_missing_rows_are_cached_until_invalidated(entity_cache):
+    """Test "not found" is cached, and creating the row invalidates it"""
+    missing = CountingLoader(None)
+    assert await entity_cache.get(Game, "game_a", missing) is None
+    assert await entity_cache.get(Game, "game_a", missing) is None
+    assert missing.calls == 1
+
+    await entity_cache.invalidate(Game, "game_a")
+    assert (await entity_cache.get(Game, "game_a", CountingLoader(make_game()))).title == "Game A"
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_load_is_not_overwritten(entity_cache):
+    """Test a load racing a write is returned but not cached"""
+    stale = CountingLoader(make_game(), delay=0.05)
+    pending = asyncio.create_task(entity_cache.get(Game, "game_a", stale))
+    await asyncio.sleep(0.01)
+    await entity_cache.invalidate(Game, "game_a")
+    await pending
+
+    fresh = CountingLoader(make_game(status="published"))
+    assert (await entity_cache.get(Game, "game_a", fresh)).status == "published"
+    assert fresh.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_backend_errors_fall_back_to_the_loader():
+    """Test an unreachable cache degrades to database reads"""
+    class BrokenRedis(LocalRedis):
+        async def get(self, key):
+            raise ConnectionError("redis down")
+
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("redis down")
+
+    entity_cache = EntityCache(RedisBackend(BrokenRedis()))
+    loader = CountingLoader(make_game())
+    assert (await entity_cache.get(Game, "game_a", loader)).game_id == "game_a"
+    assert entity_cache.stats()["errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_and_expires():
+    """Test the memory backend is bounded and honours TTLs"""
+    backend = MemoryBackend(max_entries=2)
+    await backend.set("a", b"1", ttl=60)
+    await backend.set("b", b"2", ttl=60)
+    await backend.get("a")
+    await backend.set("c", b"3", ttl=60)
+    assert await backend.get("b") is None
+    assert await backend.get("a") == b"1"
+
+    await backend.set("c", b"3", ttl=0)
+    assert await backend.get("c") is None
+    assert backend.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_api_reads_are_cached_and_writes_invalidate(session_factory, monkeypatch):
+    """Test game and user endpoints hit the database once per write"""
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com"))
+        db.add(make_game(developer_id=1))
+        await db.commit()
+
+    entity_cache = EntityCache(MemoryBackend(max_entries=100))
+    monkeypatch.setattr(cache, "entity_cache", entity_cache)
+    monkeypatch.setattr(games, "entity_cache", entity_cache)
+    monkeypatch.setattr(users, "entity_cache", entity_cache)
+    app = FastAPI()
+    app.include_router(games.router)
+    app.include_router(users.router)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for _ in range(3):
+            assert (await client.get("/games/game_a")).json()["title"] == "Game A"
+            assert (await client.get("/games/game_a/stats")).status_code == 200
+            assert (await client.get("/users/me", params={"user_id": 1})).json()["username"] == "dev"
+        assert entity_cache.loads == 2
+
+        await client.put("/users/me", params={"user_id": 1, "username": "renamed"})
+        assert (await client.get("/users/me", params={"user_id": 1})).json()["username"] == "renamed"
+        await client.delete("/games/game_a")
+        assert (await client.get("/games/game_a")).status_code == 404
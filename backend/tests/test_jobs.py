@@ -0,0 +1,263 @@
+# backend/tests/test_jobs.py
+# Background job queue tests
+
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import update
+
+from backend.database import get_db, session_dependency
+from backend.models import Game, Job, User
+from backend.services.jobs import JobQueue, PermanentJobError
+from backend.api import jobs, payments
+
+
+@pytest.fixture
+async def queue(session_factory):
+    """Job queue with fast polling and retries"""
+    queue = JobQueue(session_factory, poll_interval=0.05, retry_base_delay=0.01)
+    yield queue
+    await queue.stop()
+
+
+async def enqueue(queue, session_factory, job_type, payload=None):
+    async with session_factory() as db:
+        job = await queue.enqueue(db, job_type, payload or {})
+        return job.job_id
+
+
+@pytest.mark.asyncio
+async def test_job_runs_and_stores_result(queue, session_factory):
+    """Test a queued job runs and its result can be polled"""
+    @queue.handler("echo")
+    async def echo(db, payload):
+        return {"echo": payload["value"]}
+
+    await queue.start()
+    job_id = await enqueue(queue, session_factory, "echo", {"value": 42})
+    job = await queue.wait_for(job_id, timeout=5)
+
+    assert job.status == "succeeded"
+    assert job.attempts == 1
+    assert '"echo": 42' in job.result
+
+
+@pytest.mark.asyncio
+async def test_job_retries_with_backoff(queue, session_factory):
+    """Test failing jobs are retried until they succeed"""
+    calls = []
+
+    @queue.handler("flaky", max_attempts=3)
+    async def flaky(db, payload):
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("LLM timeout")
+        return {"ok": True}
+
+    await queue.start()
+    job = await queue.wait_for(await enqueue(queue, session_factory, "flaky"), timeout=5)
+
+    assert job.status == "succeeded"
+    assert job.attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_job_failures(queue, session_factory):
+    """Test jobs fail after max attempts, or at once on permanent errors"""
+    @queue.handler("broken", max_attempts=2)
+    async def broken(db, payload):
+        raise RuntimeError("boom")
+
+    @queue.handler("missing", max_attempts=5)
+    async def missing(db, payload):
+        raise PermanentJobError("Game not found")
+
+    await queue.start()
+    broken_job = await queue.wait_for(await enqueue(queue, session_factory, "broken"), timeout=5)
+    missing_job = await queue.wait_for(await enqueue(queue, session_factory, "missing"), timeout=5)
+
+    assert broken_job.status == "failed"
+    assert broken_job.attempts == 2
+    assert "boom" in broken_job.error
+    assert missing_job.status == "failed"
+    assert missing_job.attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_per_type(queue, session_factory):
+    """Test no more than `concurrency` jobs of a type run at once"""
+    running = 0
+    peak = 0
+
+    @queue.handler("slow", concurrency=2)
+    async def slow(db, payload):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    await queue.start()
+    job_ids = [await enqueue(queue, session_factory, "slow") for _ in range(6)]
+    for job_id in job_ids:
+        assert (await queue.wait_for(job_id, timeout=5)).status == "succeeded"
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_cancel_running_job(queue, session_factory):
+    """Test cancelling a running job interrupts its handler"""
+    started = asyncio.Event()
+    interrupted = asyncio.Event()
+
+    @queue.handler("llm")
+    async def llm(db, payload):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            interrupted.set()
+            raise
+
+    await queue.start()
+    job_id = await enqueue(queue, session_factory, "llm")
+    await asyncio.wait_for(started.wait(), 5)
+
+    async with session_factory() as db:
+        job = await queue.cancel(db, job_id)
+    assert job.status == "cancelled"
+
+    await asyncio.wait_for(interrupted.wait(), 5)
+    assert (await queue.wait_for(job_id, timeout=5)).status == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_lease_is_renewed_while_job_runs(session_factory):
+    """Test a job running past its lease is not claimed by another replica"""
+    calls = []
+    replicas = [JobQueue(session_factory, poll_interval=0.02, lease_seconds=0.2, heartbeat_interval=0.05)
+                for _ in range(2)]
+    for replica in replicas:
+        @replica.handler("publish")
+        async def publish(db, payload):
+            calls.append(1)
+            await asyncio.sleep(0.8)
+            return {"ok": True}
+
+    try:
+        for replica in replicas:
+            await replica.start()
+        job = await replicas[0].wait_for(await enqueue(replicas[0], session_factory, "publish"), timeout=5)
+    finally:
+        for replica in replicas:
+            await replica.stop()
+
+    assert job.status == "succeeded"
+    assert job.attempts == 1
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_stops_the_handler(session_factory):
+    """Test a worker whose job was re-claimed stops and leaves the new claim's state alone"""
+    queue = JobQueue(session_factory, poll_interval=0.02, heartbeat_interval=0.05)
+    started = asyncio.Event()
+    interrupted = asyncio.Event()
+
+    @queue.handler("publish")
+    async def publish(db, payload):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            interrupted.set()
+            raise
+
+    await queue.start()
+    try:
+        job_id = await enqueue(queue, session_factory, "publish")
+        await asyncio.wait_for(started.wait(), 5)
+        # As if the lease had expired and another worker claimed the job
+        async with session_factory() as db:
+            await db.execute(update(Job).where(Job.job_id == job_id).values(attempts=Job.attempts + 1))
+            await db.commit()
+
+        await asyncio.wait_for(interrupted.wait(), 5)
+    finally:
+        await queue.stop()
+    async with session_factory() as db:
+        job = await queue.get(db, job_id)
+    assert (job.status, job.attempts) == ("running", 2)
+
+
+@pytest.mark.asyncio
+async def test_crashed_last_attempt_fails_the_job(queue, session_factory):
+    """Test a job whose worker died is retried only until max_attempts, then marked failed"""
+    calls = []
+
+    @queue.handler("optimize", max_attempts=2)
+    async def optimize(db, payload):
+        calls.append(payload["crashes"])
+        return {"ok": True}
+
+    # As if each worker was killed mid-run: running, with an expired lease
+    job_ids = [await enqueue(queue, session_factory, "optimize", {"crashes": crashes}) for crashes in (1, 2)]
+    async with session_factory() as db:
+        for job_id, crashes in zip(job_ids, (1, 2)):
+            await db.execute(update(Job).where(Job.job_id == job_id).values(
+                status="running", attempts=crashes, locked_until=datetime.utcnow() - timedelta(seconds=1)
+            ))
+        await db.commit()
+
+    await queue.start()
+    retried, exhausted = [await queue.wait_for(job_id, timeout=5) for job_id in job_ids]
+
+    assert (retried.status, retried.attempts) == ("succeeded", 2)
+    assert (exhausted.status, exhausted.attempts) == ("failed", 2)
+    assert "Lease expired" in exhausted.error
+    assert exhausted.locked_until is None
+    assert calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_publish_returns_job_id(session_factory, monkeypatch):
+    """Test publishing is queued and completes in the background"""
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com", wallet_address="0xabc"))
+        db.add(Game(game_id="game_pub", title="Pub", description="", template_type="rpg",
+                    developer_id=1, dojo_contract_address="0x1"))
+        await db.commit()
+
+    monkeypatch.setattr(jobs.job_queue, "session_factory", session_factory)
+    app = FastAPI()
+    app.include_router(payments.router)
+    app.include_router(jobs.router)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+
+    await jobs.job_queue.start()
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/payments/publish", json={
+                "game_id": "game_pub",
+                "payment_method": "chipi_pay",
+                "payment_amount": "10"
+            })
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+
+            await jobs.job_queue.wait_for(job_id, timeout=5)
+            status = (await client.get(f"/jobs/{job_id}")).json()
+            assert status["status"] == "succeeded"
+            assert status["result"]["status"] == "live"
+
+            missing = await client.post("/payments/publish", json={
+                "game_id": "nope",
+                "payment_method": "chipi_pay",
+                "payment_amount": "10"
+            })
+            assert missing.status_code == 404
+    finally:
+        await jobs.job_queue.stop()
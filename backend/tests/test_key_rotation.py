@@ -0,0 +1,138 @@
+# backend/tests/test_key_rotation.py
+# Versioned encryption keys and chat history re-encryption tests
+
+import os
+import stat
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy import select
+
+from backend.models import ChatMessage, ReencryptionCheckpoint, User
+from backend.services.encryption import LEGACY_KEY_ID, EncryptionService, KeyRing, load_keyring
+from backend.services.key_rotation import ChatReencryptor
+
+OLD_KEY = Fernet.generate_key()
+NEW_KEY = Fernet.generate_key()
+
+
+def service(*keys) -> EncryptionService:
+    return EncryptionService(keyring=KeyRing(list(keys)), kdf_iterations=1000)
+
+
+def test_keyring_parsing_and_precedence(tmp_path):
+    """Test ENCRYPTION_KEYS wins over ENCRYPTION_KEY, primary first"""
+    ring = KeyRing.parse(f"k2:{NEW_KEY.decode()}, k1:{OLD_KEY.decode()}")
+    assert ring.primary_id == "k2"
+    assert ring.get("k1") == OLD_KEY
+    with pytest.raises(KeyError):
+        ring.get("k0")
+
+    assert load_keyring(f"k2:{NEW_KEY.decode()}", OLD_KEY.decode(), tmp_path / "keys.json").primary_id == "k2"
+    assert load_keyring("", OLD_KEY.decode(), tmp_path / "keys.json").primary_id == LEGACY_KEY_ID
+    for bad in ["k1", f"bad id:{NEW_KEY.decode()}", "k1:not-a-key", f"k1:{NEW_KEY.decode()},k1:{OLD_KEY.decode()}"]:
+        with pytest.raises(ValueError):
+            KeyRing.parse(bad)
+
+
+def test_generated_key_is_persisted(tmp_path):
+    """Test a generated key is written once, privately, and reused"""
+    key_file = tmp_path / "keys" / "encryption_keys.json"
+    first = load_keyring("", None, key_file)
+    second = load_keyring("", None, key_file)
+
+    assert first.primary == second.primary
+    assert stat.S_IMODE(os.stat(key_file).st_mode) == 0o600
+
+
+@pytest.mark.asyncio
+async def test_old_keys_still_decrypt_after_rotation():
+    """Test data from the previous primary key stays readable"""
+    old = service(("k1", OLD_KEY))
+    fernet_token = old.encrypt_message("hello")
+    gcm_token = EncryptionService(keyring=old.keyring, mode="aes-gcm").encrypt_message("hello")
+    user_token = await old.encrypt_for_user(5, "hello")
+
+    rotated = service(("k2", NEW_KEY), ("k1", OLD_KEY))
+    assert rotated.key_id == "k2"
+    assert rotated.decrypt_message(fernet_token) == "hello"
+    assert rotated.decrypt_message(gcm_token) == "hello"
+    assert await rotated.decrypt_for_user(5, user_token, key_id="k1") == "hello"
+    with pytest.raises(InvalidToken):
+        await rotated.decrypt_for_user(5, user_token)
+    with pytest.raises(InvalidToken):
+        service(("k2", NEW_KEY)).decrypt_message(gcm_token)
+
+
+@pytest.fixture
+async def history(session_factory):
+    """Chat rows under the old key, from before key ids, and unencrypted"""
+    old = service((LEGACY_KEY_ID, OLD_KEY), ("k1", Fernet.generate_key()))
+    k1 = service(("k1", old.keyring.get("k1")))
+    async with session_factory() as db:
+        db.add_all([User(id=user_id, username=f"u{user_id}", email=f"u{user_id}@example.com") for user_id in (0, 1)])
+        await db.flush()
+        for i in range(5):
+            cipher = await k1.user_cipher(i % 2)
+            db.add(ChatMessage(user_id=i % 2, message=cipher.encrypt(f"m{i}".encode()).decode(),
+                               response=cipher.encrypt(b"r").decode(), encrypted=True, key_id="k1"))
+        legacy_user = await old.user_cipher(1, key_id=LEGACY_KEY_ID)
+        db.add(ChatMessage(user_id=1, message=legacy_user.encrypt(b"legacy user").decode(),
+                           response=legacy_user.encrypt(b"r").decode(), encrypted=True))
+        db.add(ChatMessage(user_id=1, message=old.encrypt_message("legacy global"),
+                           response=old.encrypt_message("r"), encrypted=True))
+        db.add(ChatMessage(user_id=1, message="garbage", response="garbage", encrypted=True, key_id="k1"))
+        db.add(ChatMessage(user_id=1, message="plain", response="r", encrypted=False))
+        await db.commit()
+    return old.keyring
+
+
+@pytest.mark.asyncio
+async def test_reencryption_resumes_from_checkpoint(session_factory, history):
+    """Test rows move to the new key in batches, resuming after an interruption"""
+    rotated = service(("k2", NEW_KEY), *history.keys.items())
+    reencryptor = ChatReencryptor(rotated, batch_size=3, delay=0)
+
+    async with session_factory() as db:
+        partial = await reencryptor.run(db, max_batches=1)
+    assert partial == {"target_key_id": "k2", "rotated": 3, "failed": 0, "last_message_id": 3, "completed": False}
+
+    async with session_factory() as db:
+        done = await reencryptor.run(db)
+    assert done["completed"]
+    assert (done["rotated"], done["failed"]) == (7, 1)
+
+    async with session_factory() as db:
+        rows = (await db.scalars(select(ChatMessage).order_by(ChatMessage.id))).all()
+        checkpoint = await db.scalar(select(ReencryptionCheckpoint))
+    assert checkpoint.target_key_id == "k2" and checkpoint.completed_at is not None
+
+    # Only the new key is needed from now on
+    new_only = service(("k2", NEW_KEY))
+    messages = [
+        await new_only.decrypt_for_user(row.user_id, row.message, key_id=row.key_id)
+        for row in rows if row.key_id == "k2"
+    ]
+    assert messages == ["m0", "m1", "m2", "m3", "m4", "legacy user", "legacy global"]
+    assert [(row.message, row.key_id) for row in rows[-2:]] == [("garbage", "k1"), ("plain", None)]
+
+
+@pytest.mark.asyncio
+async def test_reencryption_skips_rows_rewritten_concurrently(session_factory, history, monkeypatch):
+    """Test a row whose key changed after it was read is not overwritten"""
+    rotated = service(("k2", NEW_KEY), *history.keys.items())
+    reencryptor = ChatReencryptor(rotated, batch_size=100, delay=0)
+    reencrypt = reencryptor._reencrypt
+
+    async def concurrent_write(rows):
+        result = await reencrypt(rows)
+        async with session_factory() as other:
+            row = await other.get(ChatMessage, 1)
+            row.message, row.key_id = "rewritten", "k2"
+            await other.commit()
+        return result
+
+    monkeypatch.setattr(reencryptor, "_reencrypt", concurrent_write)
+    async with session_factory() as db:
+        await reencryptor.run(db)
+        row = await db.get(ChatMessage, 1)
+    assert row.message == "rewritten"
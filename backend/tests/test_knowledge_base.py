@@ -0,0 +1,103 @@
+# backend/tests/test_knowledge_base.py
+# Knowledge base ingestion tests
+
+import pytest
+from langchain.embeddings import FakeEmbeddings
+from langchain.vectorstores import Chroma
+
+from backend.services.knowledge_base import (
+    KnowledgeBaseIngestor, chunk_ids, file_sources, path_scope, text_sources
+)
+
+
+class RecordingEmbeddings(FakeEmbeddings):
+    """Offline embeddings that record each batch"""
+    batches: list = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "corpus"
+    (root / "guides").mkdir(parents=True)
+    (root / ".git").mkdir()
+    for i in range(20):
+        (root / "guides" / f"guide_{i}.md").write_text(f"# Guide {i}\n\n" + f"Dojo systems and models {i}. " * 40)
+    (root / "world.cairo").write_text("#[dojo::contract]\nmod actions {}\n")
+    (root / "logo.png").write_bytes(b"\x89PNG")
+    (root / ".git" / "HEAD").write_text("ref: refs/heads/main")
+    return root
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    embeddings = RecordingEmbeddings(size=8)
+    embeddings.batches = []
+    store = Chroma(collection_name="knowledge", embedding_function=embeddings, persist_directory=str(tmp_path / "index"))
+    return KnowledgeBaseIngestor(store, tmp_path / "index" / "manifest.json", batch_size=16)
+
+
+def test_chunk_ids_are_stable_per_content():
+    """Test ids depend on source and text, and repeated text gets distinct ids"""
+    ids = chunk_ids("a.md", ["x", "y", "x"])
+    assert len(set(ids)) == 3
+    assert chunk_ids("a.md", ["y"])[0] == ids[1]
+    assert chunk_ids("b.md", ["y"])[0] != ids[1]
+
+
+def test_file_sources_filters_and_skips_hidden(corpus):
+    """Test only text sources outside hidden directories are yielded"""
+    names = sorted(source.source for source in file_sources([corpus]))
+    assert len(names) == 21
+    assert all(name.endswith((".md", ".cairo")) for name in names)
+
+
+def test_ingest_is_batched_and_incremental(ingestor, corpus):
+    """Test a first ingest embeds in batches and a re-ingest embeds nothing"""
+    scope = path_scope([corpus])
+    first = ingestor.ingest(file_sources([corpus]), scope=scope)
+
+    assert first.sources_seen == 21
+    assert first.chunks_embedded == ingestor.vectorstore._collection.count()
+    assert max(ingestor.vectorstore._embedding_function.batches) <= 16
+    assert first.batches == len(ingestor.vectorstore._embedding_function.batches)
+
+    second = ingestor.ingest(file_sources([corpus]), scope=scope)
+    assert second.chunks_embedded == 0
+    assert second.sources_changed == 0
+    assert second.chunks_skipped == first.chunks_embedded
+
+
+def test_ingest_upserts_changes_and_deletes_removed(ingestor, corpus):
+    """Test edited files only re-embed new chunks and removed files are deleted"""
+    scope = path_scope([corpus])
+    ingestor.ingest(file_sources([corpus]), scope=scope)
+    total = ingestor.vectorstore._collection.count()
+    removed_chunks = len(ingestor.manifest[str(corpus / "guides" / "guide_1.md")]["chunks"])
+
+    guide = corpus / "guides" / "guide_0.md"
+    guide.write_text(guide.read_text() + "\n\nNew section about Torii indexing.")
+    (corpus / "guides" / "guide_1.md").unlink()
+
+    report = ingestor.ingest(file_sources([corpus]), scope=scope)
+    assert report.sources_changed == 1
+    assert report.sources_removed == 1
+    assert 0 < report.chunks_embedded < 4
+    assert report.chunks_deleted >= removed_chunks
+    assert ingestor.vectorstore._collection.count() == total - report.chunks_deleted + report.chunks_embedded
+
+    hits = ingestor.vectorstore._collection.get(where={"source": str(corpus / "guides" / "guide_1.md")})
+    assert hits["ids"] == []
+
+
+def test_ingest_scope_limits_deletion(ingestor, corpus):
+    """Test sources outside the scope are left alone"""
+    ingestor.ingest(text_sources("builtin", ["Dojo is a provable game engine."]), scope=["builtin:"])
+    ingestor.ingest(file_sources([corpus]), scope=path_scope([corpus]))
+
+    assert "builtin:0" in ingestor.manifest
+    assert ingestor.ingest(text_sources("builtin", []), scope=["builtin:"]).sources_removed == 1
+    assert str(corpus / "world.cairo") in ingestor.manifest
@@ -1,8 +1,25 @@
 # backend/tests/test_payments.py
 # Payment processing tests
 
+import io
+import csv
+import json
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
 import pytest
+from fastapi import FastAPI
+import httpx
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from backend.database import get_db, session_dependency
+from backend.models import Game, GameRevenue, Publication, Transaction, User
+from backend.services.bitcoin import BitcoinRPC, BitcoinSettlement
+from backend.services.bitcoin_regtest import LocalRegtestNode
 from backend.services.payment import PaymentProcessor
+from backend.api import jobs, payments
+from backend.api.cache import entity_cache
 
 
 @pytest.fixture
@@ -52,28 +69,402 @@ async def test_process_starknet_payment(payment_processor):
 
 
 @pytest.mark.asyncio
-async def test_process_bitcoin_xverse_payment(payment_processor):
-    """Test Bitcoin payment via Xverse"""
-    tx_id = await payment_processor.process_bitcoin_payment(
-        method="xverse",
-        from_address="bc1q123",
-        to_address="bc1q456",
-        amount=0.001
-    )
-    
-    assert isinstance(tx_id, str)
-    assert tx_id.startswith("xverse_")
+@pytest.mark.parametrize("method", ["xverse", "vesu"])
+async def test_process_bitcoin_payment_invoices_a_new_address(payment_processor, method):
+    """Test Bitcoin payments via Xverse and Vesu each get a fresh wallet address to pay"""
+    addresses = [
+        await payment_processor.process_bitcoin_payment(method=method, amount=Decimal("0.001"), label=f"pub-{i}")
+        for i in range(2)
+    ]
+
+    assert all(address.startswith("bcrt1q") for address in addresses)
+    assert addresses[0] != addresses[1]
+
+
+@pytest.fixture
+async def publish_client(session_factory, monkeypatch):
+    """Payments API with the job queue running against the test database"""
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com", wallet_address="0xabc"))
+        for game_id in ("game_a", "game_b"):
+            db.add(Game(game_id=game_id, title=game_id, description="", template_type="rpg",
+                        developer_id=1, dojo_contract_address="0x1"))
+        await db.commit()
+
+    monkeypatch.setattr(jobs.job_queue, "session_factory", session_factory)
+    monkeypatch.setattr(jobs.job_queue, "retry_base_delay", 0.01)
+    monkeypatch.setattr(payments, "payment_processor", PaymentProcessor())
+    monkeypatch.setattr(jobs.job_queue, "poll_interval", 0.05)
+    app = FastAPI()
+    app.include_router(payments.router)
+    app.include_router(jobs.router)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+
+    await jobs.job_queue.start()
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            yield client
+    finally:
+        await jobs.job_queue.stop()
+
+
+def publish_body(game_id="game_a", amount="10"):
+    return {"game_id": game_id, "payment_method": "chipi_pay", "payment_amount": amount}
 
 
 @pytest.mark.asyncio
-async def test_process_bitcoin_vesu_payment(payment_processor):
-    """Test Bitcoin payment via Vesu"""
-    tx_id = await payment_processor.process_bitcoin_payment(
-        method="vesu",
-        from_address="bc1q123",
-        to_address="bc1q456",
-        amount=0.001
+async def test_publish_is_idempotent(publish_client, session_factory, monkeypatch):
+    """Test retries with one Idempotency-Key deploy and charge once"""
+    charges = []
+    submit = payments.payment_processor.submit_starknet_payment
+
+    async def counting_submit(**kwargs):
+        charges.append(kwargs["from_address"])
+        return await submit(**kwargs)
+
+    monkeypatch.setattr(payments.payment_processor, "submit_starknet_payment", counting_submit)
+    headers = {"Idempotency-Key": "publish-1"}
+
+    first = await publish_client.post("/payments/publish", json=publish_body(), headers=headers)
+    assert first.status_code == 202
+    job = await jobs.job_queue.wait_for(first.json()["job_id"], timeout=5)
+    assert job.status == "succeeded"
+
+    retry = await publish_client.post("/payments/publish", json=publish_body(), headers=headers)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["job_id"] == first.json()["job_id"]
+    assert retry.json()["publication_status"] == "published"
+
+    reused = await publish_client.post("/payments/publish", json=publish_body(amount="99"), headers=headers)
+    assert reused.status_code == 422
+    other_key = await publish_client.post("/payments/publish", json=publish_body(),
+                                          headers={"Idempotency-Key": "publish-2"})
+    assert other_key.status_code == 409
+
+    async with session_factory() as db:
+        transactions = (await db.scalars(select(Transaction))).all()
+        game = await db.scalar(select(Game).where(Game.game_id == "game_a"))
+        revenue = (await db.scalars(select(GameRevenue))).all()
+    assert charges == ["0xabc"]
+    assert len(transactions) == 1
+    assert transactions[0].game_id == game.id
+    assert [(row.currency, row.payments) for row in revenue] == [("STRK", 1)]
+    assert game.status == "published"
+
+
+@pytest.mark.asyncio
+async def test_publish_without_key_dedupes_identical_requests(publish_client):
+    """Test a double-click without an Idempotency-Key queues one publication"""
+    first, second = await asyncio.gather(
+        publish_client.post("/payments/publish", json=publish_body("game_b")),
+        publish_client.post("/payments/publish", json=publish_body("game_b"))
     )
-    
-    assert isinstance(tx_id, str)
-    assert tx_id.startswith("vesu_")
+
+    assert first.json()["publication_id"] == second.json()["publication_id"]
+    assert {first.status_code, second.status_code} == {202}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_publishes_with_different_keys_conflict(publish_client, session_factory):
+    """Test two keys racing to publish one game create a single publication"""
+    responses = await asyncio.gather(*(
+        publish_client.post("/payments/publish", json=publish_body("game_b"), headers={"Idempotency-Key": key})
+        for key in ("first", "second")
+    ))
+
+    assert sorted(response.status_code for response in responses) == [202, 409]
+    async with session_factory() as db:
+        assert len((await db.scalars(select(Publication))).all()) == 1
+
+
+@pytest.mark.asyncio
+async def test_publish_runs_deploy_and_payment_concurrently(publish_client, monkeypatch):
+    """Test deployment and payment overlap instead of running back to back"""
+    deploying, paying = asyncio.Event(), asyncio.Event()
+
+    async def deploy(game_id, world_address):
+        deploying.set()
+        await asyncio.wait_for(paying.wait(), 2)
+        return {"world": world_address}
+
+    async def submit(**kwargs):
+        return "0xpaid"
+
+    async def confirm(tx_hash):
+        paying.set()
+        await asyncio.wait_for(deploying.wait(), 2)
+        return tx_hash
+
+    monkeypatch.setattr(payments.DojoEngine, "deploy_game_contracts", deploy)
+    monkeypatch.setattr(payments.payment_processor, "submit_starknet_payment", submit)
+    monkeypatch.setattr(payments.payment_processor, "confirm_starknet_payment", confirm)
+
+    response = await publish_client.post("/payments/publish", json=publish_body())
+    job = await jobs.job_queue.wait_for(response.json()["job_id"], timeout=5)
+
+    assert job.status == "succeeded"
+    assert '"transaction_hash": "0xpaid"' in job.result
+
+
+@pytest.mark.asyncio
+async def test_publish_resumes_after_failed_step(publish_client, session_factory, monkeypatch):
+    """Test a failed payment is retried without redeploying"""
+    deploys, payments_made = [], []
+
+    async def deploy(game_id, world_address):
+        deploys.append(game_id)
+        return {"world": world_address}
+
+    async def flaky_submit(**kwargs):
+        payments_made.append(1)
+        if len(payments_made) == 1:
+            raise RuntimeError("gateway timeout")
+        return "0xpaid"
+
+    async def confirm(tx_hash):
+        return tx_hash
+
+    monkeypatch.setattr(payments.DojoEngine, "deploy_game_contracts", deploy)
+    monkeypatch.setattr(payments.payment_processor, "submit_starknet_payment", flaky_submit)
+    monkeypatch.setattr(payments.payment_processor, "confirm_starknet_payment", confirm)
+
+    response = await publish_client.post("/payments/publish", json=publish_body())
+    job = await jobs.job_queue.wait_for(response.json()["job_id"], timeout=5)
+
+    assert job.status == "succeeded"
+    assert job.attempts == 2
+    assert (len(deploys), len(payments_made)) == (1, 2)
+    async with session_factory() as db:
+        publication = await db.scalar(select(Publication))
+    assert publication.status == "published"
+    assert publication.error is None
+
+
+@pytest.mark.asyncio
+async def test_retrying_failed_publication_resumes_it(publish_client, monkeypatch):
+    """Test re-posting after the job gave up queues a job that continues the publication"""
+    deploys = []
+
+    async def deploy(game_id, world_address):
+        deploys.append(game_id)
+        return {"world": world_address}
+
+    async def declined(**kwargs):
+        raise RuntimeError("card declined")
+
+    monkeypatch.setattr(payments.DojoEngine, "deploy_game_contracts", deploy)
+    monkeypatch.setattr(payments.payment_processor, "submit_starknet_payment", declined)
+    headers = {"Idempotency-Key": "publish-3"}
+
+    first = await publish_client.post("/payments/publish", json=publish_body(), headers=headers)
+    failed = await jobs.job_queue.wait_for(first.json()["job_id"], timeout=5)
+    assert failed.status == "failed"
+    assert "card declined" in failed.error
+
+    async def submit(**kwargs):
+        return "0xpaid"
+
+    async def confirm(tx_hash):
+        return tx_hash
+
+    monkeypatch.setattr(payments.payment_processor, "submit_starknet_payment", submit)
+    monkeypatch.setattr(payments.payment_processor, "confirm_starknet_payment", confirm)
+    retry = await publish_client.post("/payments/publish", json=publish_body(), headers=headers)
+    assert retry.json()["job_id"] != first.json()["job_id"]
+    assert retry.json()["publication_status"] == "deployed"
+
+    job = await jobs.job_queue.wait_for(retry.json()["job_id"], timeout=5)
+    assert job.status == "succeeded"
+    assert deploys == ["game_a"]
+
+
+@pytest.mark.asyncio
+async def test_new_key_retries_failed_publication(publish_client, session_factory, monkeypatch):
+    """Test a failed publication can be retried with a new Idempotency-Key, keeping its completed steps"""
+    deploys = []
+
+    async def deploy(game_id, world_address):
+        deploys.append(game_id)
+        return {"world": world_address}
+
+    async def declined(**kwargs):
+        raise RuntimeError("card declined")
+
+    monkeypatch.setattr(payments.DojoEngine, "deploy_game_contracts", deploy)
+    monkeypatch.setattr(payments.payment_processor, "submit_starknet_payment", declined)
+    first = await publish_client.post("/payments/publish", json=publish_body(),
+                                      headers={"Idempotency-Key": "publish-4"})
+    assert (await jobs.job_queue.wait_for(first.json()["job_id"], timeout=5)).status == "failed"
+
+    async def submit(**kwargs):
+        return "0xpaid"
+
+    async def confirm(tx_hash):
+        return tx_hash
+
+    monkeypatch.setattr(payments.payment_processor, "submit_starknet_payment", submit)
+    monkeypatch.setattr(payments.payment_processor, "confirm_starknet_payment", confirm)
+    headers = {"Idempotency-Key": "publish-5"}
+    retry = await publish_client.post("/payments/publish", json=publish_body(amount="12"), headers=headers)
+    assert retry.status_code == 202
+    assert "Idempotent-Replayed" not in retry.headers
+    assert retry.json()["publication_id"] == first.json()["publication_id"]
+    assert retry.json()["idempotency_key"] == "publish-5"
+
+    job = await jobs.job_queue.wait_for(retry.json()["job_id"], timeout=5)
+    assert job.status == "succeeded"
+    assert deploys == ["game_a"]
+    replay = await publish_client.post("/payments/publish", json=publish_body(amount="12"), headers=headers)
+    assert (replay.headers["Idempotent-Replayed"], replay.json()["job_id"]) == ("true", job.job_id)
+    again = await publish_client.post("/payments/publish", json=publish_body(amount="12"),
+                                      headers={"Idempotency-Key": "publish-6"})
+    assert again.status_code == 409
+
+    async with session_factory() as db:
+        transaction = await db.scalar(select(Transaction))
+    assert transaction.amount == Decimal("12")
+
+
+@pytest.mark.asyncio
+async def test_unconfirmed_payment_is_polled_again_not_resent(publish_client, session_factory, monkeypatch):
+    """Test a retry after a receipt timeout waits on the submitted transfer instead of paying twice"""
+    submitted, polled = [], []
+    pending = []
+
+    async def submit(**kwargs):
+        submitted.append(kwargs["amount"])
+        return "0xsent"
+
+    async def confirm(tx_hash):
+        polled.append(tx_hash)
+        if len(polled) == 1:
+            # The hash was committed before the receipt wait began
+            async with session_factory() as db:
+                pending.append(await db.scalar(select(Publication.payment_pending_tx_hash)))
+            raise asyncio.TimeoutError(f"No receipt for {tx_hash}")
+        return tx_hash
+
+    monkeypatch.setattr(payments.payment_processor, "submit_starknet_payment", submit)
+    monkeypatch.setattr(payments.payment_processor, "confirm_starknet_payment", confirm)
+
+    response = await publish_client.post("/payments/publish", json=publish_body())
+    job = await jobs.job_queue.wait_for(response.json()["job_id"], timeout=5)
+
+    assert job.status == "succeeded"
+    assert job.attempts == 2
+    assert (submitted, polled, pending) == (["10"], ["0xsent", "0xsent"], ["0xsent"])
+    async with session_factory() as db:
+        publication = await db.scalar(select(Publication))
+        transactions = (await db.scalars(select(Transaction))).all()
+    assert (publication.payment_tx_hash, publication.payment_pending_tx_hash) == ("0xsent", None)
+    assert [transaction.blockchain_tx_hash for transaction in transactions] == ["0xsent"]
+
+
+@pytest.mark.asyncio
+async def test_bitcoin_publish_goes_live_once_payment_confirms(publish_client, session_factory, monkeypatch):
+    """Test a Bitcoin publish leaves the game unpublished until its invoice is paid and confirmed"""
+    node = LocalRegtestNode()
+    rpc = BitcoinRPC("http://regtest/", transport=httpx.ASGITransport(app=node))
+    monkeypatch.setattr(payments, "payment_processor", PaymentProcessor(bitcoin_rpc=rpc))
+    settlement = BitcoinSettlement(session_factory, rpc, min_confirmations=2, entity_cache=entity_cache)
+
+    response = await publish_client.post("/payments/publish", json={
+        "game_id": "game_a", "payment_method": "xverse", "payment_amount": "0.001"
+    })
+    job = await jobs.job_queue.wait_for(response.json()["job_id"], timeout=5)
+    assert job.status == "succeeded"
+
+    result = json.loads(job.result)
+    assert (result["status"], result["transaction_hash"]) == ("awaiting_payment", None)
+
+    async def state():
+        async with session_factory() as db:
+            return (await db.scalar(select(Transaction)), await db.scalar(select(Publication)),
+                    await db.scalar(select(Game).where(Game.game_id == "game_a")))
+
+    transaction, publication, game = await state()
+    assert transaction.status == "pending"
+    assert transaction.blockchain_tx_hash is None
+    assert transaction.amount == Decimal("0.001")
+    assert transaction.to_address == result["payment_address"]
+    assert transaction.to_address.startswith("bcrt1q")
+    assert publication.status == "awaiting_payment"
+    assert (game.status, game.published_at) == ("draft", None)
+
+    node.pay(transaction.to_address, "0.001")
+    node.mine(1)
+    async with session_factory() as db:
+        await settlement.track(db)
+    transaction, publication, game = await state()
+    assert (transaction.confirmations, publication.status, game.status) == (1, "awaiting_payment", "draft")
+
+    node.mine(1)
+    async with session_factory() as db:
+        await settlement.track(db)
+    transaction, publication, game = await state()
+    assert (transaction.status, publication.status, game.status) == ("confirmed", "published", "published")
+    assert game.published_at is not None
+    await rpc.close()
+
+
+@pytest.fixture
+async def history_client(session_factory):
+    """Payments API over a ledger of 25 transactions for two users"""
+    start = datetime(2026, 1, 1)
+    async with session_factory() as db:
+        db.add_all([User(id=user_id, username=f"u{user_id}", email=f"u{user_id}@example.com") for user_id in (1, 2)])
+        await db.flush()
+        for i in range(25):
+            db.add(Transaction(
+                transaction_id=f"tx_{i:02d}", user_id=1 if i < 20 else 2, payment_method="chipi_pay",
+                amount=Decimal("0.1") * (i + 1), currency="BTC" if i % 5 == 0 else "STRK",
+                status="pending" if i % 2 else "completed", created_at=start + timedelta(hours=i // 2)
+            ))
+        await db.commit()
+
+    app = FastAPI()
+    app.include_router(payments.router)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_history_pages_with_filters(history_client):
+    """Test the cursor walks a user's filtered history newest first without gaps"""
+    seen, cursor = [], None
+    while True:
+        params = {"user_id": 1, "limit": 3, "currency": "STRK", "since": "2026-01-01T01:00:00"}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await history_client.get("/payments/history", params=params)).json()
+        seen.extend(page["transactions"])
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+
+    ids = [row["transaction_id"] for row in seen]
+    assert ids == [f"tx_{i:02d}" for i in range(19, 1, -1) if i % 5]
+    assert seen[0]["amount"] == "2.0"
+
+    statuses = await history_client.get("/payments/history", params={"user_id": 1, "status": ["pending"]})
+    assert {row["status"] for row in statuses.json()["transactions"]} == {"pending"}
+    bad_cursor = await history_client.get("/payments/history", params={"user_id": 1, "cursor": "nope"})
+    assert bad_cursor.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_streams_csv_and_ndjson(history_client, monkeypatch):
+    """Test exports cover every matching row, oldest first, across cursor batches"""
+    monkeypatch.setattr(payments, "EXPORT_BATCH_SIZE", 4)
+
+    response = await history_client.get("/payments/export", params={"format": "csv", "until": "2026-01-01T10:00:00"})
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["transaction_id"] for row in rows] == [f"tx_{i:02d}" for i in range(20)]
+    assert rows[2]["amount"] == "0.3"
+
+    response = await history_client.get("/payments/export", params={"format": "ndjson", "user_id": 2})
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["transaction_id"] for record in records] == [f"tx_{i:02d}" for i in range(20, 25)]
+    assert all(record["user_id"] == 2 for record in records)
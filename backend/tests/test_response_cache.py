@@ -0,0 +1,77 @@
+# backend/tests/test_response_cache.py
+# RAG response cache tests
+
+import pytest
+from backend.services import response_cache
+from backend.services.response_cache import ResponseCache
+
+
+def bag_of_words(text):
+    """Tiny deterministic embedder: word counts over a fixed vocabulary"""
+    vocab = ["dojo", "deploy", "world", "cairo", "player", "guide", "pixel", "rpg", "racing"]
+    words = text.lower().replace("?", "").split()
+    return [float(words.count(word)) for word in vocab]
+
+
+@pytest.mark.asyncio
+async def test_exact_and_semantic_hits():
+    """Test exact prompts and near-identical prompts are served from cache"""
+    cache = ResponseCache(embedder=bag_of_words, similarity_threshold=0.9)
+    await cache.put("How do I deploy a Dojo world?", "Run sozo migrate.")
+
+    assert await cache.get("How do I deploy a Dojo world?") == "Run sozo migrate."
+    assert await cache.get("how do i deploy my dojo world") == "Run sozo migrate."
+    assert await cache.get("Write a player guide for a racing game") is None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == pytest.approx(2 / 3, abs=1e-3)
+
+
+@pytest.mark.asyncio
+async def test_exact_only_without_embedder():
+    """Test only exact matches are served without an embedder"""
+    cache = ResponseCache()
+    await cache.put("prompt", "answer")
+    assert await cache.get("prompt") == "answer"
+    assert await cache.get("prompt!") is None
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_ttl(monkeypatch):
+    """Test the least recently used entry is evicted and entries expire"""
+    cache = ResponseCache(max_entries=2, ttl=60)
+    await cache.put("a", "1")
+    await cache.put("b", "2")
+    assert await cache.get("a") == "1"
+    await cache.put("c", "3")
+
+    assert len(cache) == 2
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "1"
+
+    now = response_cache.time.monotonic()
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now + 61)
+    assert await cache.get("a") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache():
+    """Test max_entries=0 disables caching"""
+    cache = ResponseCache(embedder=bag_of_words, max_entries=0)
+    await cache.put("prompt", "answer")
+    assert await cache.get("prompt") is None
+    assert cache.stats()["misses"] == 0
+
+
+@pytest.mark.asyncio
+async def test_semantic_matches_stay_within_scope():
+    """Test a near-identical prompt is only served from entries cached under the same scope"""
+    cache = ResponseCache(embedder=bag_of_words, similarity_threshold=0.9)
+    await cache.put("Write a player guide for a pixel rpg", "Guide for game A", scope="game_a")
+
+    assert await cache.get("Write a player guide for a pixel rpg", scope="game_b") is None
+    assert await cache.get("write the player guide for my pixel rpg", scope="game_b") is None
+    assert await cache.get("write the player guide for my pixel rpg", scope="game_a") == "Guide for game A"
+    assert cache.stats()["semantic_hits"] == 1
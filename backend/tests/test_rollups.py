@@ -0,0 +1,135 @@
+# backend/tests/test_rollups.py
+# Per-game asset and revenue rollup tests
+
+from decimal import Decimal
+import httpx
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from backend.database import get_db, session_dependency
+from backend.models import Game, GameAsset, GameRevenue, GameStats, Publication, Transaction, User
+from backend.services.bitcoin import BitcoinRPC, BitcoinSettlement
+from backend.services.bitcoin_regtest import LocalRegtestNode
+from backend.services.rollups import add_revenue, rebuild_game_rollups
+from backend.services.storage import AssetStorage
+from backend.services.asset_store import AssetStore
+from backend.api import games
+
+
+@pytest.fixture
+async def game(session_factory):
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com"))
+        game = Game(game_id="game_a", title="Game A", description="", template_type="rpg", developer_id=1)
+        db.add(game)
+        await db.commit()
+        return game.id
+
+
+@pytest.fixture
+async def client(session_factory, game, tmp_path, monkeypatch):
+    storage = AssetStorage(root=tmp_path)
+    monkeypatch.setattr(games, "asset_storage", storage)
+    monkeypatch.setattr(games, "asset_store", AssetStore(storage))
+    app = FastAPI()
+    app.include_router(games.router)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+async def revenue(session_factory, game_id):
+    async with session_factory() as db:
+        rows = await db.scalars(select(GameRevenue).where(GameRevenue.game_id == game_id))
+        return {row.currency: (row.total, row.payments) for row in rows}
+
+
+@pytest.mark.asyncio
+async def test_revenue_is_summed_exactly(session_factory, game):
+    """Test amounts accumulate as exact decimals, down to 18 places"""
+    async with session_factory() as db:
+        await add_revenue(db, [(game, "STRK", Decimal("0.1"))] * 3)
+        await db.commit()
+    async with session_factory() as db:
+        await add_revenue(db, [(game, "STRK", Decimal("0.000000000000000001")), (None, "STRK", Decimal("5"))])
+        await db.commit()
+
+    assert await revenue(session_factory, game) == {"STRK": (Decimal("0.300000000000000001"), 4)}
+
+
+@pytest.mark.asyncio
+async def test_stats_read_from_rollups(client, session_factory, game):
+    """Test uploads maintain the asset rollup and stats report revenue per currency"""
+    await client.post("/games/upload", params={"game_id": "game_a"},
+                      files={"file": ("a.png", b"1234", "image/png")})
+    await client.post("/games/upload", params={"game_id": "game_a"},
+                      files={"file": ("b.png", b"123456", "image/png")})
+    async with session_factory() as db:
+        await add_revenue(db, [(game, "STRK", Decimal("12.5")), (game, "BTC", Decimal("0.001"))])
+        await db.commit()
+
+    stats = (await client.get("/games/game_a/stats")).json()
+    assert stats["total_assets"] == 2
+    assert stats["total_asset_bytes"] == 10
+    assert stats["revenue"] == "12.5 STRK"
+    assert stats["revenue_by_currency"] == {"BTC": "0.001", "STRK": "12.5"}
+
+    await client.delete("/games/game_a")
+    async with session_factory() as db:
+        assert await db.get(GameStats, game) is None
+        assert await revenue(session_factory, game) == {}
+
+
+@pytest.mark.asyncio
+async def test_confirmed_bitcoin_payments_count_as_revenue(session_factory, game):
+    """Test BTC revenue is added once, when the payment confirms"""
+    node = LocalRegtestNode()
+    rpc = BitcoinRPC("http://regtest/", transport=httpx.ASGITransport(app=node))
+    settlement = BitcoinSettlement(session_factory, rpc, min_confirmations=2)
+    async with session_factory() as db:
+        for i in range(3):
+            address = await rpc.call("getnewaddress", f"tx_{i}")
+            db.add(Transaction(transaction_id=f"tx_{i}", user_id=1, game_id=game, payment_method="xverse",
+                               amount=Decimal("0.00012345"), currency="BTC", status="pending",
+                               to_address=address))
+            node.pay(address, "0.00012345")
+        await db.commit()
+
+        await settlement.track(db)
+        node.mine()
+        await settlement.track(db)
+        assert await revenue(session_factory, game) == {}
+
+        node.mine()
+        await settlement.track(db)
+        node.mine()
+        await settlement.track(db)
+    await rpc.close()
+
+    assert await revenue(session_factory, game) == {"BTC": (Decimal("0.00037035"), 3)}
+
+
+@pytest.mark.asyncio
+async def test_rebuild_matches_base_tables(session_factory, game):
+    """Test a rebuild links legacy transactions through publications and recomputes rollups"""
+    async with session_factory() as db:
+        db.add(GameAsset(game_id=game, asset_type="image/png", file_path="/a", file_size=7))
+        db.add(Transaction(transaction_id="tx_legacy", user_id=1, payment_method="chipi_pay",
+                           amount=Decimal("2.25"), currency="STRK", status="completed"))
+        db.add(Transaction(transaction_id="tx_failed", user_id=1, game_id=game, payment_method="chipi_pay",
+                           amount=Decimal("9"), currency="STRK", status="failed"))
+        await db.flush()
+        db.add(Publication(idempotency_key="k", game_id=game, payment_method="chipi_pay",
+                           amount=Decimal("2.25"), transaction_id="tx_legacy"))
+        db.add(GameRevenue(game_id=game, currency="STRK", total=Decimal("100"), payments=1))
+        await db.commit()
+
+        counts = await rebuild_game_rollups(db)
+
+    assert counts["linked_transactions"] == 1
+    assert await revenue(session_factory, game) == {"STRK": (Decimal("2.25"), 1)}
+    async with session_factory() as db:
+        stats = await db.get(GameStats, game)
+        assert (stats.asset_count, stats.asset_bytes) == (1, 7)
@@ -0,0 +1,125 @@
+# backend/tests/test_starknet.py
+# Starknet JSON-RPC client tests (against the in-process devnet)
+
+import asyncio
+import httpx
+import pytest
+
+from backend.services.payment import PaymentProcessor
+from backend.services.starknet import (
+    STRK_TOKEN_ADDRESS, ReceiptPoller, StarknetAccount, StarknetRPC, StarknetRPCError,
+    TransactionReverted, strk_to_wei, transfer_from_call
+)
+from backend.services.starknet_devnet import DEVNET_ACCOUNT_ADDRESS, DEVNET_PRIVATE_KEY, LocalStarknetNode
+
+PLATFORM = 0x999
+
+
+@pytest.fixture
+def node():
+    return LocalStarknetNode()
+
+
+@pytest.fixture
+async def rpc(node):
+    rpc = StarknetRPC("http://devnet/rpc", transport=httpx.ASGITransport(app=node))
+    yield rpc
+    await rpc.close()
+
+
+@pytest.fixture
+def account(rpc):
+    return StarknetAccount(rpc, DEVNET_ACCOUNT_ADDRESS, DEVNET_PRIVATE_KEY,
+                           poller=ReceiptPoller(rpc, interval=0.01, max_interval=0.05))
+
+
+def payment(sender: int, strk: str = "1") -> object:
+    return transfer_from_call(STRK_TOKEN_ADDRESS, sender, PLATFORM, strk_to_wei(strk))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_http_request(rpc, node):
+    """Test calls made together are sent as one JSON-RPC batch"""
+    results = await asyncio.gather(*(
+        rpc.request("starknet_getNonce", {"block_id": "pending", "contract_address": hex(DEVNET_ACCOUNT_ADDRESS)})
+        for _ in range(10)
+    ))
+    assert results == ["0x0"] * 10
+    assert node.stats["http_requests"] == 1
+
+    chain_id, missing = await rpc.batch([
+        ("starknet_chainId", {}),
+        ("starknet_getNonce", {"block_id": "pending", "contract_address": "0x1"}),
+    ])
+    assert chain_id.startswith("0x")
+    assert isinstance(missing, StarknetRPCError) and missing.code == 20
+    with pytest.raises(StarknetRPCError):
+        await rpc.request("starknet_nope", {})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_payments_share_a_multicall(account, node):
+    """Test payments sent together are signed and sent as few transactions"""
+    receipts = await asyncio.gather(*(account.execute(payment(0x100 + i)) for i in range(20)))
+
+    assert all(receipt["execution_status"] == "SUCCEEDED" for receipt in receipts)
+    assert node.stats["transactions"] == account.transactions <= 2
+    assert sum(len(tx["calls"]) for tx in node.transactions.values()) == 20
+    assert node.nonces[DEVNET_ACCOUNT_ADDRESS] == account.transactions
+
+
+@pytest.mark.asyncio
+async def test_reverted_multicall_retries_calls_alone(account, node):
+    """Test one failing payment does not fail the others merged with it"""
+    node.revert_senders.add(0xBAD)
+    results = await asyncio.gather(
+        account.execute(payment(0x100)),
+        account.execute(payment(0xBAD)),
+        account.execute(payment(0x101)),
+        return_exceptions=True
+    )
+
+    assert isinstance(results[1], TransactionReverted)
+    assert results[0]["execution_status"] == results[2]["execution_status"] == "SUCCEEDED"
+    assert results[0]["transaction_hash"] != results[2]["transaction_hash"]
+
+
+@pytest.mark.asyncio
+async def test_nonce_resyncs_after_external_send(account, node):
+    """Test a nonce used elsewhere is detected and the send retried"""
+    await account.send([payment(0x100)])
+    node.nonces[DEVNET_ACCOUNT_ADDRESS] += 1  # another process sent from the account
+
+    tx_hash = await account.send([payment(0x101)])
+    assert node.transactions[tx_hash]
+    assert node.nonces[DEVNET_ACCOUNT_ADDRESS] == 3
+
+
+@pytest.mark.asyncio
+async def test_receipt_polling_backs_off_and_times_out(rpc, node, account):
+    """Test pending transactions are polled in batches with backoff, then given up on"""
+    node.block_time = 0.2
+    tx_hash = await account.send([payment(0x100)])
+    polls_before = node.stats["http_requests"]
+    receipt = await ReceiptPoller(rpc, interval=0.01, max_interval=0.1).wait(tx_hash)
+
+    assert receipt["finality_status"] == "ACCEPTED_ON_L2"
+    assert node.stats["http_requests"] - polls_before <= 6
+
+    node.block_time = 10
+    slow = await account.send([payment(0x101)])
+    with pytest.raises(asyncio.TimeoutError):
+        await ReceiptPoller(rpc, interval=0.01, timeout=0.05).wait(slow)
+
+
+@pytest.mark.asyncio
+async def test_submitted_payment_is_confirmed_without_resending(account, node, rpc):
+    """Test a payment submitted by one processor is confirmed by another from its hash alone"""
+    tx_hash = await PaymentProcessor(account).submit_starknet_payment("0x123", "0x456", "2.5")
+    restarted = PaymentProcessor(StarknetAccount(rpc, DEVNET_ACCOUNT_ADDRESS, DEVNET_PRIVATE_KEY,
+                                                 poller=ReceiptPoller(rpc, interval=0.01, max_interval=0.05)))
+
+    assert await restarted.confirm_starknet_payment(tx_hash) == tx_hash
+    assert len(node.transactions) == 1
+    [(_, _, calldata)] = node.transactions[tx_hash]["calls"]
+    assert calldata == [0x123, 0x456, strk_to_wei("2.5"), 0]
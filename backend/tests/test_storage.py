@@ -0,0 +1,135 @@
+# backend/tests/test_storage.py
+# Streaming asset storage tests
+
+import hashlib
+import pytest
+from fastapi import FastAPI, HTTPException
+from httpx import AsyncClient
+
+from backend.database import get_db, session_dependency
+from backend.models import Game, User
+from backend.services.storage import AssetStorage
+from backend.services.asset_store import AssetStore
+from backend.api import games
+
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Storage with a small chunk size and max upload"""
+    return AssetStorage(root=tmp_path, chunk_size=4, max_size=64)
+
+
+@pytest.fixture
+async def app(session_factory, storage, monkeypatch):
+    """Games router wired to the test database and storage"""
+    async with session_factory() as db:
+        db.add(User(id=1, username="dev", email="dev@example.com"))
+        db.add(Game(game_id="game_test", title="Test", description="", template_type="rpg", developer_id=1))
+        await db.commit()
+
+    monkeypatch.setattr(games, "asset_storage", storage)
+    monkeypatch.setattr(games, "asset_store", AssetStore(storage))
+    app = FastAPI()
+    app.include_router(games.router)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_write_stream_hashes_incrementally(storage, tmp_path):
+    """Test streamed writes report size and SHA-256"""
+    data = b"dojo game bundle bytes"
+    stored = await storage.write_stream(chunked(data, 5), tmp_path / "g" / "bundle.bin")
+
+    assert stored.size == len(data)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert stored.path.read_bytes() == data
+
+
+@pytest.mark.asyncio
+async def test_write_stream_enforces_max_size(storage, tmp_path):
+    """Test oversized uploads abort mid-stream without leaving files"""
+    with pytest.raises(HTTPException) as exc:
+        await storage.write_stream(chunked(b"x" * 100, 8), tmp_path / "g" / "big.bin")
+
+    assert exc.value.status_code == 413
+    assert list((tmp_path / "g").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_resumable_session(storage, tmp_path):
+    """Test parts can be re-sent and are assembled in order on commit"""
+    session = await storage.create_session("game_test", "../level.json", "application/json")
+    upload_id = session["upload_id"]
+    assert session["filename"] == "level.json"
+
+    await storage.write_part(upload_id, 2, chunked(b"WORLD", 3))
+    await storage.write_part(upload_id, 1, chunked(b"hello-", 3))
+    await storage.write_part(upload_id, 1, chunked(b"HELLO-", 3))
+
+    status = await storage.get_session(upload_id)
+    assert [p["part_number"] for p in status["parts"]] == [1, 2]
+    assert status["received_size"] == 11
+
+    stored = await storage.commit_session(upload_id, tmp_path / "game_test" / "level.json")
+    assert stored.path.read_bytes() == b"HELLO-WORLD"
+    assert stored.sha256 == hashlib.sha256(b"HELLO-WORLD").hexdigest()
+
+    with pytest.raises(HTTPException) as exc:
+        await storage.get_session(upload_id)
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_commit_rejects_missing_parts(storage):
+    """Test commit fails when a part is missing"""
+    session = await storage.create_session("game_test", "a.bin")
+    await storage.write_part(session["upload_id"], 2, chunked(b"abc", 3))
+
+    with pytest.raises(HTTPException) as exc:
+        await storage.commit_session(session["upload_id"], storage.root / "a.bin")
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_upload_endpoints(app, storage):
+    """Test direct and multipart upload routes"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/games/upload",
+            params={"game_id": "game_test"},
+            files={"file": ("sprite.png", b"\x89PNG-data", "image/png")}
+        )
+        assert response.status_code == 200
+        assert response.json()["size"] == 9
+        digest = hashlib.sha256(b"\x89PNG-data").hexdigest()
+        assert storage.blob_path(digest).read_bytes() == b"\x89PNG-data"
+
+        response = await client.post(
+            "/games/upload",
+            params={"game_id": "game_test"},
+            files={"file": ("huge.bin", b"x" * 65, "application/octet-stream")}
+        )
+        assert response.status_code == 413
+
+        response = await client.post("/games/uploads", json={
+            "game_id": "game_test",
+            "filename": "bundle.zip",
+            "total_size": 8
+        })
+        upload_id = response.json()["upload_id"]
+
+        await client.put(f"/games/uploads/{upload_id}/parts/1", content=b"abcd")
+        await client.put(f"/games/uploads/{upload_id}/parts/2", content=b"efgh")
+
+        response = await client.post(f"/games/uploads/{upload_id}/commit")
+        assert response.status_code == 200
+        assert response.json()["sha256"] == hashlib.sha256(b"abcdefgh").hexdigest()
+
+        stats = await client.get("/games/game_test/stats")
+        assert stats.json()["total_assets"] == 2
@@ -0,0 +1,136 @@
+# backend/tests/test_vector_index.py
+# NumPy vector store tests
+
+import asyncio
+import multiprocessing
+import numpy as np
+import pytest
+from langchain.chains import RetrievalQA
+
+from backend.services.ai_agent import AIAgent
+from backend.services.ai_providers import ExtractiveLLM, LocalHashEmbeddings
+from backend.services.vector_index import NumpyVectorStore, normalize
+
+DOCS = [
+    "Dojo uses Cairo for smart contracts and provides an ECS.",
+    "Deploy a Dojo world with sozo migrate.",
+    "Torii indexes world state and serves it over GraphQL.",
+    "Players pay with Chipi Pay on Starknet.",
+]
+
+
+def clustered(n, dim=32, clusters=20, seed=0):
+    """Unit vectors drawn around random cluster centers"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    points = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    return normalize(points).astype(np.float32)
+
+
+def exact_top_k(vectors, queries, k):
+    return np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+
+
+def test_search_matches_brute_force():
+    """Test batched exact search returns the true nearest neighbours"""
+    vectors = clustered(3000)
+    store = NumpyVectorStore(LocalHashEmbeddings(), ivf_min_size=0)
+    store.add_embeddings([str(i) for i in range(3000)], vectors, ids=[str(i) for i in range(3000)])
+
+    queries = clustered(20, seed=1)
+    results = store.search_vectors(queries, k=5)
+    expected = exact_top_k(vectors, queries, 5)
+    assert [[row for row, _ in hits] for hits in results] == expected.tolist()
+    assert results[0][0][1] == pytest.approx(float(queries[0] @ vectors[expected[0][0]]), abs=1e-5)
+
+
+def test_upsert_delete_and_persist(tmp_path):
+    """Test ids are upserted, deletes are excluded and the store reloads from disk"""
+    embeddings = LocalHashEmbeddings()
+    store = NumpyVectorStore(embeddings, persist_directory=str(tmp_path))
+    store.add_texts(DOCS, metadatas=[{"source": f"doc{i}"} for i in range(4)], ids=["a", "b", "c", "d"])
+    store.add_texts(["Deploy a Dojo world with sozo migrate --name mygame."], ids=["b"])
+    store.delete(ids=["c"])
+    store.persist()
+
+    assert len(store) == 3
+    reloaded = NumpyVectorStore(embeddings, persist_directory=str(tmp_path))
+    assert len(reloaded) == 3
+    top = reloaded.similarity_search("how do I deploy with sozo", k=1)[0]
+    assert "--name mygame" in top.page_content
+    assert all("Torii" not in doc.page_content for doc in reloaded.similarity_search("Torii GraphQL", k=3))
+
+    # Freed rows are reused, and the memmap grows past its initial capacity
+    reloaded.add_embeddings(["x"] * 2000, clustered(2000, dim=embeddings.dim), ids=[f"x{i}" for i in range(2000)])
+    assert len(reloaded) == 2003
+    assert (tmp_path / "vectors.f32").stat().st_size >= 2003 * embeddings.dim * 4
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_ivf_recall(quantize):
+    """Test the IVF index keeps high recall while scanning a fraction of rows"""
+    vectors = clustered(20000)
+    store = NumpyVectorStore(LocalHashEmbeddings(), ivf_min_size=1000, nprobe=8, quantize=quantize)
+    store.add_embeddings(["v"] * len(vectors), vectors, ids=[str(i) for i in range(len(vectors))])
+
+    queries = clustered(100, seed=2)
+    expected = exact_top_k(vectors, queries, 10)
+    results = store.search_vectors(queries, k=10)
+    recall = np.mean([len(set(row for row, _ in hits) & set(truth)) / 10 for hits, truth in zip(results, expected)])
+
+    assert store._index is not None
+    assert recall >= 0.9
+
+
+def test_plugs_into_retrieval_qa():
+    """Test the store works as the RetrievalQA retriever"""
+    store = NumpyVectorStore.from_texts(DOCS, LocalHashEmbeddings())
+    chain = RetrievalQA.from_chain_type(llm=ExtractiveLLM(max_sentences=1), chain_type="stuff",
+                                        retriever=store.as_retriever(search_kwargs={"k": 2}))
+    assert "Torii" in chain.run("What indexes world state over GraphQL?")
+
+
+def ingest_in_worker(index_dir, corpus, opened):
+    """One API worker: open the shared index, then ingest a corpus once every worker has opened it"""
+    async def run():
+        agent = AIAgent(provider="local", index_dir=index_dir, vector_store="numpy", docs=[], knowledge_paths=[])
+        await agent.ensure_ready()
+        opened.wait()
+        report = await agent.refresh_knowledge_base([corpus])
+        assert not report.errors
+    asyncio.run(run())
+
+
+def test_processes_sharing_an_index_keep_each_others_writes(tmp_path):
+    """Test two processes ingesting into one index directory lose no rows, across a resize"""
+    corpora = []
+    for name in ("a", "b"):
+        corpus = tmp_path / name
+        corpus.mkdir()
+        for i in range(60):
+            (corpus / f"{name}{i}.md").write_text(" ".join(f"{name} guide {i} part {j}." for j in range(200)))
+        corpora.append(str(corpus))
+
+    context = multiprocessing.get_context("spawn")
+    opened = context.Barrier(len(corpora))
+    workers = [context.Process(target=ingest_in_worker, args=(str(tmp_path / "index"), corpus, opened))
+               for corpus in corpora]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(120)
+    assert [worker.exitcode for worker in workers] == [0, 0]
+
+    agent = AIAgent(provider="local", index_dir=tmp_path / "index", vector_store="numpy", docs=[], knowledge_paths=[])
+    asyncio.run(agent.ensure_ready())
+    sources = {doc["source"] for doc in agent.vectorstore._metadatas if doc}
+    chunks = sum(len(entry["chunks"]) for entry in agent.ingestor.manifest.values())
+    assert {source.split("/")[-2] for source in sources} == {"a", "b"}
+    assert len(sources) == len(agent.ingestor.manifest) == 120
+    assert len(agent.vectorstore) == chunks > 1024
+
+    # Every row holds the vector of its own text
+    store = agent.vectorstore
+    rows = sorted(store._rows.values())
+    expected = normalize(np.asarray(store.embeddings.embed_documents([store._texts[row] for row in rows])))
+    assert np.allclose(store._matrix[rows], expected, atol=1e-5)
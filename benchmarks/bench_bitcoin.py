@@ -0,0 +1,94 @@
+# benchmarks/bench_bitcoin.py
+# Bitcoin confirmation tracking cost: one RPC request per invoice vs one batched request per poll
+#
+# Usage:
+#   python -m benchmarks.bench_bitcoin [payments] [latency_ms]
+#
+# Records pending payments to invoice addresses in a temporary SQLite
+# database, pays them on the in-process regtest node, and tracks them
+# through BitcoinSettlement while mining until confirmed, reporting time
+# and RPC round trips for per-invoice vs batched polling.
+
+import sys
+import time
+import asyncio
+import tempfile
+from decimal import Decimal
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.database import create_session_factory, init_models
+from backend.models import Transaction
+from backend.services.bitcoin import BitcoinRPC, BitcoinSettlement
+from backend.services.bitcoin_regtest import LocalRegtestNode
+
+
+class SlowTransport(httpx.ASGITransport):
+    """ASGI transport adding a network round trip per request"""
+
+    def __init__(self, app, latency: float):
+        super().__init__(app=app)
+        self.latency = latency
+
+    async def handle_async_request(self, request):
+        await asyncio.sleep(self.latency)
+        return await super().handle_async_request(request)
+
+
+class UnbatchedRPC(BitcoinRPC):
+    """Sends each call as its own HTTP request, as a poller per payment would"""
+
+    async def batch(self, calls):
+        results = []
+        for call in calls:
+            results.extend(await super().batch([call]))
+        return results
+
+
+async def run(payments: int, latency: float, batched: bool):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        await init_models(engine)
+        session_factory = create_session_factory(engine)
+        node = LocalRegtestNode()
+        rpc_class = BitcoinRPC if batched else UnbatchedRPC
+        rpc = rpc_class("http://regtest/", transport=SlowTransport(node, latency))
+        settlement = BitcoinSettlement(session_factory, rpc, min_confirmations=2)
+
+        addresses = [node.rpc_getnewaddress(f"tx_{i}") for i in range(payments)]
+        async with session_factory() as db:
+            db.add_all(
+                Transaction(transaction_id=f"tx_{i}", user_id=1, payment_method="xverse", amount=Decimal("0.001"),
+                            currency="BTC", status="pending", to_address=address)
+                for i, address in enumerate(addresses)
+            )
+            await db.commit()
+        for address in addresses:
+            node.pay(address, "0.001")
+
+        requests_before = node.stats["http_requests"]
+        start = time.perf_counter()
+        async with session_factory() as db:
+            await settlement.track(db)
+            for _ in range(2):
+                node.mine(1)
+                await settlement.track(db)
+        elapsed = time.perf_counter() - start
+        await rpc.close()
+        await engine.dispose()
+
+    label = "batched    " if batched else "per invoice"
+    print(f"{label} {payments} payments  {elapsed:7.2f}s   "
+          f"rpc round trips {node.stats['http_requests'] - requests_before:>5}")
+
+
+def main():
+    payments = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 5) / 1000
+
+    for batched in (False, True):
+        asyncio.run(run(payments, latency, batched))
+
+
+if __name__ == "__main__":
+    main()
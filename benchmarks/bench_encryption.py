@@ -0,0 +1,137 @@
+# benchmarks/bench_encryption.py
+# Chat encryption throughput and per-user key derivation cost
+#
+# Usage:
+#   python -m benchmarks.bench_encryption [iterations] [users] [stream_mib]
+#
+# Measures Fernet vs AES-GCM encrypt/decrypt ops/sec per message size and
+# in batches, streaming file encryption throughput and peak memory, the
+# cost of one PBKDF2 derivation, cold vs cached
+# EncryptionService.user_cipher lookups, and whether concurrent
+# derivations keep the event loop responsive (max loop lag while they run).
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import tracemalloc
+
+from backend.services.encryption import EncryptionService, KeyCache
+
+SIZES = (64, 1024, 16 * 1024)
+
+
+def ops_per_second(fn, seconds: float = 0.5) -> float:
+    count, start = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        for _ in range(100):
+            fn()
+        count += 100
+    return count / elapsed
+
+
+async def max_loop_lag(until: asyncio.Future, interval: float = 0.005) -> float:
+    """Largest delay of a periodic timer while `until` is pending"""
+    lag = 0.0
+    while not until.done():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(lag, time.perf_counter() - start - interval)
+    return lag
+
+
+async def bench_user_keys(iterations: int, users: int):
+    service = EncryptionService(kdf_iterations=iterations, key_cache=KeyCache(max_entries=users))
+
+    start = time.perf_counter()
+    cold = asyncio.ensure_future(asyncio.gather(*(service.user_cipher(u) for u in range(users))))
+    lag = await max_loop_lag(cold)
+    await cold
+    elapsed = time.perf_counter() - start
+    print(f"cold user_cipher, {users} users   {elapsed:7.2f}s  ({users / elapsed:7.1f} keys/s, "
+          f"max loop lag {lag * 1000:.1f} ms)")
+
+    lookups = users * 100
+    start = time.perf_counter()
+    for i in range(lookups):
+        await service.user_cipher(i % users)
+    elapsed = time.perf_counter() - start
+    print(f"cached user_cipher              {lookups / elapsed:10.0f} ops/s")
+
+    message = "x" * 1024
+    start = time.perf_counter()
+    for i in range(lookups):
+        await service.decrypt_for_user(i % users, await service.encrypt_for_user(i % users, message))
+    elapsed = time.perf_counter() - start
+    print(f"per-user round trip, 1 KiB      {lookups / elapsed:10.0f} ops/s")
+    print(f"key cache: {service.key_cache.stats()}")
+
+
+def bench_batches(batch: int = 1000, size: int = 256):
+    messages = ["x" * size] * batch
+    for mode in ("fernet", "aes-gcm"):
+        service = EncryptionService(mode=mode)
+        tokens = service.encrypt_messages(messages)
+        start = time.perf_counter()
+        for _ in range(5):
+            service.encrypt_messages(messages)
+        encrypt = 5 * batch / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(5):
+            service.decrypt_messages(tokens)
+        decrypt = 5 * batch / (time.perf_counter() - start)
+        print(f"batch {batch} x {size} B {mode:<8} encrypt {encrypt:9.0f} msg/s   decrypt {decrypt:9.0f} msg/s")
+
+
+def bench_stream(service: EncryptionService, mib: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        plain, sealed, opened = (os.path.join(tmp, name) for name in ("plain", "sealed", "opened"))
+        with open(plain, "wb") as fh:
+            for _ in range(mib):
+                fh.write(os.urandom(1024 * 1024))
+
+        for label, source, dest, fn in [
+            ("encrypt_stream", plain, sealed, service.aead.encrypt_stream),
+            ("decrypt_stream", sealed, opened, service.aead.decrypt_stream),
+        ]:
+            tracemalloc.start()
+            start = time.perf_counter()
+            with open(source, "rb") as src, open(dest, "wb") as dst:
+                fn(src, dst)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label} {mib} MiB     {mib / elapsed:9.1f} MiB/s   peak {peak / 1024:7.0f} KiB")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    stream_mib = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+
+    service = EncryptionService(kdf_iterations=iterations)
+    for mode in ("fernet", "aes-gcm"):
+        service.mode = mode
+        for size in SIZES:
+            message = "x" * size
+            token = service.encrypt_message(message)
+            encrypt = ops_per_second(lambda: service.encrypt_message(message))
+            decrypt = ops_per_second(lambda: service.decrypt_message(token))
+            print(f"{mode:<7} {size:>6} B   encrypt {encrypt:9.0f} ops/s   decrypt {decrypt:9.0f} ops/s   "
+                  f"token {len(token):>6} chars")
+    service.mode = "fernet"
+    bench_batches()
+    bench_stream(service, stream_mib)
+
+    runs = 5
+    start = time.perf_counter()
+    for i in range(runs):
+        service.generate_user_key(str(i), "password")
+    print(f"PBKDF2-SHA256 x{iterations}       {(time.perf_counter() - start) / runs * 1000:7.1f} ms per key")
+
+    asyncio.run(bench_user_keys(iterations, users))
+
+
+if __name__ == "__main__":
+    main()
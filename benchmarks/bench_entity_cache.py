@@ -0,0 +1,89 @@
+# benchmarks/bench_entity_cache.py
+# Hot game lookups with and without the read-through entity cache
+#
+# Usage:
+#   python -m benchmarks.bench_entity_cache [DATABASE_URL] [requests] [concurrency]
+#
+# Reads are skewed towards a few popular games, like game pages. Reports
+# req/s, latency and database queries with ENTITY_CACHE_BACKEND=none (only
+# concurrent misses are shared), the in-process LRU, and the Redis backend (against the in-process stand-in; set REDIS_URL
+# and pass a real server to measure the network round trip).
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from statistics import quantiles
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from backend.database import to_async_url, to_sync_url
+from backend.models import Game
+from backend.services.entity_cache import EntityCache, MemoryBackend, RedisBackend, create_redis_client
+from benchmarks.bench_db import NUM_GAMES, seed
+
+
+async def run(handler, game_ids, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(game_id):
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(game_id)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(game_id) for game_id in game_ids))
+    total = time.perf_counter() - start
+    return {
+        "rps": len(game_ids) / total,
+        "p50_ms": quantiles(latencies, n=100)[49] * 1000,
+        "p99_ms": quantiles(latencies, n=100)[98] * 1000,
+    }
+
+
+async def main(url: str, num_requests: int, concurrency: int):
+    sync_engine = seed(to_sync_url(url))
+    engine = create_async_engine(to_async_url(url))
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    # Zipf-like popularity: a handful of games get most of the traffic
+    weights = [1 / (rank + 1) for rank in range(NUM_GAMES)]
+    game_ids = [f"bench_{i}" for i in random.Random(7).choices(range(NUM_GAMES), weights, k=num_requests)]
+
+    caches = {
+        "none": EntityCache(MemoryBackend(max_entries=0)),
+        "memory LRU": EntityCache(MemoryBackend()),
+        "redis": EntityCache(RedisBackend(create_redis_client(os.getenv("REDIS_URL", "local")))),
+    }
+    results = {}
+    for name, cache in caches.items():
+        await cache.clear()
+
+        async def handler(game_id):
+            async with SessionLocal() as db:
+                await cache.get(Game, game_id, lambda: db.scalar(select(Game).where(Game.game_id == game_id)))
+
+        results[name] = {**await run(handler, game_ids, concurrency), **cache.stats()}
+        await cache.close()
+
+    await engine.dispose()
+    sync_engine.dispose()
+
+    print(f"\n📊 Game lookups: {num_requests} requests over {NUM_GAMES} games, concurrency {concurrency}")
+    print(f"  {'cache':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'db queries':>12}{'coalesced':>11}{'hit ratio':>11}")
+    for name, r in results.items():
+        print(f"  {name:<12}{r['rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['loads']:>12}{r['coalesced']:>11}{r['hit_ratio']:>11.3f}")
+
+
+if __name__ == "__main__":
+    default_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    url = sys.argv[1] if len(sys.argv) > 1 else default_url
+    num_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    asyncio.run(main(url, num_requests, concurrency))
@@ -0,0 +1,92 @@
+# benchmarks/bench_retrieval.py
+# Retrieval recall vs latency: Chroma (HNSW) vs NumpyVectorStore (exact, IVF, IVF+int8)
+#
+# Usage:
+#   python -m benchmarks.bench_retrieval [vectors] [dim] [queries]
+#
+# Uses clustered synthetic unit vectors so every backend sees the same
+# embeddings; recall@10 is measured against exact brute-force search.
+# Latency is per single query, the way the RetrievalQA retriever calls it.
+
+import sys
+import tempfile
+import time
+from statistics import quantiles
+
+import chromadb
+import numpy as np
+from langchain.embeddings import FakeEmbeddings
+
+from backend.services.vector_index import NumpyVectorStore, normalize
+
+K = 10
+
+
+def clustered(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    points = centers[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, dim))
+    return normalize(points).astype(np.float32)
+
+
+def measure(label: str, search, queries: np.ndarray, truth: np.ndarray):
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        rows = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(set(rows) & set(expected.tolist())) / K)
+    p50, p95 = (quantiles(latencies, n=20)[i] for i in (9, 18))
+    print(f"{label:<26} recall@{K} {np.mean(recalls):6.3f}   p50 {p50:7.3f} ms   p95 {p95:7.3f} ms")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    num_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    vectors = clustered(n, dim)
+    queries = clustered(num_queries, dim, seed=1)
+    ids = [str(i) for i in range(n)]
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :K]
+    print(f"{n} vectors x {dim} dims, {num_queries} queries")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=f"{tmp}/chroma")
+        for search_ef in (10, 100):
+            collection = client.create_collection(
+                f"bench_{search_ef}", metadata={"hnsw:space": "cosine", "hnsw:search_ef": search_ef}
+            )
+            start = time.perf_counter()
+            for i in range(0, n, 5000):
+                collection.add(ids=ids[i:i + 5000], embeddings=vectors[i:i + 5000].tolist())
+            build = time.perf_counter() - start
+            measure(f"chroma hnsw ef={search_ef}",
+                    lambda q: [int(i) for i in collection.query(query_embeddings=[q.tolist()], n_results=K)["ids"][0]],
+                    queries, truth)
+            print(f"{'':<26} build {build:.1f}s")
+
+        for label, options in [
+            ("numpy exact", {"ivf_min_size": 0}),
+            ("numpy ivf nprobe=4", {"ivf_min_size": 1, "nprobe": 4}),
+            ("numpy ivf nprobe=16", {"ivf_min_size": 1, "nprobe": 16}),
+            ("numpy ivf+int8 nprobe=16", {"ivf_min_size": 1, "nprobe": 16, "quantize": True}),
+        ]:
+            store = NumpyVectorStore(FakeEmbeddings(size=dim), persist_directory=f"{tmp}/{label}", **options)
+            start = time.perf_counter()
+            store.add_embeddings(ids, vectors, ids=ids)
+            store.persist()
+            store.search_vectors(queries[:1], K)  # trains the IVF index
+            build = time.perf_counter() - start
+            measure(f"{label}", lambda q: [row for row, _ in store.search_vectors(q, K)[0]], queries, truth)
+            print(f"{'':<26} build {build:.1f}s")
+
+        store = NumpyVectorStore(FakeEmbeddings(size=dim), ivf_min_size=0)
+        store.add_embeddings(ids, vectors, ids=ids)
+        start = time.perf_counter()
+        store.search_vectors(queries, K)
+        print(f"numpy exact, batched: {num_queries / (time.perf_counter() - start):.0f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/bench_starknet.py
+# Starknet payment throughput when many games publish at once
+#
+# Usage:
+#   python -m benchmarks.bench_starknet [payments] [latency_ms] [block_time_ms]
+#
+# Sends concurrent STRK transfer_from payments through StarknetAccount
+# against the in-process devnet (with simulated network latency and block
+# time) and reports payments/s, transactions, and HTTP requests vs RPC
+# calls, with multicall merging and request batching on and off.
+
+import sys
+import time
+import asyncio
+import httpx
+
+from backend.services.starknet import (
+    STRK_TOKEN_ADDRESS, ReceiptPoller, StarknetAccount, StarknetRPC, strk_to_wei, transfer_from_call
+)
+from backend.services.starknet_devnet import DEVNET_ACCOUNT_ADDRESS, DEVNET_PRIVATE_KEY, LocalStarknetNode
+
+
+async def run(payments: int, latency: float, block_time: float, batched: bool):
+    node = LocalStarknetNode(block_time=block_time, latency=latency)
+    rpc = StarknetRPC("http://devnet/rpc", transport=httpx.ASGITransport(app=node),
+                      batch_window=0.002 if batched else 0, max_batch=100 if batched else 1)
+    account = StarknetAccount(rpc, DEVNET_ACCOUNT_ADDRESS, DEVNET_PRIVATE_KEY,
+                              poller=ReceiptPoller(rpc, interval=block_time / 2, max_interval=block_time),
+                              max_calls_per_tx=50 if batched else 1)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        account.execute(transfer_from_call(STRK_TOKEN_ADDRESS, 0x1000 + i, 0x999, strk_to_wei("1")))
+        for i in range(payments)
+    ))
+    elapsed = time.perf_counter() - start
+    await rpc.close()
+
+    label = "batched  " if batched else "unbatched"
+    print(f"{label} {payments} payments  {elapsed:7.2f}s  ({payments / elapsed:7.1f}/s)   "
+          f"transactions {node.stats['transactions']:>4}   "
+          f"http requests {node.stats['http_requests']:>5} for {node.stats['calls']:>5} rpc calls")
+
+
+def main():
+    payments = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    block_time = (float(sys.argv[3]) if len(sys.argv) > 3 else 500) / 1000
+
+    for batched in (False, True):
+        asyncio.run(run(payments, latency, block_time, batched))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,10 +13,12 @@ setup(
         "uvicorn[standard]>=0.24.0",
         "sqlalchemy>=2.0.23",
         "psycopg2-binary>=2.9.9",
+        "asyncpg>=0.29.0",
         "pydantic>=2.5.0",
         "openai>=1.3.7",
         "langchain>=0.0.340",
         "chromadb>=0.4.18",
+        "numpy>=1.24",
         "starknet-py>=0.18.3",
         "bitcoinlib>=0.6.14",
         "cryptography>=41.0.7",
@@ -27,6 +29,7 @@ setup(
             "pytest-asyncio>=0.21.1",
             "pytest-cov>=4.1.0",
             "httpx>=0.25.2",
+            "aiosqlite>=0.19.0",
         ]
     },
     python_requires=">=3.11",